@@ -0,0 +1,61 @@
+# benchmarks/bench_icmp.py
+"""
+Benchmark del motor de descubrimiento contra 127.0.0.0/8 en loopback.
+
+Todas las direcciones 127.x.y.z responden en Linux, por lo que el
+resultado mide el rendimiento puro del motor sin depender de la red.
+
+Uso:
+    python benchmarks/bench_icmp.py                 # 127.0.0.0/16, motor icmp
+    python benchmarks/bench_icmp.py --prefix 8      # /8 completo (16M IPs)
+    python benchmarks/bench_icmp.py --engine ping --prefix 24
+    python benchmarks/bench_icmp.py --prefix 12 --workers 8   # 8 procesos
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from network_discovery_tool.scanner import NetworkScanner  # noqa: E402
+from network_discovery_tool.sharding import ShardedScanner  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de descubrimiento en loopback')
+    parser.add_argument('--prefix', type=int, default=16, help='Prefijo de 127.0.0.0/N (default: 16)')
+    parser.add_argument('--engine', choices=['ping', 'icmp'], default='icmp')
+    parser.add_argument('--concurrency', type=int, default=4096)
+    parser.add_argument('--threads', type=int, default=200)
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1, help='Procesos; 0 = uno por núcleo (default: 1)')
+    args = parser.parse_args()
+
+    network = f"127.0.0.0/{args.prefix}"
+    scanner = NetworkScanner(
+        timeout=args.timeout,
+        max_threads=args.threads,
+        engine=args.engine,
+        max_inflight=args.concurrency,
+        resolve=False  # Sin resolución inversa: medimos solo el motor
+    )
+
+    start = time.perf_counter()
+    if args.workers != 1:
+        sharded = ShardedScanner(scanner, workers=args.workers)
+        hosts = sharded.scan_network(network)
+        workers = len(sharded.shard_stats)
+    else:
+        hosts = scanner.scan_network(network)
+        workers = 1
+    elapsed = time.perf_counter() - start
+
+    print(f"Red: {network}  Motor: {scanner.engine}  Procesos: {workers}")
+    print(f"Hosts activos: {len(hosts):,}")
+    print(f"Duración: {elapsed:.2f} s")
+    print(f"Velocidad: {len(hosts) / elapsed:,.0f} hosts/seg" if elapsed > 0 else "N/A")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_models.py
+"""
+Benchmark de memoria del modelo de resultados.
+
+Construye el resultado de un barrido sintético (por defecto un /16 completo
+con unos pocos puertos abiertos por host) con los diccionarios de versiones
+anteriores y con HostResult/PortResult, y compara la memoria retenida
+medida con tracemalloc.
+
+Uso:
+    python benchmarks/bench_models.py                     # 65534 hosts
+    python benchmarks/bench_models.py --hosts 1000000 --ports-per-host 5
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from ipaddress import IPv4Address
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from network_discovery_tool.models import HostResult  # noqa: E402
+from network_discovery_tool.scanner import SERVICE_PORTS, PortScanner  # noqa: E402
+
+COMMON_PORTS = sorted(SERVICE_PORTS)
+
+
+def host_ports(index: int, ports_per_host: int):
+    """Puertos abiertos deterministas: uno de cada cuatro hosts no tiene ninguno."""
+    if index % 4 == 0:
+        return []
+    start = index % len(COMMON_PORTS)
+    return [COMMON_PORTS[(start + i) % len(COMMON_PORTS)] for i in range(ports_per_host)]
+
+
+def build_dicts(count: int, ports_per_host: int):
+    base = int(IPv4Address('10.0.0.1'))
+    hosts = []
+    port_results = {}
+    for index in range(count):
+        ip = str(IPv4Address(base + index))
+        ports = [
+            {'port': port, 'service': SERVICE_PORTS.get(port, 'Unknown'), 'protocol': 'TCP'}
+            for port in host_ports(index, ports_per_host)
+        ]
+        port_results[ip] = ports
+        hosts.append({
+            'ip': ip,
+            'hostname': 'N/A',
+            'status': 'active',
+            'response_time': index % 200,
+            'open_ports': ports
+        })
+    return hosts, port_results
+
+
+def build_records(count: int, ports_per_host: int):
+    base = int(IPv4Address('10.0.0.1'))
+    hosts = []
+    port_results = {}
+    scanner = PortScanner()
+    for index in range(count):
+        ip = str(IPv4Address(base + index))
+        host = HostResult(ip, 'N/A', index % 200)
+        ports = [scanner._port_entry(port) for port in host_ports(index, ports_per_host)]
+        if ports:
+            host.open_ports = port_results[ip] = ports
+        hosts.append(host)
+    return hosts, port_results
+
+
+def measure(builder, count: int, ports_per_host: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = builder(count, ports_per_host)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de memoria de los resultados de escaneo')
+    parser.add_argument('--hosts', type=int, default=65534, help='Hosts activos (default: 65534)')
+    parser.add_argument('--ports-per-host', type=int, default=3,
+                        help='Puertos abiertos por host con puertos (default: 3)')
+    args = parser.parse_args()
+
+    print(f"{args.hosts:,} hosts, {args.ports_per_host} puertos en 3 de cada 4")
+    results = {}
+    for name, builder in (('dict', build_dicts), ('slots', build_records)):
+        retained, elapsed = measure(builder, args.hosts, args.ports_per_host)
+        results[name] = retained
+        print(f"{name:>6}: {retained / 2**20:8.1f} MiB ({retained / args.hosts:6.0f} B/host), "
+              f"construido en {elapsed:.2f} s")
+    saving = 1 - results['slots'] / results['dict']
+    print(f"Ahorro: {saving:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_ports.py
+"""
+Benchmark de PortScanner contra listeners locales en 127.0.0.1.
+
+Abre un listener TCP en cada puerto par del rango barrido, de modo que la
+mitad de los puertos están abiertos y la otra mitad responden RST.
+Compara los motores 'thread' y 'async' y verifica que coinciden.
+
+Uso:
+    python benchmarks/bench_ports.py                      # 1000 puertos
+    python benchmarks/bench_ports.py --ports 10000 --concurrency 4096
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from network_discovery_tool.scanner import PortScanner  # noqa: E402
+
+
+def open_listeners(base: int, count: int):
+    """Abre listeners en los puertos pares de [base, base + count)."""
+    listeners = []
+    for port in range(base, base + count, 2):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            sock.close()
+            continue
+        sock.listen(128)
+        listeners.append(sock)
+    return listeners
+
+
+def run(engine: str, ports, args):
+    scanner = PortScanner(
+        timeout=args.timeout,
+        max_threads=args.threads,
+        engine=engine,
+        max_inflight=args.concurrency
+    )
+    start = time.perf_counter()
+    found = scanner.scan_ports('127.0.0.1', ports)
+    return found, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escaneo de puertos en loopback')
+    parser.add_argument('--base', type=int, default=20000, help='Primer puerto del rango (default: 20000)')
+    parser.add_argument('--ports', type=int, default=1000, help='Puertos a barrer (default: 1000)')
+    parser.add_argument('--threads', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=2048)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--engines', default='thread,async')
+    args = parser.parse_args()
+
+    listeners = open_listeners(args.base, args.ports)
+    ports = set(range(args.base, args.base + args.ports))
+    print(f"Listeners abiertos: {len(listeners)} / {len(ports)} puertos barridos")
+
+    try:
+        reference = None
+        for engine in args.engines.split(','):
+            found, elapsed = run(engine, ports, args)
+            rate = len(ports) / elapsed if elapsed > 0 else 0
+            print(f"{engine:>6}: {len(found)} abiertos en {elapsed:.3f} s ({rate:,.0f} puertos/seg)")
+            if reference is None:
+                reference = found
+            elif found != reference:
+                print(f"  ⚠️  Resultados de '{engine}' difieren del motor de referencia")
+    finally:
+        for sock in listeners:
+            sock.close()
+
+
+if __name__ == "__main__":
+    main()
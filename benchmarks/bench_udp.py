@@ -0,0 +1,130 @@
+# benchmarks/bench_udp.py
+"""
+Benchmark del motor UDP contra respondedores locales (127.0.0.1 o ::1).
+
+Reparte el rango barrido en cuatro tipos de puerto y comprueba que cada
+uno se clasifica como se espera:
+- respondedores: contestan a cada datagrama ('open')
+- sin socket: el kernel responde ICMP port unreachable ('closed')
+- silenciosos: reciben y nunca contestan ('open|filtered')
+- con pérdidas: descartan el primer datagrama de cada sonda y contestan a
+  la retransmisión ('open' tras un reintento, reduce el ritmo del host)
+
+Loopback está exento del límite de ICMP de Linux, así que el ritmo por
+host solo se reduce por los puertos con pérdidas.
+
+Uso:
+    python benchmarks/bench_udp.py                      # 1000 puertos
+    python benchmarks/bench_udp.py --ports 20000 --host-rate 0
+    python benchmarks/bench_udp.py --host ::1
+"""
+import argparse
+import collections
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from network_discovery_tool.models import ip_family  # noqa: E402
+from network_discovery_tool.udp import CLOSED, OPEN, OPEN_FILTERED, UDPScanEngine  # noqa: E402
+
+# Tipo de cada puerto según su posición en el rango
+KINDS = ('open', 'closed', 'silent', 'lossy')
+EXPECTED = {'open': OPEN, 'closed': CLOSED, 'silent': OPEN_FILTERED, 'lossy': OPEN}
+
+
+class UDPResponders:
+    """Sockets UDP de loopback atendidos desde un hilo."""
+
+    def __init__(self, layout, host: str = '127.0.0.1'):
+        self.host = host
+        self.layout = layout  # {puerto: tipo}
+        self._selector = selectors.DefaultSelector()
+        self._sockets = []
+        self._seen = set()  # (puerto, origen) cuyo primer datagrama se descartó
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'UDPResponders':
+        for port, kind in self.layout.items():
+            if kind == 'closed':
+                continue
+            sock = socket.socket(ip_family(self.host), socket.SOCK_DGRAM)
+            sock.bind((self.host, port))
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ, (port, kind))
+            self._sockets.append(sock)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        while not self._stop.is_set():
+            for key, _ in self._selector.select(0.1):
+                port, kind = key.data
+                while True:
+                    try:
+                        data, address = key.fileobj.recvfrom(2048)
+                    except OSError:  # Incluye BlockingIOError: cola vacía
+                        break
+                    if kind == 'silent':
+                        continue
+                    if kind == 'lossy' and (port, address) not in self._seen:
+                        self._seen.add((port, address))
+                        continue
+                    key.fileobj.sendto(b'ok', address)
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._selector.close()
+        for sock in self._sockets:
+            sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escaneo UDP en loopback')
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección de loopback (default: 127.0.0.1)')
+    parser.add_argument('--base', type=int, default=40000, help='Primer puerto del rango (default: 40000)')
+    parser.add_argument('--ports', type=int, default=1000, help='Puertos a barrer (default: 1000)')
+    parser.add_argument('--concurrency', type=int, default=2048)
+    parser.add_argument('--timeout', type=float, default=0.2)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--host-rate', type=float, default=2000.0,
+                        help='Sondas/s iniciales por host; 0 = sin límite (default: 2000)')
+    args = parser.parse_args()
+
+    layout = {
+        port: KINDS[index % len(KINDS)]
+        for index, port in enumerate(range(args.base, args.base + args.ports))
+    }
+    responders = UDPResponders(layout, args.host).start()
+    try:
+        engine = UDPScanEngine(
+            timeout=args.timeout, retries=args.retries, host_rate=args.host_rate,
+            max_inflight=args.concurrency
+        )
+        start = time.perf_counter()
+        states = engine.scan((responders.host, port) for port in layout)
+        elapsed = time.perf_counter() - start
+    finally:
+        responders.close()
+
+    rate = len(layout) / elapsed if elapsed > 0 else 0
+    print(f"udp: {len(layout)} puertos en {elapsed:.3f} s ({rate:,.0f} puertos/seg)")
+    print(f"  estados: {dict(collections.Counter(states.values()))}")
+    print(f"  {engine.stats()}")
+    wrong = collections.Counter(
+        layout[port] for (_, port), state in states.items() if state != EXPECTED[layout[port]]
+    )
+    if wrong:
+        print(f"  ⚠️  Puertos mal clasificados por tipo: {dict(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks reproducible sobre objetivos locales.
+
+Mide NetworkScanner, PortScanner, generate_report y el CLI completo contra
+127.0.0.0/8 y listeners en 127.0.0.1 (abiertos, filtrados, lentos y
+servicios SSH/SMTP/HTTP falsos, ver targets.py), sin tráfico fuera de la máquina. Cada caso se ejecuta en su
+propio proceso para que el pico de memoria (RSS) sea solo suyo; con
+--repeat se toma la mediana de cada métrica.
+
+Uso:
+    python benchmarks/suite.py                              # Todos los casos
+    python benchmarks/suite.py --quick --output base.json   # Tamaños reducidos
+    python benchmarks/suite.py --cases ports_async,report_json
+    python benchmarks/suite.py --compare base.json          # Marca regresiones
+
+Con --compare el proceso termina con código 1 si alguna métrica empeora más
+que --threshold respecto a la línea base.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from targets import FAKE_SERVICES, LocalTargets, prime_slow_ports  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Tamaños por defecto y con --quick
+SIZES = {
+    'full': {'prefix': 18, 'hosts': 16, 'ports': 4000, 'report_hosts': 50000, 'e2e_prefix': 22,
+             'services': 300},
+    'quick': {'prefix': 22, 'hosts': 4, 'ports': 1000, 'report_hosts': 5000, 'e2e_prefix': 26,
+              'services': 60},
+}
+
+# Base de los puertos de los listeners locales
+PORT_BASE = 30000
+
+# Sentido de cada métrica: +1 cuanto más alta mejor, -1 cuanto más baja mejor
+METRIC_DIRECTIONS = {
+    'hosts_per_s': 1,
+    'ports_per_s': 1,
+    'services_per_s': 1,
+    'wall_s': -1,
+    'peak_rss_kb': -1,
+}
+
+
+def peak_rss_kb() -> int:
+    """Pico de memoria residente del proceso en KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def service_layout(count: int) -> Dict[int, str]:
+    """Servicios falsos justo por debajo de PORT_BASE, alternando SSH, SMTP y HTTP."""
+    kinds = sorted(FAKE_SERVICES)
+    return {PORT_BASE - 1 - index: kinds[index % len(kinds)] for index in range(count)}
+
+
+def port_layout(count: int) -> Dict[str, List[int]]:
+    """Reparto del rango: 1 de cada 4 abierto, unos pocos lentos y filtrados."""
+    ports = list(range(PORT_BASE, PORT_BASE + count))
+    special = max(1, count // 500)
+    slow = ports[:special]
+    filtered = ports[special:2 * special]
+    return {
+        'ports': ports,
+        'slow': slow,
+        'filtered': filtered,
+        'open': [port for port in ports[2 * special:] if port % 4 == 0],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Casos (se ejecutan en el proceso hijo)
+# ---------------------------------------------------------------------------
+
+def case_discovery_icmp(size: Dict, targets: Dict) -> Dict:
+    from network_discovery_tool.scanner import NetworkScanner
+
+    scanner = NetworkScanner(timeout=1, engine='icmp', max_inflight=4096, resolve=False)
+    start = time.perf_counter()
+    hosts = scanner.scan_network(f"127.0.0.0/{size['prefix']}")
+    elapsed = time.perf_counter() - start
+    expected = 2 ** (32 - size['prefix']) - 2
+    return {
+        'hosts': len(hosts),
+        'hosts_per_s': len(hosts) / elapsed,
+        'wall_s': elapsed,
+        'correct': len(hosts) == expected and scanner.engine == 'icmp',
+    }
+
+
+def _ports_case(engine: str, size: Dict, targets: Dict) -> Dict:
+    from network_discovery_tool.scanner import PortScanner
+
+    hosts = [{'ip': f"127.0.0.{index}"} for index in range(1, size['hosts'] + 1)]
+    ports = range(PORT_BASE, PORT_BASE + size['ports'])
+    scanner = PortScanner(timeout=1.5, max_threads=200, engine=engine, max_inflight=4096)
+    # La conexión lenta de la repetición anterior puede seguir en la cola
+    time.sleep(targets['slow_delay'])
+    fillers = prime_slow_ports(targets['host'], targets['slow_ports'])
+    try:
+        start = time.perf_counter()
+        results = scanner.scan_hosts_ports(hosts, ports)
+        elapsed = time.perf_counter() - start
+    finally:
+        for sock in fillers:
+            sock.close()
+    found = {port['port'] for port in results.get(targets['host'], [])}
+    expected = set(targets['open_ports']) | set(targets['slow_ports'])
+    probes = len(hosts) * len(ports)
+    return {
+        'probes': probes,
+        'open': sum(len(open_ports) for open_ports in results.values()),
+        'ports_per_s': probes / elapsed,
+        'wall_s': elapsed,
+        'correct': found == expected,
+    }
+
+
+def case_ports_thread(size: Dict, targets: Dict) -> Dict:
+    return _ports_case('thread', size, targets)
+
+
+def case_ports_async(size: Dict, targets: Dict) -> Dict:
+    return _ports_case('async', size, targets)
+
+
+def case_services(size: Dict, targets: Dict) -> Dict:
+    from network_discovery_tool.scanner import PortScanner
+    from network_discovery_tool.services import ServiceDetector
+
+    services = {int(port): kind for port, kind in targets['services'].items()}
+    detector = ServiceDetector(max_concurrent=256, timeout=2.0)
+    scanner = PortScanner(timeout=1.0, engine='async', max_inflight=1024, services=detector)
+    start = time.perf_counter()
+    results = scanner.scan_hosts_ports([{'ip': targets['host']}], set(services))
+    elapsed = time.perf_counter() - start
+    detector.close()
+    found = {port['port']: port['service'] for port in results.get(targets['host'], [])}
+    expected = {port: FAKE_SERVICES[kind][2] for port, kind in services.items()}
+    return {
+        'services': len(found),
+        'services_per_s': len(found) / elapsed,
+        'wall_s': elapsed,
+        'correct': found == expected,
+    }
+
+
+def _report_case(format_type: str, size: Dict) -> Dict:
+    from network_discovery_tool.models import HostResult
+    from network_discovery_tool.output import generate_report
+    from network_discovery_tool.scanner import PortScanner, SERVICE_PORTS
+
+    common = sorted(SERVICE_PORTS)
+    hosts = []
+    port_info = {}
+    for index in range(size['report_hosts']):
+        ip = f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+        host = HostResult(ip, f"host-{index}.local", index % 200)
+        if index % 4:
+            host.open_ports = port_info[ip] = [
+                PortScanner._port_entry(common[(index + offset) % len(common)])
+                for offset in range(3)
+            ]
+        hosts.append(host)
+
+    start = time.perf_counter()
+    report = generate_report(hosts, format_type, port_info, service_scan=True)
+    elapsed = time.perf_counter() - start
+    return {
+        'bytes': len(report),
+        'hosts_per_s': len(hosts) / elapsed,
+        'wall_s': elapsed,
+        'correct': len(report) > 0,
+    }
+
+
+def case_end_to_end(size: Dict, targets: Dict) -> Dict:
+    """CLI completo: descubrimiento ICMP, puertos asíncronos y reporte JSON."""
+    from network_discovery_tool import cli
+
+    argv = [
+        'ndiscover-pro', f"127.0.0.0/{size['e2e_prefix']}",
+        '--engine', 'icmp', '--concurrency', '4096',
+        '-p', f"{PORT_BASE}-{PORT_BASE + 199}", '--port-engine', 'async',
+        '--port-timeout', '0.5', '-n', '--no-history', '-o', 'json'
+    ]
+    workdir = tempfile.mkdtemp(prefix='ndiscover-bench-')
+    cwd = os.getcwd()
+    stdout = sys.stdout
+    start = time.perf_counter()
+    try:
+        os.chdir(workdir)
+        sys.argv = argv
+        sys.stdout = io.StringIO()
+        try:
+            cli.main()
+        except SystemExit as e:
+            status = e.code
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'wall_s': elapsed,
+        'correct': status == 0,
+    }
+
+
+CASES: Dict[str, Callable[[Dict, Dict], Dict]] = {
+    'discovery_icmp': case_discovery_icmp,
+    'ports_thread': case_ports_thread,
+    'ports_async': case_ports_async,
+    'services': case_services,
+    'report_text': lambda size, targets: _report_case('text', size),
+    'report_json': lambda size, targets: _report_case('json', size),
+    'report_jsonl': lambda size, targets: _report_case('jsonl', size),
+    'report_csv': lambda size, targets: _report_case('csv', size),
+    'report_html': lambda size, targets: _report_case('html', size),
+    'end_to_end': case_end_to_end,
+}
+
+
+def run_child(name: str, size: Dict, targets: Dict):
+    """Modo hijo: ejecuta un caso y escribe sus métricas como JSON en stdout."""
+    import logging
+    logging.disable(logging.INFO)  # Los logs del escáner no forman parte de la medida
+    result = CASES[name](size, targets)
+    result['peak_rss_kb'] = peak_rss_kb()
+    sys.stdout.write(json.dumps(result) + '\n')
+
+
+# ---------------------------------------------------------------------------
+# Proceso principal
+# ---------------------------------------------------------------------------
+
+def run_case(name: str, size: Dict, targets: Dict, repeat: int) -> Dict:
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name,
+             '--child-args', json.dumps({'size': size, 'targets': targets})],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+        )
+        if output.returncode != 0:
+            return {'error': output.stderr.strip().splitlines()[-1] if output.stderr else 'sin salida'}
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        if isinstance(values[0], bool):
+            summary[key] = all(values)
+        elif isinstance(values[0], (int, float)):
+            summary[key] = round(statistics.median(values), 3)
+        else:
+            summary[key] = values[0]
+    summary['runs'] = len(runs)
+    return summary
+
+
+def metadata(args) -> Dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'size': 'quick' if args.quick else 'full',
+        'repeat': args.repeat,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Imprime la comparación y retorna las regresiones encontradas."""
+    regressions = []
+    print(f"\nComparación con la línea base ({baseline['meta'].get('commit') or 'sin commit'}, "
+          f"umbral {threshold:.0%}):")
+    for name, current in results['cases'].items():
+        previous = baseline['cases'].get(name)
+        if not previous or 'error' in previous:
+            continue
+        if 'error' in current or (previous.get('correct') and not current.get('correct')):
+            print(f"  {name:<16} resultado incorrecto o error  REGRESIÓN")
+            regressions.append(f"{name}.correct")
+            continue
+        for metric, direction in METRIC_DIRECTIONS.items():
+            if metric not in current or not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            worse = -change * direction > threshold
+            mark = 'REGRESIÓN' if worse else ''
+            print(f"  {name:<16} {metric:<12} {previous[metric]:>14,.2f} → "
+                  f"{current[metric]:>14,.2f} ({change:+.1%}) {mark}")
+            if worse:
+                regressions.append(f"{name}.{metric} {change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suite de benchmarks sobre objetivos locales')
+    parser.add_argument('--cases', default='all',
+                        help=f"Casos separados por comas (default: all): {', '.join(CASES)}")
+    parser.add_argument('--quick', action='store_true', help='Tamaños reducidos')
+    parser.add_argument('--repeat', type=int, default=3, help='Ejecuciones por caso; se usa la mediana (default: 3)')
+    parser.add_argument('--output', help='Fichero JSON donde guardar los resultados')
+    parser.add_argument('--compare', metavar='BASELINE', help='Resultados JSON con los que comparar')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Empeoramiento relativo que se considera regresión (default: 0.10)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--child-args', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_args = json.loads(args.child_args)
+        run_child(args.child, child_args['size'], child_args['targets'])
+        return
+
+    names = list(CASES) if args.cases == 'all' else args.cases.split(',')
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"casos desconocidos: {', '.join(unknown)}")
+
+    size = SIZES['quick' if args.quick else 'full']
+    layout = port_layout(size['ports'])
+    results = {'meta': metadata(args), 'cases': {}}
+
+    services = service_layout(size['services'])
+    with LocalTargets(layout['open'], layout['filtered'], layout['slow'],
+                      services=services) as targets:
+        spec = targets.spec()
+        print(f"Objetivos: {len(layout['open'])} abiertos, {len(layout['filtered'])} filtrados, "
+              f"{len(layout['slow'])} lentos y {len(services)} servicios en {spec['host']}")
+        for name in names:
+            result = run_case(name, size, spec, args.repeat)
+            results['cases'][name] = result
+            if 'error' in result:
+                print(f"  {name:<16} ERROR: {result['error']}")
+                continue
+            rate = result.get('hosts_per_s') or result.get('ports_per_s') or \
+                result.get('services_per_s')
+            rate_text = f"{rate:>12,.0f}/s" if rate else ' ' * 14
+            flag = '' if result.get('correct', True) else '  ⚠️  resultado inesperado'
+            print(f"  {name:<16} {rate_text}  {result['wall_s']:>8.3f} s  "
+                  f"{result['peak_rss_kb'] / 1024:>7.1f} MiB{flag}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/targets.py
+"""
+Objetivos locales para los benchmarks, sin red externa.
+
+- Puertos abiertos: listeners en 127.0.0.1 cuyas conexiones se aceptan
+  desde un hilo y se cierran cuando el escáner cierra su extremo, para que
+  la cola nunca se llene entre repeticiones.
+- Puertos filtrados: listeners con la cola de aceptación llena y nunca
+  atendida; el kernel descarta los SYN y las sondas agotan su timeout.
+- Puertos lentos: como los filtrados, pero el hilo vacía la cola
+  `slow_delay` segundos después de que se llene. Si el escáner llama a
+  `prime_slow_ports` justo antes de sondear, su primer SYN se descarta y la
+  conexión se completa con la retransmisión (~1 s en Linux).
+- Servicios falsos: listeners SSH, SMTP y HTTP que envían un banner al
+  aceptar (SSH, SMTP) o responden a la primera petición (HTTP), para medir
+  y comprobar la detección de servicios.
+
+Todas las direcciones 127.x.y.z responden a ICMP en Linux, por lo que el
+descubrimiento puede medirse contra cualquier prefijo de 127.0.0.0/8.
+"""
+import heapq
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from network_discovery_tool.tcp import close_with_rst, fd_budget  # noqa: E402
+
+# Con backlog 0 basta una conexión pendiente para llenar la cola
+_FILLERS_PER_PORT = 1
+
+# Servicios falsos: (banner al aceptar, respuesta a la primera petición, servicio esperado)
+FAKE_SERVICES = {
+    'ssh': (b'SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13\r\n', None, 'SSH OpenSSH_9.6p1'),
+    'smtp': (b'220 mail.bench.local ESMTP Postfix (Ubuntu)\r\n', None, 'SMTP Postfix'),
+    'http': (None, b'HTTP/1.1 200 OK\r\nServer: nginx/1.24.0\r\nContent-Length: 0\r\n\r\n',
+             'HTTP nginx/1.24.0'),
+}
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def prime_slow_ports(host: str, ports: Iterable[int]) -> List[socket.socket]:
+    """
+    Llena la cola de los puertos lentos; retorna los sockets de relleno.
+
+    Debe llamarse desde el proceso que va a escanear, justo antes de hacerlo,
+    y mantener los sockets abiertos hasta terminar.
+    """
+    fillers = []
+    for port in ports:
+        for _ in range(_FILLERS_PER_PORT):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            sock.connect_ex((host, port))
+            fillers.append(sock)
+    time.sleep(0.05)  # Dar tiempo a que se completen los handshakes
+    return fillers
+
+
+class LocalTargets:
+    """Listeners abiertos, filtrados y lentos en una dirección de loopback."""
+
+    def __init__(self, open_ports: Iterable[int] = (), filtered_ports: Iterable[int] = (),
+                 slow_ports: Iterable[int] = (), slow_delay: float = 0.5,
+                 host: str = '127.0.0.1', services: Optional[Dict[int, str]] = None):
+        self.host = host
+        # {puerto: clave de FAKE_SERVICES}
+        self.services = dict(services or {})
+        self.open_ports = sorted(open_ports)
+        self.filtered_ports = sorted(filtered_ports)
+        self.slow_ports = sorted(slow_ports)
+        self.slow_delay = slow_delay
+        self._sockets: List[socket.socket] = []
+        self._fillers: List[socket.socket] = []
+        self._selector = selectors.DefaultSelector()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def spec(self) -> Dict:
+        """Descripción serializable para los procesos que escanean."""
+        return {
+            'host': self.host,
+            'open_ports': self.open_ports,
+            'filtered_ports': self.filtered_ports,
+            'slow_ports': self.slow_ports,
+            'slow_delay': self.slow_delay,
+            'services': {str(port): kind for port, kind in self.services.items()}
+        }
+
+    def start(self) -> 'LocalTargets':
+        needed = len(self.open_ports) + len(self.slow_ports) + len(self.services) + \
+            len(self.filtered_ports) * (1 + _FILLERS_PER_PORT)
+        if needed > fd_budget():
+            raise RuntimeError(
+                f"Se necesitan {needed} descriptores y RLIMIT_NOFILE solo permite {fd_budget()}"
+            )
+        for port in self.open_ports:
+            sock = _listen(self.host, port, 128)
+            self._selector.register(sock, selectors.EVENT_READ, 'open')
+            self._sockets.append(sock)
+        for port, kind in self.services.items():
+            sock = _listen(self.host, port, 128)
+            self._selector.register(sock, selectors.EVENT_READ, ('service', kind))
+            self._sockets.append(sock)
+        for port in self.slow_ports:
+            sock = _listen(self.host, port, 0)
+            self._selector.register(sock, selectors.EVENT_READ, 'slow')
+            self._sockets.append(sock)
+        for port in self.filtered_ports:
+            self._sockets.append(_listen(self.host, port, 0))
+        # Los filtrados se llenan una vez y nunca se atienden
+        self._fillers = prime_slow_ports(self.host, self.filtered_ports)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def _drain(self, sock: socket.socket, kind: Optional[str] = None):
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:  # Incluye BlockingIOError: cola vacía
+                return
+            # Cerrar antes que el escáner haría que viera un RST en lugar de
+            # la conexión establecida
+            conn.setblocking(False)
+            if kind is None:
+                self._selector.register(conn, selectors.EVENT_READ, 'conn')
+                continue
+            banner = FAKE_SERVICES[kind][0]
+            if banner:
+                conn.send(banner)
+            self._selector.register(conn, selectors.EVENT_READ, ('reply', kind))
+
+    def _reply(self, conn: socket.socket, kind: str):
+        """Responde a la petición del escáner o cierra si ha cerrado su extremo."""
+        try:
+            data = conn.recv(4096)
+        except OSError:
+            data = b''
+        response = FAKE_SERVICES[kind][1]
+        if data and response:
+            conn.send(response)
+        elif not data:
+            self._selector.unregister(conn)
+            close_with_rst(conn)
+
+    def _serve(self):
+        due = []  # (instante, fd, socket) de los puertos lentos pendientes de vaciar
+        scheduled = set()
+        while not self._stop.is_set():
+            timeout = 0.1
+            if due:
+                timeout = max(0.0, min(timeout, due[0][0] - time.monotonic()))
+            for key, _ in self._selector.select(timeout):
+                sock = key.fileobj
+                if key.data == 'conn':
+                    self._selector.unregister(sock)
+                    close_with_rst(sock)
+                elif isinstance(key.data, tuple):
+                    role, kind = key.data
+                    if role == 'service':
+                        self._drain(sock, kind)
+                    else:
+                        self._reply(sock, kind)
+                elif key.data == 'open':
+                    self._drain(sock)
+                elif sock.fileno() not in scheduled:
+                    scheduled.add(sock.fileno())
+                    heapq.heappush(due, (time.monotonic() + self.slow_delay, sock.fileno(), sock))
+                    self._selector.unregister(sock)
+            now = time.monotonic()
+            while due and due[0][0] <= now:
+                _, fd, sock = heapq.heappop(due)
+                self._drain(sock)
+                scheduled.discard(fd)
+                self._selector.register(sock, selectors.EVENT_READ, 'slow')
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for key in list(self._selector.get_map().values()):
+            if key.data == 'conn' or (isinstance(key.data, tuple) and key.data[0] == 'reply'):
+                key.fileobj.close()
+        self._selector.close()
+        for sock in self._fillers + self._sockets:
+            sock.close()
+        self._sockets = []
+        self._fillers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,275 @@
+# network_discovery_tool/checkpoint.py
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from .logger import get_logger
+from .models import HostResult, PortResult
+from .targets import Interval, IntervalSet, TargetSet
+
+# Versión del formato del journal
+JOURNAL_VERSION = 1
+
+# Direcciones por bloque de descubrimiento (un /16)
+DEFAULT_BLOCK = 65536
+
+# Registros de puertos acumulados antes de escribirlos en el fichero
+BATCH_SIZE = 256
+
+# Segundos mínimos entre dos fsync de registros de puertos
+SYNC_INTERVAL = 2.0
+
+
+def scan_fingerprint(targets: TargetSet, ports_spec: str = '', service_scan: bool = False,
+                     protocol: str = 'TCP') -> str:
+    """Identifica los parámetros que determinan el resultado de un escaneo."""
+    digest = hashlib.sha1()
+    digest.update(repr(targets.intervals()).encode('ascii'))
+    digest.update(f"|{ports_spec}|{int(service_scan)}".encode('utf-8'))
+    if protocol != 'TCP':
+        # Los journals TCP anteriores conservan su huella
+        digest.update(f"|{protocol}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def split_blocks(targets: IntervalSet, block_size: int, label: str = '') -> Iterator[TargetSet]:
+    """
+    Reparte los objetivos en bloques consecutivos de `block_size` direcciones.
+
+    Los intervalos se cortan por número de direcciones, así una lista de IPs
+    sueltas no produce un bloque por IP.
+    """
+    block: List[Interval] = []
+    count = 0
+    for first, last in targets.intervals():
+        while first <= last:
+            end = min(last, first + block_size - count - 1)
+            block.append((first, end))
+            count += end - first + 1
+            first = end + 1
+            if count == block_size:
+                yield TargetSet(block, label)
+                block, count = [], 0
+    if block:
+        yield TargetSet(block, label)
+
+
+class ScanJournal:
+    """
+    Journal de un escaneo en curso para poder reanudarlo (`--resume`).
+
+    Es un fichero JSON Lines de solo añadido:
+    - 'journal': cabecera con la versión y la huella del escaneo
+    - 'h': host activo [ip, hostname, ms]
+    - 'r': intervalos de objetivos cuyo descubrimiento terminó
+    - 'p': puertos abiertos de un host [ip, [[puerto, servicio, protocolo], ...]]
+
+    Los hosts de un bloque se escriben junto con su 'r' y un fsync, de modo
+    que un bloque cuenta como hecho solo si sus hosts están en disco. Los
+    puertos se añaden en lotes con como mucho un fsync cada `sync_interval`
+    segundos; si se pierden, esos hosts se vuelven a escanear. Una última
+    línea incompleta (corte a mitad de escritura) se descarta al cargar.
+    """
+
+    def __init__(self, path: str, fingerprint: str, target: str = '', resume: bool = False,
+                 sync_interval: float = SYNC_INTERVAL):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.sync_interval = sync_interval
+        self.logger = get_logger()
+        self.completed = IntervalSet()
+        self.hosts: Dict[object, HostResult] = {}
+        self.port_results: Dict[str, List[PortResult]] = {}
+        self.resumed = False
+        self._pending: List[str] = []
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            if not resume:
+                raise ValueError(
+                    f"Ya existe el journal {path}: usa --resume para continuar ese escaneo "
+                    "o bórralo para empezar de nuevo"
+                )
+            self._load()
+            self.resumed = True
+            self._fh = open(path, 'a', encoding='utf-8')
+        else:
+            self._fh = open(path, 'w', encoding='utf-8')
+            self._write([{'journal': JOURNAL_VERSION, 'fingerprint': fingerprint, 'target': target}])
+            self._sync()
+
+    def _load(self):
+        """Lee el journal existente y descarta una última línea incompleta."""
+        valid = 0
+        completed: List[Interval] = []
+        hosts: List[HostResult] = []
+        with open(self.path, 'rb') as fh:
+            header = None
+            for raw in fh:
+                if not raw.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(raw.decode('utf-8'))
+                except ValueError:
+                    break
+                valid += len(raw)
+                if header is None:
+                    header = record
+                    if header.get('journal') != JOURNAL_VERSION:
+                        raise ValueError(f"{self.path} no es un journal de escaneo compatible")
+                    if header.get('fingerprint') != self.fingerprint:
+                        raise ValueError(
+                            f"El journal {self.path} corresponde a otro escaneo "
+                            f"({header.get('target')}); los objetivos o los puertos no coinciden"
+                        )
+                elif 'h' in record:
+                    hosts.append(HostResult(*record['h']))
+                elif 'r' in record:
+                    completed.extend(tuple(interval) for interval in record['r'])
+                elif 'p' in record:
+                    ip, entries = record['p']
+                    self.port_results[ip] = [PortResult.shared(*entry) for entry in entries]
+        if header is None:
+            raise ValueError(f"El journal {self.path} está vacío o dañado")
+        if valid < os.path.getsize(self.path):
+            self.logger.warning("Descartada una escritura incompleta al final de %s", self.path)
+            with open(self.path, 'r+b') as fh:
+                fh.truncate(valid)
+
+        self.completed = IntervalSet(completed)
+        # Hosts de bloques sin terminar: se redescubren al reanudar
+        self.hosts = {host.ip_int: host for host in hosts if host.ip_int in self.completed}
+
+    def _write(self, records: Sequence[Dict]):
+        self._fh.write(''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in records
+        ))
+
+    def _sync(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._last_sync = time.monotonic()
+
+    def pending(self, targets: TargetSet) -> TargetSet:
+        """Objetivos cuyo descubrimiento aún no consta como terminado."""
+        remaining = TargetSet(targets.intervals(), targets.label)
+        remaining.difference_update(self.completed.intervals())
+        return remaining
+
+    def record_block(self, intervals: List[Interval], hosts: List[HostResult]):
+        """Anota un bloque de descubrimiento terminado y sus hosts (con fsync)."""
+        records = [{'h': [host.ip, host.hostname, host.response_time]} for host in hosts]
+        records.append({'r': [list(interval) for interval in intervals]})
+        with self._lock:
+            self._fh.write(''.join(self._pending))
+            self._pending = []
+            self._write(records)
+            self._sync()
+        self.completed.update(intervals)
+        for host in hosts:
+            self.hosts[host.ip_int] = host
+
+    def record_ports(self, ip: str, open_ports: List[PortResult]):
+        """Anota los puertos de un host; se escriben por lotes."""
+        line = json.dumps(
+            {'p': [ip, [[port.port, port.service, port.protocol] for port in open_ports]]},
+            ensure_ascii=False, separators=(',', ':')
+        ) + '\n'
+        with self._lock:
+            self.port_results[ip] = open_ports
+            self._pending.append(line)
+            if len(self._pending) < BATCH_SIZE and \
+                    time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            self._fh.write(''.join(self._pending))
+            self._pending = []
+            self._sync()
+
+    def close(self):
+        """Escribe lo pendiente y cierra el fichero; el journal se conserva."""
+        with self._lock:
+            if self._fh.closed:
+                return
+            if self._pending:
+                self._fh.write(''.join(self._pending))
+                self._pending = []
+            self._sync()
+            self._fh.close()
+
+    def remove(self):
+        """Cierra y borra el journal (el escaneo terminó)."""
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def scan_with_journal(scanner, targets: TargetSet, journal: ScanJournal,
+                      block_size: int = DEFAULT_BLOCK,
+                      on_host: Optional[Callable[[HostResult], None]] = None) -> List[HostResult]:
+    """
+    Descubrimiento por bloques que anota cada bloque terminado en el journal.
+
+    `scanner` es un NetworkScanner o un ShardedScanner. Los bloques ya
+    terminados se omiten y sus hosts se recuperan del journal. Los hosts se
+    retornan ordenados por IP, así el reporte de un escaneo reanudado es
+    idéntico al de uno sin interrupciones. `on_host` solo recibe los hosts
+    descubiertos en esta ejecución.
+    """
+    logger = journal.logger
+    core = getattr(scanner, 'scanner', scanner)
+    remaining = journal.pending(targets)
+    if journal.resumed:
+        logger.info(
+            "Reanudando desde %s: %s de %s direcciones ya escaneadas, %d hosts recuperados",
+            journal.path, f"{len(targets) - len(remaining):,}", f"{len(targets):,}",
+            len(journal.hosts)
+        )
+
+    start_time = time.time()
+    probes_sent = 0
+    for block in split_blocks(remaining, block_size, targets.label):
+        found = scanner.scan_target_set(block, on_host)
+        probes_sent += core.probes_sent
+        journal.record_block(block.intervals(), found)
+        logger.debug(
+            "Bloque anotado en el journal: %d direcciones, %d hosts", len(block), len(found)
+        )
+
+    hosts = sorted(journal.hosts.values(), key=lambda host: host.ip_int)
+    # Estadísticas del escaneo completo, no solo del último bloque
+    core.scan_duration = time.time() - start_time
+    core.probes_sent = probes_sent
+    core.active_hosts = hosts
+    return hosts
+
+
+def scan_ports_with_journal(port_scanner, hosts: List[HostResult], ports, journal: ScanJournal,
+                            on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None
+                            ) -> Dict[str, List[PortResult]]:
+    """
+    Escaneo de puertos que omite los hosts ya anotados en el journal.
+
+    `port_scanner` es un PortScanner o un ShardedScanner; los resultados
+    conservan el orden de `hosts`. `on_host_done` solo recibe los hosts
+    escaneados en esta ejecución.
+    """
+    remaining = [host for host in hosts if host.ip not in journal.port_results]
+    if len(remaining) < len(hosts):
+        journal.logger.info(
+            "%d hosts con los puertos ya escaneados en el journal", len(hosts) - len(remaining)
+        )
+    def host_done(ip: str, open_ports: List[PortResult]):
+        journal.record_ports(ip, open_ports)
+        if on_host_done:
+            on_host_done(ip, open_ports)
+
+    if remaining:
+        port_scanner.scan_hosts_ports(remaining, ports, host_done)
+    return {host.ip: journal.port_results.get(host.ip, []) for host in hosts}
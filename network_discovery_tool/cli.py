@@ -2,6 +2,7 @@
 import argparse
 import sys
 import os
+from datetime import datetime
 from typing import Optional
 
 # Importaciones diferidas para mejor performance
@@ -18,26 +19,122 @@ Ejemplos de uso:
   %(prog)s 192.168.1.0/24 -p 22,80,443      # Escanea hosts + puertos comunes
   %(prog)s 192.168.1.0/24 -p 1-100          # Escanea primeros 100 puertos
   %(prog)s 192.168.1.0/24 -p all            # Escanea puertos 1-1000
-  %(prog)s 192.168.1.0/24 --service-scan    # Detecta servicios en puertos
+  %(prog)s 192.168.1.0/24 --top-ports 100   # Los 100 puertos más frecuentes
+  %(prog)s 192.168.1.10 -p-                 # Los 65535 puertos, más probables primero
+  %(prog)s 192.168.1.0/24 -p all --port-engine async  # Connects no bloqueantes
+  %(prog)s 192.168.1.0/24 -p 53,123,161,514 --port-engine udp
+                                            # Escaneo UDP (DNS, NTP, SNMP, syslog)
+  %(prog)s 10.1.0.0/16 10.2.0.0/16 --exclude 10.1.0.0/24
+                                            # Varias redes sin una subred
+  %(prog)s 2001:db8:1::/64 --engine icmp --ipv6-hint 52:54:00:12:34:56
+                                            # IPv6: bajas, EUI-64 de la MAC y vecinos
+  %(prog)s -iL sites.txt -p 22,443          # Objetivos desde fichero ('-' = stdin)
+  %(prog)s 192.168.1.0/24 -p 1-1024 --service-scan
+                                            # Detecta servicios por su banner
+  %(prog)s 10.0.0.0/16 --engine icmp -p 22,80,443 --pipeline
+                                            # Puertos de cada host en cuanto aparece
   %(prog)s 192.168.1.0/24 -o html           # Genera reporte HTML
+  %(prog)s 192.168.1.0/24 -o jsonl          # Un objeto JSON por host (JSON Lines)
+  %(prog)s 10.0.0.0/16 -p 22,443 --stream - | jq -c 'select(.event == "port_open")'
+                                            # Eventos NDJSON en vivo por stdout
+  %(prog)s 192.168.1.0/24 --engine icmp     # Descubrimiento ICMP sin procesos ping
+  %(prog)s 10.0.0.0/8 --engine icmp --workers 0  # Un proceso de escaneo por núcleo
+  %(prog)s 10.0.0.0/16 --engine probe --probes tcp,udp --tcp-probe-ports 22,443
+                                            # Descubrimiento sin ICMP (connect TCP/UDP)
+  %(prog)s 10.0.0.0/16 -p 22,443 --rate 2000 --max-per-subnet 64
+                                            # Máx. 2000 sondas/s y 64 en vuelo por /24
+  %(prog)s 192.168.1.0/24 -p 1-1024 --metrics scan.prom
+                                            # Métricas de sondas y fases (Prometheus)
+  %(prog)s 192.168.1.0/24 -n                # Sin resolución inversa (PTR)
+  %(prog)s 192.168.1.0/24 --adaptive-timeout # Timeouts según el RTT medido
+  %(prog)s --list-scans                     # Escaneos guardados en el historial
+  %(prog)s --diff 3 7                       # Cambios entre los escaneos 3 y 7
+  %(prog)s 192.168.1.0/24 -p 22,80 --incremental --fresh-window 3600
+                                            # Reescaneo: hosts conocidos primero
+  %(prog)s 10.0.0.0/12 --engine icmp --checkpoint sweep.journal
+                                            # Barrido reanudable tras Ctrl+C o un corte
+  %(prog)s 10.0.0.0/12 --engine icmp --checkpoint sweep.journal --resume
+  %(prog)s --daemon --engine icmp -p 22,443 # Servicio con API en 127.0.0.1:8765
+  %(prog)s --daemon --listen unix:/run/ndiscover.sock
+                                            # API por un socket Unix
   %(prog)s 192.168.1.0/24 --verbose         # Modo detallado
   %(prog)s 192.168.1.0/24 --log-level DEBUG # Logging detallado
         """
     )
     
-    # Argumento obligatorio
+    # Objetivos (obligatorios salvo para las consultas de historial)
     parser.add_argument(
         'network',
-        help='Red a escanear en formato CIDR (ej. 192.168.1.0/24)'
+        nargs='*',
+        metavar='OBJETIVO',
+        help='Redes CIDR (192.168.1.0/24, 2001:db8::/64), rangos (10.0.0.1-50, '
+             '10.0.0.1-10.0.1.20 o 2001:db8::1-ff), IPs o nombres de host; '
+             'los solapamientos se sondean una sola vez'
+    )
+    
+    # Objetivos adicionales y exclusiones
+    target_group = parser.add_argument_group('Objetivos')
+    target_group.add_argument(
+        '-iL', '--target-file',
+        action='append',
+        default=[],
+        metavar='FICHERO',
+        help="Lee objetivos de un fichero ('-' = stdin): uno o varios por línea, # comenta"
+    )
+    target_group.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='OBJETIVOS',
+        help='Objetivos a excluir, separados por comas (repetible)'
+    )
+    target_group.add_argument(
+        '--exclude-file',
+        action='append',
+        default=[],
+        metavar='FICHERO',
+        help='Lee de un fichero los objetivos a excluir'
+    )
+    target_group.add_argument(
+        '--ipv6-hint',
+        action='append',
+        default=[],
+        metavar='PISTAS',
+        help='MACs (EUI-64) o IPv6 a sondear dentro de los prefijos IPv6 mayores '
+             'de /112, separadas por comas (repetible)'
+    )
+    target_group.add_argument(
+        '--ipv6-low',
+        type=int,
+        default=256,
+        metavar='N',
+        help='Direcciones bajas (::1 a ::N) por prefijo IPv6 grande (default: 256)'
+    )
+    target_group.add_argument(
+        '--no-neighbors',
+        action='store_true',
+        help='No usa las tablas de vecinos (NDP/ARP) como pistas IPv6'
     )
     
     # Opciones de escaneo de hosts
     scan_group = parser.add_argument_group('Opciones de escaneo de hosts')
     scan_group.add_argument(
         '-t', '--timeout',
-        type=int,
+        type=float,
         default=2,
-        help='Timeout en segundos para ping (default: 2)'
+        help='Timeout en segundos para ping, admite milisegundos (default: 2)'
+    )
+    scan_group.add_argument(
+        '--adaptive-timeout',
+        action='store_true',
+        help='Ajusta los timeouts de sonda y de conexión por subred /24 según el '
+             'RTT medido; --timeout y --port-timeout pasan a ser el techo'
+    )
+    scan_group.add_argument(
+        '--min-timeout',
+        type=float,
+        default=0.05,
+        help='Suelo en segundos de los timeouts adaptativos (default: 0.05)'
     )
     scan_group.add_argument(
         '--threads',
@@ -45,13 +142,121 @@ Ejemplos de uso:
         default=50,
         help='Número máximo de hilos concurrentes (default: 50)'
     )
+    scan_group.add_argument(
+        '--engine',
+        choices=['ping', 'icmp', 'probe'],
+        default='ping',
+        help='Motor de descubrimiento: ping (un proceso por IP), icmp '
+             '(sockets ICMP asíncronos en proceso) o probe (sondas TCP/UDP '
+             'no bloqueantes, ver --probes) (default: ping)'
+    )
+    scan_group.add_argument(
+        '--probes',
+        default='tcp',
+        help='Sondas del motor probe separadas por comas: tcp, udp, icmp. '
+             'Se lanzan a la vez y la primera respuesta marca el host activo (default: tcp)'
+    )
+    scan_group.add_argument(
+        '--tcp-probe-ports',
+        default='80,443,22,445,3389',
+        help='Puertos de la sonda tcp; SYN-ACK o RST indican host activo '
+             '(default: 80,443,22,445,3389)'
+    )
+    scan_group.add_argument(
+        '--udp-probe-ports',
+        default='40125',
+        help='Puertos de la sonda udp; respuesta o ICMP port unreachable indican '
+             'host activo (default: 40125)'
+    )
+    scan_group.add_argument(
+        '--concurrency',
+        type=int,
+        default=1024,
+        help='Sondas simultáneas en vuelo para los motores asíncronos (default: 1024)'
+    )
+    scan_group.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Procesos de escaneo: el rango se reparte en fragmentos, cada uno con su '
+             'propio motor (--threads y --concurrency son por proceso); '
+             '0 = uno por núcleo (default: 1)'
+    )
+    
+    # Control de tasa (compartido por descubrimiento y puertos)
+    rate_group = parser.add_argument_group('Control de tasa')
+    rate_group.add_argument(
+        '--rate',
+        type=float,
+        default=0,
+        metavar='PPS',
+        help='Sondas por segundo en total, espaciadas de forma uniforme; '
+             '0 = sin límite (default: 0)'
+    )
+    rate_group.add_argument(
+        '--burst',
+        type=int,
+        default=1,
+        help='Sondas que pueden salir seguidas por encima de --rate (default: 1)'
+    )
+    rate_group.add_argument(
+        '--max-per-host',
+        type=int,
+        default=0,
+        help='Sondas en vuelo por destino; 0 = sin límite (default: 0)'
+    )
+    rate_group.add_argument(
+        '--max-per-subnet',
+        type=int,
+        default=0,
+        help='Sondas en vuelo por subred /24; 0 = sin límite (default: 0)'
+    )
+    
+    # Opciones de resolución inversa
+    dns_group = parser.add_argument_group('Opciones de resolución DNS')
+    dns_group.add_argument(
+        '-n', '--no-resolve',
+        action='store_true',
+        help='No resuelve nombres de host (PTR) de los hosts activos'
+    )
+    dns_group.add_argument(
+        '--dns-server',
+        help='Servidor DNS para consultas PTR en formato IP[:PUERTO] o [IPv6]:PUERTO '
+             '(default: resolvedor del sistema)'
+    )
+    dns_group.add_argument(
+        '--dns-workers',
+        type=int,
+        default=16,
+        help='Consultas PTR simultáneas (default: 16)'
+    )
+    dns_group.add_argument(
+        '--dns-cache',
+        metavar='FICHERO',
+        help='Fichero JSON donde persistir la caché DNS entre ejecuciones'
+    )
+    dns_group.add_argument(
+        '--dns-ttl',
+        type=float,
+        default=3600,
+        help='TTL máximo en segundos de la caché positiva (default: 3600)'
+    )
     
     # Opciones de escaneo de puertos
     port_group = parser.add_argument_group('Opciones de escaneo de puertos')
     port_group.add_argument(
         '-p', '--ports',
         default='',
-        help='Puertos a escanear (ej: 22,80,443 o 1-100 o "all" para 1-1000)'
+        help='Puertos a escanear (ej: 22,80,443 o 1-100, "all" para 1-1000 o "-" para '
+             '1-65535); se sondean de más a menos probable'
+    )
+    port_group.add_argument(
+        '--top-ports',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Escanea los N puertos más frecuentes según la tabla de frecuencias incluida '
+             '(en lugar de -p)'
     )
     port_group.add_argument(
         '--port-timeout',
@@ -59,19 +264,197 @@ Ejemplos de uso:
         default=1.0,
         help='Timeout por puerto en segundos (default: 1.0)'
     )
+    port_group.add_argument(
+        '--port-engine',
+        choices=['thread', 'async', 'udp'],
+        default='thread',
+        help='Motor de escaneo de puertos: thread (connect bloqueante por hilo), '
+             'async (miles de connects no bloqueantes, ver --concurrency) o udp '
+             '(puertos UDP con datagramas no bloqueantes) (default: thread)'
+    )
+    port_group.add_argument(
+        '--udp-retries',
+        type=int,
+        default=2,
+        help='Con --port-engine udp, reenvíos de una sonda sin respuesta antes de darla '
+             'por open|filtered; cada uno espera el doble (default: 2)'
+    )
+    port_group.add_argument(
+        '--udp-host-rate',
+        type=float,
+        default=200.0,
+        metavar='PPS',
+        help='Con --port-engine udp, sondas/s iniciales por host; se reduce si el host '
+             'limita sus respuestas ICMP. 0 = sin límite (default: 200)'
+    )
+    port_group.add_argument(
+        '--per-host-limit',
+        type=int,
+        default=0,
+        help='Máximo de sondas de puertos simultáneas por host; 0 = automático, la '
+             'concurrencia repartida entre hasta 8 hosts (default: 0)'
+    )
     port_group.add_argument(
         '--service-scan',
         action='store_true',
-        help='Muestra nombres de servicio para puertos abiertos'
+        help='Detecta el servicio de cada puerto abierto leyendo su banner por la misma '
+             'conexión del escaneo; sin firma reconocida usa el nombre del puerto'
+    )
+    port_group.add_argument(
+        '--banner-timeout',
+        type=float,
+        default=2.0,
+        help='Tiempo máximo de lectura del banner por conexión en segundos (default: 2.0)'
+    )
+    port_group.add_argument(
+        '--banner-concurrency',
+        type=int,
+        default=256,
+        help='Conexiones simultáneas en detección de servicios (default: 256)'
+    )
+    port_group.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Escanea los puertos de cada host en cuanto se descubre y lo escribe en el '
+             'reporte al terminar, sin esperar al final del descubrimiento'
+    )
+    port_group.add_argument(
+        '--pipeline-queue',
+        type=int,
+        default=256,
+        metavar='N',
+        help='Con --pipeline, hosts pendientes del escaneo de puertos antes de frenar '
+             'el descubrimiento (default: 256)'
     )
     
     # Opciones de salida
     output_group = parser.add_argument_group('Opciones de salida')
     output_group.add_argument(
         '-o', '--output',
-        choices=['text', 'json', 'csv', 'html'],
+        choices=['text', 'json', 'jsonl', 'csv', 'html'],
         default='text',
-        help='Formato de salida (default: text)'
+        help='Formato de salida; jsonl escribe un objeto JSON por host (default: text)'
+    )
+    output_group.add_argument(
+        '--metrics',
+        metavar='FICHERO',
+        help='Guarda métricas de sondas (enviadas, respuestas, timeouts, errores por errno), '
+             'histogramas de latencia y tiempo real/CPU por fase'
+    )
+    output_group.add_argument(
+        '--metrics-format',
+        choices=['json', 'prometheus'],
+        help='Formato de --metrics (default: prometheus si el fichero termina en .prom, '
+             'si no json)'
+    )
+    output_group.add_argument(
+        '--stream',
+        metavar='DESTINO',
+        help="Emite los resultados en NDJSON a medida que ocurren (host activo, puerto "
+             "abierto, host terminado, progreso) en un fichero o FIFO; '-' = stdout, y "
+             "entonces los logs y el reporte de texto van a stderr"
+    )
+    output_group.add_argument(
+        '--stream-heartbeat',
+        type=float,
+        default=5.0,
+        metavar='SEGUNDOS',
+        help="Intervalo de los eventos 'progress' de --stream; 0 = solo al cambiar de "
+             "fase (default: 5)"
+    )
+    
+    # Historial de escaneos
+    history_group = parser.add_argument_group('Historial de escaneos (SQLite)')
+    history_group.add_argument(
+        '--history-db',
+        metavar='FICHERO',
+        default='scan_history.db',
+        help='Base de datos SQLite del historial (default: scan_history.db)'
+    )
+    history_group.add_argument(
+        '--no-history',
+        action='store_true',
+        help='No guarda el escaneo en el historial'
+    )
+    history_group.add_argument(
+        '--list-scans',
+        action='store_true',
+        help='Lista los últimos escaneos del historial y termina'
+    )
+    history_group.add_argument(
+        '--diff',
+        nargs=2,
+        type=int,
+        metavar=('ANTIGUO', 'NUEVO'),
+        help='Muestra hosts y puertos nuevos, desaparecidos y cambiados entre dos escaneos'
+    )
+    history_group.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Reescaneo incremental: sondea primero los hosts y puertos del último '
+             'escaneo del mismo objetivo y después barre el resto del rango'
+    )
+    history_group.add_argument(
+        '--sweep-rate',
+        type=float,
+        default=100,
+        help='Sondas/s del barrido del resto del rango en modo incremental; '
+             '0 = sin límite (default: 100)'
+    )
+    history_group.add_argument(
+        '--fresh-window',
+        type=float,
+        default=0,
+        metavar='SEGUNDOS',
+        help='En modo incremental, omite el barrido del resto del rango si el último '
+             'barrido completo es más reciente (default: 0, siempre barre)'
+    )
+    
+    # Barridos largos reanudables
+    checkpoint_group = parser.add_argument_group('Checkpoint y reanudación')
+    checkpoint_group.add_argument(
+        '--checkpoint',
+        metavar='FICHERO',
+        help='Anota en un journal los bloques de objetivos terminados, sus hosts y '
+             'los puertos de cada host; se borra al terminar el escaneo'
+    )
+    checkpoint_group.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continúa el escaneo del journal de --checkpoint: omite el trabajo '
+             'terminado y fusiona sus resultados con los nuevos'
+    )
+    checkpoint_group.add_argument(
+        '--checkpoint-block',
+        type=int,
+        default=65536,
+        metavar='N',
+        help='Direcciones por bloque anotado en el journal; es lo máximo que se '
+             'repite al reanudar (default: 65536)'
+    )
+    
+    # Servicio de escaneo de larga duración
+    daemon_group = parser.add_argument_group('Modo demonio (API HTTP/JSON local)')
+    daemon_group.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Arranca un servicio que acepta escaneos por HTTP/JSON y mantiene '
+             'calientes la caché DNS, los límites de tasa y las métricas; las demás '
+             'opciones de escaneo son los valores por defecto de cada trabajo'
+    )
+    daemon_group.add_argument(
+        '--listen',
+        default='127.0.0.1:8765',
+        metavar='DIRECCIÓN',
+        help='Dirección de la API: host:puerto en loopback o unix:/ruta/socket '
+             '(default: 127.0.0.1:8765)'
+    )
+    daemon_group.add_argument(
+        '--max-jobs',
+        type=int,
+        default=4,
+        help='Escaneos simultáneos del demonio; el resto espera en cola. La '
+             'concurrencia (--concurrency) se reparte entre ellos (default: 4)'
     )
     
     # Opciones de logging/debug
@@ -87,13 +470,93 @@ Ejemplos de uso:
         default='INFO',
         help='Nivel de logging (default: INFO)'
     )
+    debug_group.add_argument(
+        '--log-rate',
+        type=int,
+        default=20,
+        metavar='N',
+        help='Máximo de mensajes de depuración por segundo del mismo tipo '
+             '(p. ej. uno por host); el resto se resume (default: 20, 0 = sin límite)'
+    )
     debug_group.add_argument(
         '--no-color',
         action='store_true',
         help='Deshabilita colores en la salida'
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.daemon:
+        if args.network or args.target_file or args.list_scans or args.diff:
+            parser.error("--daemon no admite objetivos ni consultas de historial: "
+                         "los escaneos llegan por la API")
+        if args.incremental or args.workers != 1 or args.checkpoint or args.pipeline:
+            parser.error("--daemon no admite --incremental, --workers, --checkpoint ni --pipeline")
+        if args.max_jobs < 1:
+            parser.error("--max-jobs debe ser al menos 1")
+    elif not (args.network or args.target_file) and not (args.list_scans or args.diff):
+        parser.error("se requiere al menos un objetivo o -iL (o --list-scans / --diff)")
+    if args.target_file.count('-') + args.exclude_file.count('-') > 1:
+        parser.error("solo un fichero de objetivos puede leerse de stdin ('-')")
+    if args.incremental and args.no_history:
+        parser.error("--incremental necesita el historial; no se puede combinar con --no-history")
+    if args.workers < 0:
+        parser.error("--workers no puede ser negativo")
+    args.probes = [name.strip() for name in args.probes.split(',') if name.strip()]
+    unknown = [name for name in args.probes if name not in ('tcp', 'udp', 'icmp')]
+    if unknown or not args.probes:
+        parser.error(f"--probes admite tcp, udp e icmp (recibido: {', '.join(unknown) or 'nada'})")
+    if args.rate < 0 or args.burst < 1 or args.max_per_host < 0 or args.max_per_subnet < 0:
+        parser.error("--rate, --max-per-host y --max-per-subnet no pueden ser negativos "
+                     "y --burst debe ser al menos 1")
+    if args.top_ports:
+        if args.ports:
+            parser.error("-p y --top-ports no pueden combinarse")
+        if args.top_ports < 0:
+            parser.error("--top-ports no puede ser negativo")
+        # El resto del CLI (y el historial) identifica los puertos por args.ports
+        args.ports = f"top:{args.top_ports}"
+    if args.banner_timeout <= 0 or args.banner_concurrency < 1:
+        parser.error("--banner-timeout debe ser positivo y --banner-concurrency al menos 1")
+    if args.port_engine == 'udp' and args.service_scan:
+        parser.error("--service-scan solo está disponible para TCP (no con --port-engine udp)")
+    if args.ipv6_low < 0:
+        parser.error("--ipv6-low no puede ser negativo")
+    if args.udp_retries < 0 or args.udp_host_rate < 0:
+        parser.error("--udp-retries y --udp-host-rate no pueden ser negativos")
+    if args.incremental and args.workers != 1:
+        parser.error("--incremental no admite varios procesos (--workers)")
+    if args.log_rate < 0:
+        parser.error("--log-rate no puede ser negativo")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume necesita el journal del escaneo (--checkpoint FICHERO)")
+    if args.checkpoint and args.incremental:
+        parser.error("--checkpoint no admite --incremental")
+    if args.checkpoint_block < 1:
+        parser.error("--checkpoint-block debe ser al menos 1")
+    if args.stream is not None and (args.incremental or args.daemon):
+        parser.error("--stream no admite --incremental ni --daemon (el demonio ya "
+                     "emite sus eventos por la API)")
+    if args.stream_heartbeat < 0:
+        parser.error("--stream-heartbeat no puede ser negativo")
+    if args.pipeline:
+        if not args.ports:
+            parser.error("--pipeline necesita puertos que escanear (-p o --top-ports)")
+        if args.incremental or args.workers != 1 or args.checkpoint:
+            parser.error("--pipeline no admite --incremental, --workers ni --checkpoint")
+        if args.pipeline_queue < 1:
+            parser.error("--pipeline-queue debe ser al menos 1")
+    return args
+
+
+def parse_ports(args):
+    """Puertos pedidos con -p o --top-ports, como PortSet."""
+    from .ports import PortSet
+    
+    if args.top_ports:
+        return PortSet.top(args.top_ports)
+    if args.ports.lower() == 'all':
+        return PortSet([(1, 1000)])
+    return PortSet.parse(args.ports)
 
 
 def setup_logging(args):
@@ -110,65 +573,361 @@ def setup_logging(args):
     verbose = args.verbose or (args.log_level == 'DEBUG')
     
     # Obtener logger
-    logger = get_logger(verbose)
+    logger = get_logger(verbose, debug_rate=args.log_rate)
     
     # Log inicial de configuración
-    logger.debug(f"Argumentos recibidos: {args}")
-    logger.debug(f"Directorio actual: {os.getcwd()}")
+    logger.debug("Argumentos recibidos: %s", args)
+    logger.debug("Directorio actual: %s", os.getcwd())
     
     return logger
 
 
-def validate_network(network_str: str, logger) -> bool:
-    """Valida el formato de la red."""
+def confirm(prompt: str = "¿Continuar? (s/N): ") -> bool:
+    """Pide confirmación; sin terminal (p. ej. objetivos por stdin) equivale a no."""
     try:
-        from ipaddress import IPv4Network
-        network = IPv4Network(network_str, strict=False)
-        
-        # Validaciones de seguridad/sentido común
-        if network.prefixlen < 8:
-            logger.warning(f"Prefijo muy amplio (/8 o menor). Esto escaneará {network.num_addresses:,} IPs")
-            confirm = input("¿Continuar? (s/N): ")
-            if confirm.lower() != 's':
-                logger.info("Escaneo cancelado por el usuario")
-                return False
-        
-        if network.num_addresses > 65536:  # Más de /16
-            logger.warning(f"El escaneo incluirá {network.num_addresses:,} IPs. Esto puede tomar mucho tiempo.")
+        return input(prompt).lower() == 's'
+    except EOFError:
+        return False
+
+
+def make_ipv6_hints(args):
+    """Pistas IPv6 de --ipv6-hint, --ipv6-low y --no-neighbors (ValueError si no son válidas)."""
+    from .ipv6 import IPv6Hints
+    from .targets import split_specs
+    
+    return IPv6Hints.from_specs(
+        [spec for text in args.ipv6_hint for spec in split_specs(text)],
+        low=args.ipv6_low, neighbors=not args.no_neighbors
+    )
+
+
+def load_targets(args, logger):
+    """Construye el conjunto de objetivos; retorna None si no es válido o se cancela."""
+    from .targets import TargetSet
+    
+    try:
+        targets = TargetSet.from_specs(
+            args.network, exclude=args.exclude,
+            target_files=args.target_file, exclude_files=args.exclude_file,
+            hints=make_ipv6_hints(args)
+        )
+    except (ValueError, OSError) as e:
+        logger.error(f"Objetivos inválidos: {e}")
+        logger.info("Formato correcto: 192.168.1.0/24, 10.0.0.1-50, 10.0.0.5, 2001:db8::/64, "
+                    "2001:db8::1-ff o un nombre de host")
+        return None
+    
+    if not targets:
+        logger.error("No queda ningún objetivo que escanear tras aplicar las exclusiones")
+        return None
+    if targets.duplicates:
+        logger.info(f"{targets.duplicates:,} direcciones repetidas se sondearán una sola vez")
+    if targets.excluded:
+        logger.info(f"{targets.excluded:,} direcciones excluidas")
+    
+    # Validaciones de seguridad/sentido común
+    total = len(targets)
+    if total > 2 ** 24:  # Más que un /8
+        logger.warning(f"Objetivos muy amplios (más de un /8). Esto escaneará {total:,} IPs")
+        if not confirm():
+            logger.info("Escaneo cancelado por el usuario")
+            return None
+    
+    if total > 65536:  # Más de /16
+        logger.warning(f"El escaneo incluirá {total:,} IPs. Esto puede tomar mucho tiempo.")
+    
+    return targets
+
+
+def log_rate(logger, phase: str, stats: dict):
+    """Resume la tasa conseguida frente a la objetivo en una fase."""
+    if not stats or not stats['probes']:
+        return
+    target = f"{stats['target_pps']:g}" if stats['target_pps'] else "sin límite"
+    logger.info(
+        f"Tasa {phase}: {stats['achieved_pps']:g} sondas/s (objetivo: {target}), "
+        f"{stats['probes']} sondas"
+    )
+    logger.debug(
+        f"Esperas por tasa: {stats['rate_waits']}, por límite en vuelo: {stats['cap_waits']}; "
+        f"máximo en vuelo por host {stats['peak_host_inflight']}, "
+        f"por subred {stats['peak_subnet_inflight']}"
+    )
+
+
+def log_port_stats(logger, port_scanner):
+    """Resume las sondas, la tasa y los timeouts de la fase de puertos."""
+    port_stats = port_scanner.get_scan_stats()
+    logger.debug(
+        f"Sondas de puertos: {port_stats['probes_sent']} "
+        f"({port_stats['probes_per_second']:g} sondas/s)"
+    )
+    log_rate(logger, "de puertos", port_stats['rate'])
+    udp = port_stats['udp']
+    if udp:
+        logger.info(
+            f"Puertos UDP: {udp['open']} abiertos, {udp['closed']} cerrados, "
+            f"{udp['filtered']} filtrados, {udp['open_filtered']} open|filtered "
+            f"({udp['retransmits']} reintentos)"
+        )
+    for subnet, timing in port_stats['connect_timeouts'].items():
+        logger.debug("Timeout de conexión %s: %s ms", subnet, timing['timeout_ms'])
+
+
+def report_filename(args, targets) -> str:
+    """Nombre del fichero de reporte, sin sobreescribir ficheros existentes."""
+    filename = f"scan_results_{targets.file_label()}.{args.output}"
+    counter = 1
+    while os.path.exists(filename):
+        filename = f"scan_results_{targets.file_label()}_{counter}.{args.output}"
+        counter += 1
+    return filename
+
+
+def report_saved(logger, args, filename: str):
+    """Informa del reporte guardado en `filename`."""
+    logger.info(f"Resultados guardados en: {filename}")
+    print(f"\n✅ Reporte guardado como: {filename}")
+    
+    # Sugerencia para HTML
+    if args.output == 'html':
+        print(f"💡 Ábrelo en tu navegador: firefox {filename} 2>/dev/null || xdg-open {filename}")
+
+
+def save_history(args, logger, label: str, hosts, port_results, started_at: datetime,
+                 full_sweep: bool = True):
+    """Guarda el escaneo en el historial salvo con --no-history (también sin hosts)."""
+    if args.no_history:
+        return
+    from .history import ScanHistory
+    
+    try:
+        with ScanHistory(args.history_db) as history:
+            scan_id = history.record_scan(
+                label, hosts, port_results if args.ports else None,
+                ports_spec=args.ports, started_at=started_at, full_sweep=full_sweep
+            )
+        logger.info(f"Escaneo #{scan_id} guardado en el historial ({args.history_db})")
+    except Exception as e:
+        logger.error(f"No se pudo guardar el historial en {args.history_db}: {e}")
+
+
+def show_history(args, logger) -> int:
+    """Atiende --list-scans y --diff sobre el historial. Retorna el código de salida."""
+    from .history import ScanHistory
+    
+    if not os.path.exists(args.history_db):
+        logger.error(f"No existe la base de datos de historial: {args.history_db}")
+        return 1
+    
+    with ScanHistory(args.history_db) as history:
+        if args.list_scans:
+            print(f"\n📚 Escaneos en {args.history_db}:")
+            for scan in history.list_scans():
+                print(
+                    f"   #{scan['id']:<5} {scan['started_at'][:19]}  {scan['target']:<20} "
+                    f"{scan['host_count']} hosts, {scan['port_count']} puertos"
+                )
+            return 0
         
-        return True
+        old_scan, new_scan = args.diff
+        for scan_id in (old_scan, new_scan):
+            if not history.scan_exists(scan_id):
+                logger.error(f"El escaneo #{scan_id} no existe en el historial")
+                return 1
         
+        labels = {
+            'host_new': '+ Host nuevo',
+            'host_gone': '- Host desaparecido',
+            'host_changed': '~ Host cambiado',
+            'port_new': '+ Puerto abierto',
+            'port_gone': '- Puerto cerrado',
+            'port_changed': '~ Servicio cambiado',
+        }
+        print(f"\n🔁 Cambios entre los escaneos #{old_scan} y #{new_scan}:")
+        changes = 0
+        for kind, ip, port, protocol, before, after in history.iter_diff(old_scan, new_scan):
+            changes += 1
+            target = ip if port is None else f"{ip}:{port}/{protocol}"
+            detail = f"{before} → {after}" if kind.endswith('changed') else (after or before or '')
+            print(f"   {labels[kind]:<22} {target:<24} {detail}")
+        print(f"\n📊 {changes} cambios" if changes else "   Sin cambios")
+    return 0
+
+
+def run_daemon(args, logger) -> int:
+    """Atiende --daemon: sirve la API hasta Ctrl+C o SIGTERM. Retorna el código de salida."""
+    import signal
+    import threading
+    from .daemon import ScanDaemon, create_server
+    from .metrics import MetricsRegistry
+    from .ports import PortSet
+    from .ratelimit import RateLimiter
+    from .resolver import ReverseResolver
+    from .services import ServiceDetector
+    from .timing import RTTEstimator
+    
+    try:
+        ipv6_hints = make_ipv6_hints(args)
     except ValueError as e:
-        logger.error(f"Formato de red inválido: {network_str}")
-        logger.error(f"Error: {e}")
-        logger.info("Formato correcto: 192.168.1.0/24 o 10.0.0.0/8")
-        return False
+        logger.error(f"Pistas IPv6 inválidas: {e}")
+        return 1
+    
+    resolver = None
+    if not args.no_resolve:
+        resolver = ReverseResolver(
+            max_workers=args.dns_workers,
+            ttl=args.dns_ttl,
+            cache_file=args.dns_cache,
+            dns_server=args.dns_server
+        )
+    rate_limiter = RateLimiter(
+        rate=args.rate,
+        burst=args.burst,
+        per_host=args.max_per_host,
+        per_subnet=args.max_per_subnet
+    )
+    metrics = MetricsRegistry()
+    
+    # Valores por defecto de los trabajos que no los indiquen
+    defaults = {
+        'engine': args.engine,
+        'probes': args.probes,
+        'tcp_probe_ports': sorted(PortSet.parse(args.tcp_probe_ports)),
+        'udp_probe_ports': sorted(PortSet.parse(args.udp_probe_ports)),
+        'timeout': args.timeout,
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'port_engine': args.port_engine,
+        'port_timeout': args.port_timeout,
+        'per_host_limit': args.per_host_limit,
+        'udp_retries': args.udp_retries,
+        'udp_host_rate': args.udp_host_rate,
+        'service_scan': args.service_scan,
+        'resolve': not args.no_resolve,
+        'ipv6_hints': ipv6_hints
+    }
+    daemon = ScanDaemon(
+        defaults,
+        max_jobs=args.max_jobs,
+        resolver=resolver,
+        rtt_estimator=RTTEstimator(min_timeout=args.min_timeout) if args.adaptive_timeout else None,
+        rate_limiter=rate_limiter if rate_limiter.active else None,
+        metrics=metrics,
+        services=ServiceDetector(
+            max_concurrent=args.banner_concurrency,
+            timeout=args.banner_timeout,
+            metrics=metrics
+        ),
+        history_db=None if args.no_history else args.history_db
+    )
+    try:
+        server = create_server(daemon, args.listen)
+    except (ValueError, OSError) as e:
+        logger.error(f"No se pudo abrir la API en {args.listen}: {e}")
+        daemon.close()
+        return 1
+    
+    # SIGTERM detiene el servidor como Ctrl+C (shutdown desde otro hilo)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logger.info(f"Demonio escuchando en {args.listen} ({args.max_jobs} escaneos simultáneos)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Deteniendo el demonio: se esperan los escaneos en curso...")
+        server.server_close()
+        daemon.close()
+        if args.listen.startswith('unix:') and os.path.exists(args.listen[5:]):
+            os.unlink(args.listen[5:])
+    if args.metrics:
+        metrics.write(args.metrics, args.metrics_format or (
+            'prometheus' if args.metrics.endswith('.prom') else 'json'
+        ))
+    return 0
 
 
 def main():
     """Función principal ejecutada desde la línea de comandos."""
     args = None
     logger = None
+    journal = None
+    events = None
     
     try:
         # 1. Parsear argumentos
         args = parse_arguments()
         
+        event_out = None
+        if args.stream == '-':
+            # stdout queda para los eventos: logs, reporte y resumen van a stderr
+            event_out, sys.stdout = sys.stdout, sys.stderr
+        
         # 2. Configurar logging
         logger = setup_logging(args)
         
-        # 3. Validar red
-        if not validate_network(args.network, logger):
+        # Consultas de historial: no escanean
+        if args.list_scans or args.diff:
+            sys.exit(show_history(args, logger))
+        
+        if args.daemon:
+            sys.exit(run_daemon(args, logger))
+        
+        # 3. Cargar y validar objetivos
+        targets = load_targets(args, logger)
+        if targets is None:
             sys.exit(1)
         
+        # Journal para reanudar el escaneo si se interrumpe
+        if args.checkpoint:
+            from .checkpoint import ScanJournal, scan_fingerprint
+            
+            if args.resume and not os.path.exists(args.checkpoint):
+                logger.info(f"No existe el journal {args.checkpoint}; el escaneo empieza desde cero")
+            journal = ScanJournal(
+                args.checkpoint,
+                scan_fingerprint(
+                    targets, args.ports, args.service_scan,
+                    'UDP' if args.port_engine == 'udp' else 'TCP'
+                ),
+                target=targets.label,
+                resume=args.resume
+            )
+        
+        # Flujo de eventos NDJSON en vivo
+        on_host = on_host_done = None
+        if args.stream:
+            from .events import EventStream
+            
+            if event_out is None:
+                try:
+                    # Con una FIFO, open espera a que haya un lector
+                    event_out = open(args.stream, 'w', encoding='utf-8')
+                except OSError as e:
+                    logger.error(f"No se pudo abrir el flujo de eventos {args.stream}: {e}")
+                    sys.exit(1)
+            events = EventStream(
+                event_out, heartbeat=args.stream_heartbeat, close_fh=args.stream != '-'
+            )
+            events.started(targets.label, len(targets), args.ports)
+            on_host, on_host_done = events.host_up, events.host_done
+        
         # 4. Log de inicio
-        logger.scan_start(args.network, args.threads, args.timeout)
+        logger.scan_start(targets.label, args.threads, args.timeout)
+        started_at = datetime.now()
         
         # 5. Importar módulos necesarios (diferidos para mejor performance)
         logger.debug("Importando módulos de escaneo...")
         try:
             from .scanner import NetworkScanner, PortScanner
-            from .output import generate_report
+            from .resolver import ReverseResolver
+            from .timing import RTTEstimator
+            from .ratelimit import RateLimiter
+            from .metrics import MetricsRegistry
+            from .output import count_report, open_writer, write_report
+            from .probes import build_probes
+            from .services import ServiceDetector
         except ImportError as e:
             logger.critical(f"Error importando módulos: {e}")
             logger.critical("Asegúrate de que scanner.py y output.py existen")
@@ -177,99 +936,309 @@ def main():
         # 6. FASE 1: Escaneo de hosts
         logger.info("Fase 1: Escaneo de hosts...")
         
+        resolver = None
+        if not args.no_resolve:
+            resolver = ReverseResolver(
+                max_workers=args.dns_workers,
+                ttl=args.dns_ttl,
+                cache_file=args.dns_cache,
+                dns_server=args.dns_server
+            )
+        
+        # Un único estimador: el RTT de descubrimiento inicializa los
+        # timeouts de conexión de la fase de puertos
+        rtt_estimator = RTTEstimator(min_timeout=args.min_timeout) if args.adaptive_timeout else None
+        
+        # Un único limitador: la tasa y los límites en vuelo valen para ambas fases
+        rate_limiter = RateLimiter(
+            rate=args.rate,
+            burst=args.burst,
+            per_host=args.max_per_host,
+            per_subnet=args.max_per_subnet
+        )
+        if not rate_limiter.active:
+            rate_limiter = None
+        
+        # Un único registro de métricas para todas las fases; sin --metrics no mide
+        metrics = MetricsRegistry(enabled=bool(args.metrics))
+        
+        probes = None
+        if args.engine == 'probe':
+            probes = build_probes(
+                args.probes,
+                tcp_ports=sorted(PortScanner.parse_port_range(args.tcp_probe_ports)),
+                udp_ports=sorted(PortScanner.parse_port_range(args.udp_probe_ports))
+            )
+            logger.debug(f"Sondas de descubrimiento: {', '.join(map(repr, probes))}")
+        
         scanner = NetworkScanner(
             timeout=args.timeout, 
             max_threads=args.threads,
-            verbose=args.verbose
+            verbose=args.verbose,
+            engine=args.engine,
+            max_inflight=args.concurrency,
+            resolve=not args.no_resolve,
+            resolver=resolver,
+            rtt_estimator=rtt_estimator,
+            rate_limiter=rate_limiter,
+            metrics=metrics,
+            probes=probes
         )
         
-        hosts = scanner.scan_network(args.network)
+        # Detección de servicios compartida por todos los escaneos de puertos
+        services = None
+        if args.service_scan:
+            services = ServiceDetector(
+                max_concurrent=args.banner_concurrency,
+                timeout=args.banner_timeout,
+                metrics=metrics
+            )
+        
+        def make_port_scanner():
+            return PortScanner(
+                timeout=args.port_timeout, 
+                max_threads=min(args.threads, 200),  # Límite por seguridad
+                verbose=args.verbose,
+                engine=args.port_engine,
+                max_inflight=args.concurrency,
+                per_host_limit=args.per_host_limit,
+                rtt_estimator=rtt_estimator,
+                rate_limiter=rate_limiter,
+                metrics=metrics,
+                services=services,
+                udp_retries=args.udp_retries,
+                udp_host_rate=args.udp_host_rate
+            )
         
-        if not hosts:
+        port_results = {}
+        incremental = None
+        sharded = None
+        report_writer = None
+        if args.incremental:
+            # Descubrimiento y puertos en una sola pasada guiada por el historial
+            from .history import ScanHistory
+            from .incremental import IncrementalScanner
+            
+            ports_to_scan = parse_ports(args) if args.ports else None
+            
+            with ScanHistory(args.history_db) as history:
+                incremental = IncrementalScanner(
+                    history, scanner,
+                    port_scanner=make_port_scanner() if ports_to_scan else None,
+                    ports=ports_to_scan,
+                    sweep_rate=args.sweep_rate,
+                    fresh_window=args.fresh_window
+                )
+                hosts, port_results = incremental.run(targets)
+        else:
+            if args.workers != 1:
+                from .sharding import ShardedScanner
+                
+                sharded = ShardedScanner(scanner, workers=args.workers, verbose=args.verbose)
+            if journal:
+                # Por bloques: cada bloque terminado queda anotado en el journal
+                from .checkpoint import scan_with_journal
+                
+                hosts = scan_with_journal(
+                    sharded or scanner, targets, journal, args.checkpoint_block, on_host
+                )
+            elif args.pipeline:
+                # Fases 1 y 2 en paralelo; el reporte se escribe host a host
+                from .pipeline import scan_pipelined
+                
+                logger.info("Fases 1 y 2 en paralelo: puertos de cada host en cuanto se descubre")
+                if events:
+                    events.set_phase('pipeline')
+                if args.output == 'text':
+                    print("\n" + "="*60)
+                    report_file, filename = sys.stdout, None
+                else:
+                    filename = report_filename(args, targets)
+                    try:
+                        report_file = open(filename, 'w', encoding='utf-8')
+                    except (IOError, PermissionError) as e:
+                        logger.error(f"No se pudo crear el archivo {filename}: {e}")
+                        print("\n❌ Error guardando archivo. Mostrando resultado en consola:")
+                        report_file, filename = sys.stdout, None
+                report_writer = open_writer(
+                    args.output, report_file, port_scan=True, service_scan=args.service_scan
+                )
+                
+                def on_result(host, open_ports):
+                    report_writer.write_host(host, open_ports)
+                    if on_host_done:
+                        on_host_done(host.ip, open_ports)
+                
+                port_scanner = make_port_scanner()
+                hosts, port_results = scan_pipelined(
+                    scanner, port_scanner, targets, parse_ports(args),
+                    max_hosts=args.pipeline_queue, on_result=on_result, on_host=on_host
+                )
+                log_port_stats(logger, port_scanner)
+            elif sharded:
+                hosts = sharded.scan_target_set(targets, on_host)
+            else:
+                hosts = scanner.scan_target_set(targets, on_host)
+        
+        if resolver:
+            logger.debug(
+                f"DNS: {resolver.lookups} consultas PTR, {resolver.cache_hits} aciertos de caché"
+            )
+            resolver.close()
+        
+        if not hosts and not incremental:
             logger.warning("No se encontraron hosts activos en la red especificada")
+            if report_writer:
+                report_writer.close()
+                if filename:
+                    report_file.close()
             print("\n❌ No se encontraron hosts activos.")
+            # Una subred que se quedó a oscuras también es un cambio que --diff debe ver
+            save_history(args, logger, targets.label, hosts, port_results, started_at)
+            if journal:
+                journal.remove()
+            if events:
+                events.close({'status': 'done'})
             sys.exit(0)
         
         stats = scanner.get_scan_stats()
         logger.info(f"Hosts encontrados: {stats['total_hosts_found']}")
+        logger.debug(
+            f"Sondas de descubrimiento: {stats['probes_sent']} "
+            f"({stats['probes_per_second']:g} sondas/s)"
+        )
+        if not incremental:
+            log_rate(logger, "de descubrimiento", stats['rate'])
+        for subnet, timing in stats['probe_timeouts'].items():
+            logger.debug(
+                "Timeout de sonda %s: %s ms (SRTT %s ms, %s muestras)",
+                subnet, timing['timeout_ms'], timing['srtt_ms'], timing['samples']
+            )
         
         # 7. FASE 2: Escaneo de puertos (si se especificó)
-        port_results = {}
-        if args.ports:
+        if args.ports and not (incremental or report_writer):
             logger.info("Fase 2: Escaneo de puertos...")
             
             # Parsear puertos
+            ports_to_scan = parse_ports(args)
             if args.ports.lower() == 'all':
-                ports_to_scan = set(range(1, 1001))
                 logger.warning("Escaneando puertos 1-1000. Esto puede tomar tiempo.")
                 
                 # Confirmación para escaneo masivo
                 if len(hosts) > 10 and len(ports_to_scan) > 100:
                     logger.warning(f"Se escanearán {len(ports_to_scan)} puertos en {len(hosts)} hosts")
-                    confirm = input("¿Continuar? (s/N): ")
-                    if confirm.lower() != 's':
+                    if not confirm():
                         logger.info("Escaneo de puertos cancelado por el usuario")
                         args.ports = ''  # Deshabilitar escaneo de puertos
-            else:
-                ports_to_scan = PortScanner.parse_port_range(args.ports)
-                logger.debug(f"Puertos a escanear: {sorted(ports_to_scan)}")
+            elif len(ports_to_scan) > 1000:
+                logger.warning(f"Escaneando {len(ports_to_scan)} puertos. Esto puede tomar tiempo.")
+            logger.debug(f"Puertos a escanear: {ports_to_scan.spec()}")
             
             if args.ports:  # Si no fue cancelado
                 logger.info(f"Escaneando {len(ports_to_scan)} puertos en {len(hosts)} hosts...")
+                if events:
+                    events.set_phase('ports')
                 
-                port_scanner = PortScanner(
-                    timeout=args.port_timeout, 
-                    max_threads=min(args.threads, 200),  # Límite por seguridad
-                    verbose=args.verbose
-                )
+                port_scanner = make_port_scanner()
                 
-                port_results = port_scanner.scan_hosts_ports(hosts, ports_to_scan)
+                if sharded:
+                    sharded.port_scanner = port_scanner
+                if journal:
+                    from .checkpoint import scan_ports_with_journal
+                    
+                    port_results = scan_ports_with_journal(
+                        sharded or port_scanner, hosts, ports_to_scan, journal, on_host_done
+                    )
+                elif sharded:
+                    port_results = sharded.scan_hosts_ports(hosts, ports_to_scan, on_host_done)
+                else:
+                    port_results = port_scanner.scan_hosts_ports(hosts, ports_to_scan, on_host_done)
+                log_port_stats(logger, port_scanner)
                 
                 # Añadir información de puertos a los hosts
                 for host in hosts:
-                    host['open_ports'] = port_results.get(host['ip'], [])
+                    host.open_ports = port_results.get(host.ip, ())
+
+        if services:
+            services.close()
+            detection = services.stats()
+            if detection['grabbed']:
+                logger.debug(
+                    f"Servicios: {detection['grabbed']} banners leídos, "
+                    f"{detection['matched']} reconocidos, {detection['silent']} sin respuesta"
+                )
         
         # 8. Generar reporte
         logger.info("Generando reporte...")
+        if events:
+            events.set_phase('report')
         
-        report = generate_report(
-            hosts, 
-            args.output, 
-            port_info=port_results if args.ports else None,
-            service_scan=args.service_scan
-        )
+        port_info = port_results if args.ports else None
+        
+        def write_to(fh):
+            # Los hosts se escriben uno a uno; el fichero nunca se construye en memoria
+            writer = open_writer(
+                args.output, fh,
+                port_scan=bool(port_info),
+                service_scan=args.service_scan
+            )
+            write_report(writer, hosts, port_info, metrics)
         
         # 9. Mostrar/guardar resultados
-        if args.output == 'text':
+        if report_writer:
+            # Con --pipeline los hosts ya están escritos: solo falta cerrar el reporte
+            with metrics.phase('report'):
+                report_writer.close()
+            count_report(report_writer, metrics)
+            if filename:
+                report_file.close()
+                report_saved(logger, args, filename)
+            else:
+                print()
+        elif args.output == 'text':
             print("\n" + "="*60)
-            print(report)
+            write_to(sys.stdout)
+            print()
         else:
-            filename = f"scan_results_{args.network.replace('/', '_')}.{args.output}"
-            
-            # Evitar sobreescribir archivos existentes
-            counter = 1
-            while os.path.exists(filename):
-                filename = f"scan_results_{args.network.replace('/', '_')}_{counter}.{args.output}"
-                counter += 1
+            filename = report_filename(args, targets)
             
             try:
                 with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(report)
-                logger.info(f"Resultados guardados en: {filename}")
-                print(f"\n✅ Reporte guardado como: {filename}")
-                
-                # Sugerencia para HTML
-                if args.output == 'html':
-                    print(f"💡 Ábrelo en tu navegador: firefox {filename} 2>/dev/null || xdg-open {filename}")
+                    write_to(f)
+                report_saved(logger, args, filename)
                     
             except (IOError, PermissionError) as e:
                 logger.error(f"No se pudo guardar el archivo {filename}: {e}")
                 print("\n❌ Error guardando archivo. Mostrando resultado en consola:")
-                print(report)
+                write_to(sys.stdout)
+                print()
+        
+        # Guardar en el historial
+        save_history(
+            args, logger, targets.label, hosts, port_results, started_at,
+            full_sweep=incremental.stats['full_sweep'] if incremental else True
+        )
+        
+        # El escaneo está completo: el journal ya no hace falta
+        if journal:
+            journal.remove()
+        
+        if args.metrics:
+            metrics_format = args.metrics_format or (
+                'prometheus' if args.metrics.endswith('.prom') else 'json'
+            )
+            try:
+                metrics.write(args.metrics, metrics_format)
+                logger.info(f"Métricas guardadas en: {args.metrics} ({metrics_format})")
+            except (IOError, PermissionError) as e:
+                logger.error(f"No se pudieron guardar las métricas en {args.metrics}: {e}")
         
         # 10. Log de finalización
         open_ports_count = sum(len(ports) for ports in port_results.values()) if args.ports else 0
         logger.scan_complete(len(hosts), stats['scan_duration'], open_ports_count)
+        if events:
+            # Totales del escaneo completo (con --resume incluyen lo recuperado)
+            events.close({'status': 'done', 'hosts': len(hosts), 'total_open_ports': open_ports_count})
         
         # 11. Mostrar resumen rápido en consola
         if args.output != 'text':  # Si ya mostramos texto, no repetir
@@ -277,9 +1246,9 @@ def main():
             if open_ports_count > 0:
                 print("🌐 Hosts con puertos abiertos:")
                 for host in hosts:
-                    if host.get('open_ports'):
-                        ports = [str(p['port']) for p in host['open_ports']]
-                        print(f"   • {host['ip']}: {', '.join(ports)}")
+                    if host.open_ports:
+                        ports = [str(p.port) for p in host.open_ports]
+                        print(f"   • {host.ip}: {', '.join(ports)}")
         
         logger.debug("Proceso completado exitosamente")
         sys.exit(0)
@@ -290,9 +1259,16 @@ def main():
         else:
             print("\n⚠️  Escaneo interrumpido por el usuario")
         print("\n🛑 Operación cancelada")
+        if events:
+            events.close({'status': 'interrupted'})
+        if journal:
+            journal.close()
+            print(f"💾 Progreso guardado en {args.checkpoint}; continúa con --resume")
         sys.exit(130)  # Código estándar para Ctrl+C
     
     except ValueError as e:
+        if events:
+            events.close({'status': 'failed', 'error': str(e)})
         if logger:
             logger.error(f"Error de validación: {e}")
         else:
@@ -300,6 +1276,10 @@ def main():
         sys.exit(1)
     
     except Exception as e:
+        if journal:
+            journal.close()
+        if events:
+            events.close({'status': 'failed', 'error': str(e)})
         if logger:
             logger.critical(f"Error crítico no manejado: {e}", exc_info=True)
         else:
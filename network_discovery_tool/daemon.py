@@ -0,0 +1,641 @@
+# network_discovery_tool/daemon.py
+import concurrent.futures
+import itertools
+import json
+import os
+import socketserver
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from ipaddress import ip_address
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .ipv6 import IPv6Hints
+from .logger import get_logger
+from .metrics import MetricsRegistry
+from .models import HostResult, as_dicts
+from .ports import PortSet
+from .probes import PROBES, build_probes
+from .ratelimit import RateLimiter
+from .resolver import ReverseResolver
+from .scanner import DISCOVERY_ENGINES, PORT_ENGINES, NetworkScanner, PortScanner
+from .services import ServiceDetector
+from .targets import TargetSet
+from .timing import RTTEstimator
+
+DEFAULT_LISTEN = '127.0.0.1:8765'
+
+# Trabajos terminados que se conservan para consultarlos
+KEEP_JOBS = 100
+
+# Tamaño máximo del cuerpo JSON de una petición
+MAX_BODY = 1 << 20
+
+# Objetivos máximos por trabajo (un /8, como la confirmación del CLI)
+MAX_TARGETS = 2 ** 24
+
+# Campos admitidos en el cuerpo de POST /scans
+JOB_FIELDS = frozenset((
+    'targets', 'exclude', 'ipv6_hints', 'ports', 'top_ports', 'engine', 'probes', 'timeout',
+    'port_engine', 'port_timeout', 'service_scan', 'resolve', 'history'
+))
+
+# Nombres de Host aceptados además de la dirección de escucha: la API no
+# tiene autenticación y así se corta el DNS rebinding desde un navegador
+LOCAL_HOSTS = frozenset(('localhost', '127.0.0.1', '::1'))
+
+# Estados de un trabajo; los tres últimos son finales
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+
+class JobError(ValueError):
+    """Petición de trabajo inválida (se responde con 400)."""
+
+
+def _as_list(value, field: str) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    raise JobError(f"'{field}' debe ser una cadena o una lista de cadenas")
+
+
+def _number(spec: Dict, field: str, default: float) -> float:
+    value = spec.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise JobError(f"'{field}' debe ser un número positivo")
+    return value
+
+
+def _flag(spec: Dict, field: str, default: bool) -> bool:
+    value = spec.get(field, default)
+    if not isinstance(value, bool):
+        raise JobError(f"'{field}' debe ser true o false")
+    return value
+
+
+def parse_job(spec: Dict, defaults: Dict) -> Tuple[TargetSet, Optional[PortSet], Dict]:
+    """
+    Valida el cuerpo de POST /scans y retorna (objetivos, puertos, opciones).
+
+    Los campos ausentes toman el valor de `defaults` (las opciones con las
+    que se arrancó el demonio).
+    """
+    if not isinstance(spec, dict):
+        raise JobError("El cuerpo debe ser un objeto JSON")
+    unknown = sorted(set(spec) - JOB_FIELDS)
+    if unknown:
+        raise JobError(f"Campos desconocidos: {', '.join(unknown)}")
+    if 'targets' not in spec:
+        raise JobError("Falta el campo 'targets'")
+
+    try:
+        hints = defaults['ipv6_hints']
+        if 'ipv6_hints' in spec:
+            hints = IPv6Hints.from_specs(
+                _as_list(spec['ipv6_hints'], 'ipv6_hints'), low=hints.low, neighbors=hints.neighbors
+            )
+        targets = TargetSet.from_specs(
+            _as_list(spec['targets'], 'targets'),
+            exclude=_as_list(spec.get('exclude', []), 'exclude'),
+            hints=hints
+        )
+    except (ValueError, OSError) as e:
+        raise JobError(f"Objetivos inválidos: {e}")
+    if not targets:
+        raise JobError("No queda ningún objetivo que escanear tras aplicar las exclusiones")
+    if len(targets) > MAX_TARGETS:
+        raise JobError(f"Demasiados objetivos ({len(targets):,}); el máximo es un /8")
+
+    ports = None
+    ports_spec = ''
+    if 'ports' in spec and 'top_ports' in spec:
+        raise JobError("'ports' y 'top_ports' no pueden combinarse")
+    if spec.get('ports'):
+        if not isinstance(spec['ports'], str):
+            raise JobError("'ports' debe ser una cadena (p. ej. \"22,80,8000-8100\")")
+        ports_spec = spec['ports']
+        ports = PortSet.parse(ports_spec)
+        if not ports:
+            raise JobError(f"Especificación de puertos inválida: {ports_spec}")
+    elif spec.get('top_ports'):
+        top = spec['top_ports']
+        if isinstance(top, bool) or not isinstance(top, int) or top < 0:
+            raise JobError("'top_ports' debe ser un entero positivo")
+        ports_spec = f"top:{top}"
+        ports = PortSet.top(top)
+
+    engine = spec.get('engine', defaults['engine'])
+    if engine not in DISCOVERY_ENGINES:
+        raise JobError(f"'engine' admite {', '.join(DISCOVERY_ENGINES)}")
+    port_engine = spec.get('port_engine', defaults['port_engine'])
+    if port_engine not in PORT_ENGINES:
+        raise JobError(f"'port_engine' admite {', '.join(PORT_ENGINES)}")
+    probes = _as_list(spec.get('probes', defaults['probes']), 'probes')
+    unknown = [name for name in probes if name not in PROBES]
+    if unknown or not probes:
+        raise JobError(f"'probes' admite {', '.join(PROBES)}")
+
+    options = {
+        'engine': engine,
+        'probes': probes,
+        'timeout': _number(spec, 'timeout', defaults['timeout']),
+        'port_engine': port_engine,
+        'port_timeout': _number(spec, 'port_timeout', defaults['port_timeout']),
+        'service_scan': _flag(spec, 'service_scan', defaults['service_scan']),
+        'resolve': _flag(spec, 'resolve', defaults['resolve']),
+        'history': _flag(spec, 'history', True),
+        'ports_spec': ports_spec
+    }
+    if options['service_scan'] and port_engine == 'udp':
+        raise JobError("'service_scan' solo está disponible para TCP (no con port_engine udp)")
+    return targets, ports, options
+
+
+class ScanJob:
+    """
+    Un escaneo encolado en el demonio.
+
+    Los resultados se publican como eventos a medida que llegan ('host_up'
+    por host activo, 'host_done' con sus puertos, 'done' al terminar), de
+    modo que varios clientes pueden seguirlos con `iter_events` mientras el
+    escaneo avanza.
+    """
+
+    def __init__(self, job_id: int, targets: TargetSet, ports: Optional[PortSet], options: Dict):
+        self.id = job_id
+        self.targets = targets
+        self.ports = ports
+        self.options = options
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.hosts: List[HostResult] = []
+        self.open_ports = 0
+        self.scan_id: Optional[int] = None
+        self.future: Optional[concurrent.futures.Future] = None
+        self.events: List[Dict] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_STATES[2:]
+
+    def emit(self, event: str, **fields):
+        with self._cond:
+            self.events.append({'event': event, **fields})
+            self._cond.notify_all()
+
+    def start(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        self.emit('started', job=self.id, targets=len(self.targets))
+
+    def finish(self, status: str, error: Optional[str] = None):
+        with self._cond:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.emit('done', **self.summary())
+
+    def iter_events(self, heartbeat: float = 15.0) -> Iterator[List[Dict]]:
+        """
+        Lotes de eventos desde el primero; termina tras el evento 'done'.
+
+        Si no hay eventos nuevos en `heartbeat` segundos retorna un lote
+        vacío, para que el cliente sepa que la conexión sigue viva.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self.events) and not self.finished:
+                    self._cond.wait(heartbeat)
+                batch = self.events[index:]
+                # 'done' es siempre el último evento
+                done = self.finished
+            index += len(batch)
+            yield batch
+            if done:
+                return
+
+    def summary(self) -> Dict:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            'id': self.id,
+            'status': self.status,
+            'targets': self.targets.label,
+            'target_count': len(self.targets),
+            'ports': self.options['ports_spec'],
+            'engine': self.options['engine'],
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+            'duration': duration,
+            'hosts': len(self.hosts),
+            'open_ports': self.open_ports,
+            'scan_id': self.scan_id,
+            'error': self.error
+        }
+
+    def results(self) -> Dict:
+        """Resumen más los hosts encontrados con sus puertos."""
+        data = self.summary()
+        data['results'] = as_dicts(self.hosts)
+        return data
+
+
+class ScanDaemon:
+    """
+    Servicio de escaneo de larga duración.
+
+    Mantiene calientes los recursos que un escaneo suelto crea y destruye:
+    la caché del resolvedor inverso, el estimador de RTT, el limitador de
+    tasa (compartido por todos los trabajos en curso), el detector de
+    servicios con su event loop y el registro de métricas. Los trabajos se
+    encolan con `submit` y se ejecutan en un pool de `max_jobs` hilos; la
+    concurrencia de sondas se reparte entre ellos.
+    """
+
+    def __init__(self, defaults: Dict, max_jobs: int = 4,
+                 resolver: Optional[ReverseResolver] = None,
+                 rtt_estimator: Optional[RTTEstimator] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 services: Optional[ServiceDetector] = None,
+                 history_db: Optional[str] = None):
+        self.defaults = defaults
+        self.max_jobs = max(1, max_jobs)
+        self.resolver = resolver
+        self.rtt = rtt_estimator
+        self.limiter = rate_limiter
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.services = services
+        self.history_db = history_db
+        self.started_at = time.time()
+        self.jobs: Dict[int, ScanJob] = {}
+        self.logger = get_logger()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix='ndiscover-job'
+        )
+        self._job_counter = self.metrics.counter(
+            'daemon_jobs_total', 'Trabajos del demonio por estado final', ('status',)
+        )
+
+    def submit(self, spec: Dict) -> ScanJob:
+        """Valida y encola un trabajo; lanza JobError si la petición no es válida."""
+        targets, ports, options = parse_job(spec, self.defaults)
+        if options['resolve'] and self.resolver is None:
+            options['resolve'] = False
+        with self._lock:
+            job = ScanJob(next(self._ids), targets, ports, options)
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job)
+        self.logger.info("Trabajo #%d encolado: %s", job.id, targets.label)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancela un trabajo que aún no ha empezado."""
+        job = self.jobs.get(job_id)
+        if job is None or not job.future.cancel():
+            return False
+        job.finish('cancelled')
+        self._job_counter.labels('cancelled').inc()
+        return True
+
+    def _prune(self):
+        finished = [job.id for job in self.jobs.values() if job.finished]
+        for job_id in finished[:max(0, len(finished) - KEEP_JOBS)]:
+            del self.jobs[job_id]
+
+    def _make_scanners(self, job: ScanJob) -> Tuple[NetworkScanner, Optional[PortScanner]]:
+        options = self.defaults
+        # Los trabajos simultáneos se reparten los descriptores y los hilos
+        inflight = max(1, options['concurrency'] // self.max_jobs)
+        probes = None
+        if job.options['engine'] == 'probe':
+            probes = build_probes(
+                job.options['probes'],
+                tcp_ports=options['tcp_probe_ports'],
+                udp_ports=options['udp_probe_ports']
+            )
+        scanner = NetworkScanner(
+            timeout=job.options['timeout'],
+            max_threads=options['threads'],
+            engine=job.options['engine'],
+            max_inflight=inflight,
+            resolve=job.options['resolve'],
+            resolver=self.resolver,
+            rtt_estimator=self.rtt,
+            rate_limiter=self.limiter,
+            metrics=self.metrics,
+            probes=probes
+        )
+        port_scanner = None
+        if job.ports:
+            port_scanner = PortScanner(
+                timeout=job.options['port_timeout'],
+                max_threads=min(options['threads'], 200),
+                engine=job.options['port_engine'],
+                max_inflight=inflight,
+                per_host_limit=options['per_host_limit'],
+                rtt_estimator=self.rtt,
+                rate_limiter=self.limiter,
+                metrics=self.metrics,
+                services=self.services if job.options['service_scan'] else None,
+                udp_retries=options['udp_retries'],
+                udp_host_rate=options['udp_host_rate']
+            )
+        return scanner, port_scanner
+
+    def _run(self, job: ScanJob):
+        job.start()
+        started_at = datetime.now()
+        try:
+            scanner, port_scanner = self._make_scanners(job)
+
+            def host_up(host: HostResult):
+                job.emit('host_up', ip=host.ip, hostname=host.hostname,
+                         response_time=host.response_time)
+
+            def host_done(ip: str, open_ports: List):
+                job.emit('host_done', ip=ip, open_ports=as_dicts(open_ports))
+
+            with self.metrics.phase('discovery'):
+                hosts = scanner.scan_target_set(job.targets, on_host=host_up)
+            job.hosts = hosts
+            port_results = None
+            if port_scanner and hosts:
+                with self.metrics.phase('ports'):
+                    port_results = port_scanner.scan_hosts_ports(hosts, job.ports, host_done)
+                for host in hosts:
+                    host.open_ports = port_results.get(host.ip, ())
+                job.open_ports = sum(len(ports) for ports in port_results.values())
+
+            if self.history_db and job.options['history']:
+                from .history import ScanHistory
+
+                with ScanHistory(self.history_db) as history:
+                    job.scan_id = history.record_scan(
+                        job.targets.label, hosts, port_results,
+                        ports_spec=job.options['ports_spec'], started_at=started_at
+                    )
+            if self.resolver:
+                self.resolver.save()
+        except Exception as e:
+            self.logger.error("Trabajo #%d fallido: %s", job.id, e, exc_info=True)
+            job.finish('failed', f"{type(e).__name__}: {e}")
+        else:
+            self.logger.info(
+                "Trabajo #%d completado: %d hosts, %d puertos abiertos",
+                job.id, len(job.hosts), job.open_ports
+            )
+            job.finish('done')
+        self._job_counter.labels(job.status).inc()
+
+    def health(self) -> Dict:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in list(self.jobs.values()):
+            counts[job.status] += 1
+        return {
+            'status': 'ok',
+            'uptime': round(time.time() - self.started_at, 3),
+            'max_jobs': self.max_jobs,
+            'jobs': counts,
+            'dns_cache_hits': self.resolver.cache_hits if self.resolver else 0,
+            'dns_lookups': self.resolver.lookups if self.resolver else 0
+        }
+
+    def close(self):
+        """Cancela los trabajos en cola, espera a los activos y libera los recursos."""
+        for job in list(self.jobs.values()):
+            if job.status == 'queued':
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True)
+        if self.services:
+            self.services.close()
+        if self.resolver:
+            self.resolver.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    API HTTP/JSON del demonio.
+
+    - POST   /scans              encola un escaneo (cuerpo JSON, ver JOB_FIELDS)
+    - GET    /scans              lista los trabajos
+    - GET    /scans/<id>         estado, resumen y resultados
+    - GET    /scans/<id>/events  eventos en NDJSON hasta que el trabajo termina
+    - DELETE /scans/<id>         cancela un trabajo en cola
+    - GET    /metrics            métricas en formato Prometheus (?format=json)
+    - GET    /health             estado del demonio
+    """
+
+    server_version = 'ndiscover-daemon'
+    daemon: ScanDaemon
+
+    def address_string(self) -> str:
+        # Por un socket Unix el cliente no tiene dirección
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args):
+        self.daemon.logger.debug("%s - " + format, self.address_string(), *args)
+
+    def _send(self, status: int, body: Union[Dict, List, str], content_type: str = 'application/json'):
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str):
+        self._send(status, {'error': message})
+
+    def _allowed(self) -> bool:
+        """
+        Rechaza con 403 las peticiones que pueden venir de un navegador.
+
+        Una página web puede enviar peticiones al loopback (o leerlas tras un
+        DNS rebinding): toda petición con cabecera Origin se rechaza, y Host
+        debe nombrar el loopback o la dirección en la que escucha el demonio.
+        """
+        if self.headers.get('Origin') is not None:
+            self._error(403, "Peticiones con Origin no admitidas")
+            return False
+        host = self.headers.get('Host', '').strip().lower()
+        if host.startswith('['):
+            host = host[1:].partition(']')[0]
+        elif host.count(':') == 1:
+            host = host.partition(':')[0]
+        allowed = set(LOCAL_HOSTS)
+        if isinstance(self.server.server_address, tuple):
+            allowed.add(self.server.server_address[0].lower())
+        if host not in allowed:
+            self._error(403, f"Host no admitido: {host or '(ausente)'}")
+            return False
+        return True
+
+    def _route(self) -> Tuple[List[str], Dict[str, str]]:
+        path, _, query = self.path.partition('?')
+        params = dict(item.partition('=')[::2] for item in query.split('&') if item)
+        return [part for part in path.split('/') if part], params
+
+    def _job(self, parts: List[str]) -> Optional[ScanJob]:
+        try:
+            job = self.daemon.jobs.get(int(parts[1]))
+        except ValueError:
+            job = None
+        if job is None:
+            self._error(404, f"Trabajo desconocido: {parts[1]}")
+        return job
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        parts, params = self._route()
+        if parts == ['health']:
+            self._send(200, self.daemon.health())
+        elif parts == ['metrics']:
+            if params.get('format') == 'json':
+                self._send(200, self.daemon.metrics.to_json())
+            else:
+                self._send(200, self.daemon.metrics.to_prometheus(), 'text/plain; version=0.0.4')
+        elif parts == ['scans']:
+            self._send(200, [job.summary() for job in list(self.daemon.jobs.values())])
+        elif len(parts) == 2 and parts[0] == 'scans':
+            job = self._job(parts)
+            if job:
+                self._send(200, job.results() if job.finished else job.summary())
+        elif len(parts) == 3 and parts[0] == 'scans' and parts[2] == 'events':
+            job = self._job(parts)
+            if job:
+                self._stream(job)
+        else:
+            self._error(404, f"Ruta desconocida: {self.path}")
+
+    def _stream(self, job: ScanJob):
+        """Envía los eventos del trabajo como NDJSON; la conexión se cierra al final."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for batch in job.iter_events():
+                if not batch:
+                    batch = [{'event': 'heartbeat', 'status': job.status}]
+                self.wfile.write(''.join(
+                    json.dumps(event, ensure_ascii=False) + '\n' for event in batch
+                ).encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        parts, _ = self._route()
+        if parts != ['scans']:
+            self._error(404, f"Ruta desconocida: {self.path}")
+            return
+        # Un formulario o un text/plain de otra web no pasan por preflight CORS
+        content_type = self.headers.get('Content-Type', '').partition(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._error(415, "El cuerpo debe enviarse como application/json")
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_BODY:
+            self._error(400 if length <= 0 else 413, "Cuerpo JSON ausente o demasiado grande")
+            return
+        try:
+            spec = json.loads(self.rfile.read(length).decode('utf-8'))
+            job = self.daemon.submit(spec)
+        except (ValueError, UnicodeDecodeError) as e:
+            # JobError y JSON mal formado
+            self._error(400, str(e))
+            return
+        self.send_response(202)
+        self.send_header('Location', f"/scans/{job.id}")
+        data = json.dumps(job.summary(), ensure_ascii=False).encode('utf-8')
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_DELETE(self):
+        if not self._allowed():
+            return
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != 'scans':
+            self._error(404, f"Ruta desconocida: {self.path}")
+            return
+        job = self._job(parts)
+        if job is None:
+            return
+        if self.daemon.cancel(job.id):
+            self._send(200, job.summary())
+        else:
+            self._error(409, f"El trabajo #{job.id} está {job.status} y no puede cancelarse")
+
+
+class _TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def parse_listen(spec: str) -> Tuple[str, Union[str, int]]:
+    """
+    Interpreta --listen: 'unix:/ruta' o 'host:puerto' en loopback.
+
+    Retorna ('unix', ruta) o (host, puerto); la API no tiene autenticación,
+    así que se rechaza cualquier dirección que no sea local.
+    """
+    if spec.startswith('unix:'):
+        path = spec[5:]
+        if not path:
+            raise ValueError("Falta la ruta del socket Unix (unix:/ruta)")
+        return 'unix', path
+    host, _, port = spec.rpartition(':')
+    host = host.strip('[]') or '127.0.0.1'
+    try:
+        port = int(port)
+        if not 0 <= port <= 65535:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Puerto de escucha inválido: {spec}")
+    if host != 'localhost':
+        try:
+            loopback = ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"La API solo escucha en localhost o un socket Unix (recibido: {host})")
+    return host, port
+
+
+def create_server(daemon: ScanDaemon, listen: str = DEFAULT_LISTEN) -> socketserver.BaseServer:
+    """Crea el servidor HTTP del demonio en `listen` (ver parse_listen)."""
+    host, port = parse_listen(listen)
+    handler = type('Handler', (_Handler,), {'daemon': daemon})
+    if host == 'unix':
+        if os.path.exists(port):
+            os.unlink(port)
+        server = _UnixServer(port, handler)
+        os.chmod(port, 0o600)
+    else:
+        server = _TCPServer((host, port), handler)
+    return server
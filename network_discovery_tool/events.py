@@ -0,0 +1,140 @@
+# network_discovery_tool/events.py
+import json
+import threading
+import time
+from typing import IO, Dict, List, Optional
+
+from .logger import get_logger
+from .models import HostResult, PortResult
+
+# Eventos acumulados antes de escribirlos aunque no haya vencido el intervalo
+BATCH_SIZE = 64
+
+# Segundos máximos que un evento espera en el búfer
+FLUSH_INTERVAL = 0.2
+
+
+class EventStream:
+    """
+    Resultados del escaneo en NDJSON a medida que ocurren.
+
+    Cada evento es un objeto JSON por línea con 'event' y 'time':
+    - 'started': objetivos y puertos del escaneo
+    - 'host_up': host activo descubierto (ip, hostname, response_time)
+    - 'port_open': puerto abierto de un host (ip, port, protocol, service)
+    - 'host_done': host con sus puertos ya escaneados
+    - 'progress': fase y contadores, cada `heartbeat` segundos
+    - 'done': resumen final
+
+    Los eventos se escriben por lotes desde un hilo propio: cada
+    `flush_interval` segundos o al juntar BATCH_SIZE, así quien los lee no
+    espera al final del escaneo y los hilos de escaneo no escriben en `fh`.
+    Si el lector cierra la tubería, el flujo se desactiva sin detener el
+    escaneo.
+    """
+
+    def __init__(self, fh: IO[str], heartbeat: float = 5.0,
+                 flush_interval: float = FLUSH_INTERVAL, close_fh: bool = False):
+        self.fh = fh
+        self.heartbeat = heartbeat
+        self.flush_interval = flush_interval
+        self.close_fh = close_fh
+        self.logger = get_logger()
+        self.phase = 'discovery'
+        self.hosts_up = 0
+        self.hosts_done = 0
+        self.open_ports = 0
+        self.started_at = time.time()
+        self._buffer: List[str] = []
+        self._broken = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name='ndiscover-events', daemon=True)
+        self._thread.start()
+
+    def emit(self, event: str, **fields):
+        line = json.dumps(
+            {'event': event, 'time': round(time.time(), 3), **fields}, ensure_ascii=False
+        ) + '\n'
+        with self._lock:
+            if self._broken or self._closed:
+                return
+            self._buffer.append(line)
+            if len(self._buffer) >= BATCH_SIZE:
+                self._wakeup.notify()
+
+    def _write(self, lines: List[str]):
+        """Escribe un lote (sin el lock); un lector ausente desactiva el flujo."""
+        if not lines or self._broken:
+            return
+        try:
+            self.fh.write(''.join(lines))
+            self.fh.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self._broken = True
+            self.logger.warning("El lector del flujo de eventos se cerró; se dejan de emitir")
+
+    def _run(self):
+        next_heartbeat = time.monotonic() + self.heartbeat if self.heartbeat else None
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buffer) < BATCH_SIZE:
+                    self._wakeup.wait(self.flush_interval)
+                lines, self._buffer = self._buffer, []
+                closed = self._closed
+            self._write(lines)
+            if closed:
+                return
+            if next_heartbeat is not None and time.monotonic() >= next_heartbeat:
+                next_heartbeat += self.heartbeat
+                self.emit('progress', **self.counters())
+
+    def counters(self) -> Dict:
+        return {
+            'phase': self.phase,
+            'elapsed': round(time.time() - self.started_at, 3),
+            'hosts_up': self.hosts_up,
+            'hosts_done': self.hosts_done,
+            'open_ports': self.open_ports
+        }
+
+    def started(self, targets: str, target_count: int, ports: str = ''):
+        self.emit('started', targets=targets, target_count=target_count, ports=ports)
+
+    def set_phase(self, phase: str):
+        """Cambia la fase que informan los eventos 'progress' y emite uno al momento."""
+        self.phase = phase
+        self.emit('progress', **self.counters())
+
+    def host_up(self, host: HostResult):
+        with self._lock:
+            self.hosts_up += 1
+        self.emit('host_up', ip=host.ip, hostname=host.hostname,
+                  response_time=host.response_time)
+
+    def host_done(self, ip: str, open_ports: List[PortResult]):
+        """Un evento 'port_open' por puerto y después 'host_done'."""
+        with self._lock:
+            self.hosts_done += 1
+            self.open_ports += len(open_ports)
+        for port in open_ports:
+            self.emit('port_open', ip=ip, port=port.port, protocol=port.protocol,
+                      service=port.service)
+        self.emit('host_done', ip=ip, open_ports=len(open_ports))
+
+    def close(self, summary: Optional[Dict] = None):
+        """Emite 'done' (con `summary`), escribe lo pendiente y detiene el hilo."""
+        if summary is not None:
+            self.emit('done', **self.counters(), **summary)
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        if self.close_fh:
+            try:
+                self.fh.close()
+            except BrokenPipeError:
+                pass
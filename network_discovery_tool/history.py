@@ -0,0 +1,262 @@
+# network_discovery_tool/history.py
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .models import HostResult, PortResult
+
+# Ruta por defecto de la base de datos de historial
+DEFAULT_HISTORY_DB = "scan_history.db"
+
+# Filas por lote en las inserciones masivas
+BATCH_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    target TEXT NOT NULL,
+    ports TEXT,
+    host_count INTEGER DEFAULT 0,
+    port_count INTEGER DEFAULT 0,
+    full_sweep INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    ip TEXT NOT NULL,
+    hostname TEXT,
+    response_time INTEGER,
+    PRIMARY KEY (scan_id, ip)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ports (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    protocol TEXT NOT NULL DEFAULT 'TCP',
+    service TEXT,
+    PRIMARY KEY (scan_id, ip, port, protocol)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_hosts_ip ON hosts (ip, scan_id);
+CREATE INDEX IF NOT EXISTS idx_ports_ip_port ON ports (ip, port, scan_id);
+"""
+
+# Cada consulta recorre un escaneo por su clave primaria y comprueba el otro
+# con búsquedas indexadas (scan_id, ip[, port, protocol]): nunca se cargan
+# los escaneos completos en Python.
+_DIFF_QUERIES = (
+    ('host_new', """
+        SELECT b.ip, NULL, NULL, NULL, b.hostname FROM hosts b
+        WHERE b.scan_id = :new AND NOT EXISTS (
+            SELECT 1 FROM hosts a WHERE a.scan_id = :old AND a.ip = b.ip)
+        ORDER BY b.ip"""),
+    ('host_gone', """
+        SELECT a.ip, NULL, NULL, a.hostname, NULL FROM hosts a
+        WHERE a.scan_id = :old AND NOT EXISTS (
+            SELECT 1 FROM hosts b WHERE b.scan_id = :new AND b.ip = a.ip)
+        ORDER BY a.ip"""),
+    ('host_changed', """
+        SELECT b.ip, NULL, NULL, a.hostname, b.hostname FROM hosts b
+        JOIN hosts a ON a.scan_id = :old AND a.ip = b.ip
+        WHERE b.scan_id = :new AND a.hostname IS NOT b.hostname
+        ORDER BY b.ip"""),
+    ('port_new', """
+        SELECT b.ip, b.port, b.protocol, NULL, b.service FROM ports b
+        WHERE b.scan_id = :new AND NOT EXISTS (
+            SELECT 1 FROM ports a WHERE a.scan_id = :old AND a.ip = b.ip
+            AND a.port = b.port AND a.protocol = b.protocol)
+        ORDER BY b.ip, b.port"""),
+    ('port_gone', """
+        SELECT a.ip, a.port, a.protocol, a.service, NULL FROM ports a
+        WHERE a.scan_id = :old AND NOT EXISTS (
+            SELECT 1 FROM ports b WHERE b.scan_id = :new AND b.ip = a.ip
+            AND b.port = a.port AND b.protocol = a.protocol)
+        ORDER BY a.ip, a.port"""),
+    ('port_changed', """
+        SELECT b.ip, b.port, b.protocol, a.service, b.service FROM ports b
+        JOIN ports a ON a.scan_id = :old AND a.ip = b.ip
+            AND a.port = b.port AND a.protocol = b.protocol
+        WHERE b.scan_id = :new AND a.service IS NOT b.service
+        ORDER BY b.ip, b.port"""),
+)
+
+# Tipos de cambio que produce ScanHistory.iter_diff
+DIFF_KINDS = tuple(kind for kind, _ in _DIFF_QUERIES)
+
+
+def _batched(rows: Iterable, size: int = BATCH_SIZE) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ScanHistory:
+    """
+    Historial de escaneos en SQLite.
+
+    Cada escaneo se guarda en una única transacción con inserciones por
+    lotes; hosts y puertos están indexados por (scan_id, ip[, puerto]) y
+    por ip, de modo que las comparaciones entre escaneos se resuelven con
+    SQL indexado.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Añade las columnas nuevas a bases de datos creadas por versiones anteriores."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(scans)")}
+        if 'full_sweep' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE scans ADD COLUMN full_sweep INTEGER DEFAULT 1")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record_scan(self, target: str, hosts: Iterable[Dict],
+                    port_results: Optional[Dict[str, List[Dict]]] = None,
+                    ports_spec: str = '', started_at: Optional[datetime] = None,
+                    full_sweep: bool = True) -> int:
+        """
+        Guarda un escaneo y retorna su identificador.
+
+        `full_sweep` indica si se barrió todo el rango o solo los hosts
+        conocidos (escaneo incremental dentro de la ventana de frescura).
+        """
+        started_at = started_at or datetime.now()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO scans (started_at, target, ports, full_sweep) VALUES (?, ?, ?, ?)",
+                (started_at.isoformat(), target, ports_spec, int(full_sweep))
+            )
+            scan_id = cursor.lastrowid
+
+            host_count = 0
+            host_rows = (
+                (scan_id, host['ip'], host['hostname'], host['response_time'])
+                for host in hosts
+            )
+            for batch in _batched(host_rows):
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO hosts (scan_id, ip, hostname, response_time) "
+                    "VALUES (?, ?, ?, ?)", batch
+                )
+                host_count += len(batch)
+
+            port_count = 0
+            port_rows = (
+                (scan_id, ip, port['port'], port.get('protocol', 'TCP'), port['service'])
+                for ip, ports in (port_results or {}).items()
+                for port in ports
+            )
+            for batch in _batched(port_rows):
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO ports (scan_id, ip, port, protocol, service) "
+                    "VALUES (?, ?, ?, ?, ?)", batch
+                )
+                port_count += len(batch)
+
+            self.conn.execute(
+                "UPDATE scans SET finished_at = ?, host_count = ?, port_count = ? WHERE id = ?",
+                (datetime.now().isoformat(), host_count, port_count, scan_id)
+            )
+        return scan_id
+
+    def list_scans(self, limit: int = 20) -> List[Dict]:
+        """Últimos escaneos registrados, del más reciente al más antiguo."""
+        cursor = self.conn.execute(
+            "SELECT id, started_at, target, ports, host_count, port_count "
+            "FROM scans ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        keys = ('id', 'started_at', 'target', 'ports', 'host_count', 'port_count')
+        return [dict(zip(keys, row)) for row in cursor]
+
+    def scan_info(self, scan_id: int) -> Optional[Dict]:
+        """Metadatos de un escaneo, o None si no existe."""
+        row = self.conn.execute(
+            "SELECT id, started_at, finished_at, target, ports, host_count, port_count "
+            "FROM scans WHERE id = ?", (scan_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('id', 'started_at', 'finished_at', 'target', 'ports', 'host_count', 'port_count')
+        return dict(zip(keys, row))
+
+    def scan_hosts(self, scan_id: int) -> Iterator[HostResult]:
+        """Hosts de un escaneo con el mismo formato que scan_network."""
+        cursor = self.conn.execute(
+            "SELECT ip, hostname, response_time FROM hosts WHERE scan_id = ?", (scan_id,)
+        )
+        for ip, hostname, response_time in cursor:
+            yield HostResult(ip, hostname, response_time)
+
+    def scan_ports(self, scan_id: int) -> Dict[str, List[PortResult]]:
+        """Puertos abiertos de un escaneo agrupados por IP."""
+        ports: Dict[str, List[PortResult]] = {}
+        cursor = self.conn.execute(
+            "SELECT ip, port, protocol, service FROM ports WHERE scan_id = ? "
+            "ORDER BY ip, port", (scan_id,)
+        )
+        for ip, port, protocol, service in cursor:
+            ports.setdefault(ip, []).append(PortResult.shared(port, service, protocol))
+        return ports
+
+    def scan_exists(self, scan_id: int) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM scans WHERE id = ?", (scan_id,)
+        ).fetchone() is not None
+
+    def latest_scan_id(self, target: Optional[str] = None) -> Optional[int]:
+        """Identificador del último escaneo (opcionalmente de un objetivo)."""
+        if target is None:
+            row = self.conn.execute("SELECT MAX(id) FROM scans").fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT MAX(id) FROM scans WHERE target = ?", (target,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def last_full_sweep_age(self, target: str) -> Optional[float]:
+        """Segundos desde el último barrido completo de un objetivo, o None."""
+        row = self.conn.execute(
+            "SELECT (julianday('now', 'localtime') - julianday(MAX(started_at))) * 86400 "
+            "FROM scans WHERE target = ? AND full_sweep = 1", (target,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def iter_diff(self, old_scan: int, new_scan: int) -> Iterator[Tuple]:
+        """
+        Cambios entre dos escaneos como tuplas
+        (tipo, ip, puerto, protocolo, valor_anterior, valor_nuevo).
+
+        Los tipos son los de DIFF_KINDS; puerto y protocolo son None en los
+        cambios de host.
+        """
+        params = {'old': old_scan, 'new': new_scan}
+        for kind, query in _DIFF_QUERIES:
+            for row in self.conn.execute(query, params):
+                yield (kind,) + tuple(row)
+
+    def diff(self, old_scan: int, new_scan: int) -> Dict[str, List[Tuple]]:
+        """Cambios entre dos escaneos agrupados por tipo."""
+        result = {kind: [] for kind in DIFF_KINDS}
+        for kind, *row in self.iter_diff(old_scan, new_scan):
+            result[kind].append(tuple(row))
+        return result
@@ -0,0 +1,261 @@
+# network_discovery_tool/icmp.py
+import asyncio
+import errno
+import os
+import random
+import socket
+import struct
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from .metrics import ProbeMetrics
+from .models import ip_family
+from .ratelimit import RateLimiter
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+# Cabecera ICMP: tipo, código, checksum, identificador, secuencia
+_ICMP_HEADER = struct.Struct('!BBHHH')
+_PAYLOAD = b'ndiscover-icmp--'  # 16 bytes, suficiente para el timestamp
+
+
+def icmp_checksum(data: bytes) -> int:
+    """Calcula el checksum de Internet (RFC 1071)."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = _PAYLOAD,
+                       request_type: int = ICMP_ECHO_REQUEST) -> bytes:
+    """Construye un paquete ICMP Echo Request con checksum (o ICMPv6, sin él)."""
+    header = _ICMP_HEADER.pack(request_type, 0, 0, ident, seq)
+    if request_type == ICMPV6_ECHO_REQUEST:
+        # El checksum ICMPv6 cubre la pseudo-cabecera IPv6: lo calcula el kernel
+        return header + payload
+    checksum = icmp_checksum(header + payload)
+    return _ICMP_HEADER.pack(request_type, 0, checksum, ident, seq) + payload
+
+
+def open_icmp_socket(family: int = socket.AF_INET) -> Tuple[socket.socket, bool]:
+    """
+    Abre un socket ICMP (o ICMPv6 con AF_INET6) no bloqueante.
+
+    Intenta primero un socket de datagramas ICMP sin privilegios (Linux,
+    controlado por net.ipv4.ping_group_range) y, si no está permitido,
+    recurre a un socket raw cuando se ejecuta como root.
+    Retorna (socket, es_raw).
+    """
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+        raw = False
+    except (PermissionError, OSError) as dgram_error:
+        if not hasattr(os, 'geteuid') or os.geteuid() != 0:
+            raise PermissionError(
+                "Sockets ICMP no disponibles: añade tu grupo a "
+                "net.ipv4.ping_group_range o ejecuta como root"
+            ) from dgram_error
+        sock = socket.socket(family, socket.SOCK_RAW, proto)
+        raw = True
+
+    sock.setblocking(False)
+    # Buffer de recepción amplio para ráfagas de miles de respuestas
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    except OSError:
+        pass
+    return sock, raw
+
+
+class ICMPEngine:
+    """
+    Motor de descubrimiento ICMP asíncrono en proceso.
+
+    Envía y recibe Echo Request/Reply sobre un único socket por familia
+    (ICMP e ICMPv6, abierto con el primer objetivo de esa familia) y un
+    único event loop, emparejando respuestas por identificador y
+    secuencia. Mantiene hasta `max_inflight` sondas en vuelo sin crear
+    procesos.
+    """
+
+    def __init__(self, timeout: float = 2.0, max_inflight: int = 1024,
+                 timeout_for: Optional[Callable[[str], float]] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[ProbeMetrics] = None):
+        self.timeout = timeout
+        # Tasa global y límites en vuelo por destino / subred
+        self.limiter = limiter
+        # Contadores e histograma de RTT (None = métricas desactivadas)
+        self.metrics = metrics
+        # Timeout por destino (p. ej. adaptativo por subred); si no, fijo
+        self.timeout_for = timeout_for
+        # La secuencia ICMP es de 16 bits: no puede haber más sondas en vuelo
+        self.max_inflight = max(1, min(max_inflight, 65535))
+        # {familia: (socket, es_raw)}
+        self._sockets: Dict[int, Tuple[socket.socket, bool]] = {}
+        # Solo cuenta en sockets raw: en los DGRAM el kernel pone el suyo
+        self.ident = os.getpid() & 0xFFFF
+        self.probes_sent = 0
+        self.replies = 0
+        self._pending: Dict[int, Tuple[str, float, asyncio.Future]] = {}
+        self._seq = random.randint(0, 0xFFFF)
+
+    def _next_seq(self) -> int:
+        """Siguiente número de secuencia libre (módulo 2^16)."""
+        while True:
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+
+    def _open(self, family: int):
+        """Abre el socket de una familia y empieza a leer sus respuestas."""
+        sock, raw = open_icmp_socket(family)
+        if not raw:
+            sock.bind(('::' if family == socket.AF_INET6 else '0.0.0.0', 0))
+        self._sockets[family] = (sock, raw)
+        reply_type = ICMPV6_ECHO_REPLY if family == socket.AF_INET6 else ICMP_ECHO_REPLY
+        # Solo el socket raw IPv4 entrega la cabecera IP
+        asyncio.get_event_loop().add_reader(
+            sock.fileno(), self._on_readable, sock, raw, raw and family == socket.AF_INET,
+            reply_type
+        )
+
+    def _on_readable(self, sock: socket.socket, raw: bool, ip_header: bool, reply_type: int):
+        """Drena el socket y resuelve las sondas pendientes."""
+        while True:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+
+            now = time.perf_counter()
+            if ip_header:
+                ihl = (data[0] & 0x0F) * 4
+                data = data[ihl:]
+            if len(data) < _ICMP_HEADER.size:
+                continue
+
+            icmp_type, _, _, ident, seq = _ICMP_HEADER.unpack_from(data)
+            if icmp_type != reply_type:
+                continue
+            # En sockets DGRAM el kernel reescribe el identificador y ya
+            # filtra por él; en raw hay que descartar respuestas ajenas.
+            if raw and ident != self.ident:
+                continue
+
+            entry = self._pending.get(seq)
+            if entry is None or entry[0] != addr[0]:
+                continue
+            ip, sent_at, future = entry
+            if not future.done():
+                future.set_result((now - sent_at) * 1000)
+
+    async def _send(self, packet: bytes, ip: str):
+        """Envía un paquete esperando si el buffer del socket está lleno."""
+        sock = self._sockets[ip_family(ip)][0]
+        while True:
+            try:
+                sock.sendto(packet, (ip, 0))
+                return
+            except (BlockingIOError, InterruptedError):
+                await asyncio.sleep(0.001)
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    await asyncio.sleep(0.001)
+                    continue
+                raise
+
+    async def _probe(self, ip: str, semaphore: asyncio.Semaphore,
+                     on_reply: Callable[[str, float], None]):
+        """Envía una sonda y espera su respuesta o el timeout."""
+        loop = asyncio.get_event_loop()
+        seq = self._next_seq()
+        future = loop.create_future()
+        self._pending[seq] = (ip, time.perf_counter(), future)
+        try:
+            request_type = ICMPV6_ECHO_REQUEST if ip_family(ip) == socket.AF_INET6 \
+                else ICMP_ECHO_REQUEST
+            await self._send(build_echo_request(self.ident, seq, request_type=request_type), ip)
+            self.probes_sent += 1
+            if self.metrics is not None:
+                self.metrics.sent.inc()
+            timeout = self.timeout_for(ip) if self.timeout_for else self.timeout
+            rtt = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts.inc()
+            return
+        except OSError as e:
+            if self.metrics is not None:
+                self.metrics.error(e.errno)
+            return
+        finally:
+            self._pending.pop(seq, None)
+            if self.limiter:
+                self.limiter.release(ip)
+            semaphore.release()
+
+        self.replies += 1
+        if self.metrics is not None:
+            self.metrics.reply(rtt)
+        on_reply(ip, rtt)
+
+    async def _run(self, targets: Iterable[str], on_reply: Callable[[str, float], None]):
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        try:
+            # Consumo perezoso de objetivos: nunca más de max_inflight tareas
+            for ip in targets:
+                if ip_family(ip) not in self._sockets:
+                    # Sin permisos para ICMP el escaneo falla aquí, no en cada sonda
+                    self._open(ip_family(ip))
+                await semaphore.acquire()
+                if self.limiter:
+                    await self.limiter.acquire_async(ip)
+                task = loop.create_task(self._probe(ip, semaphore, on_reply))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # Si el barrido se interrumpe (p. ej. sin permiso para otra
+            # familia), las sondas en vuelo se cancelan antes de cerrar
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for sock, _ in self._sockets.values():
+                loop.remove_reader(sock.fileno())
+                sock.close()
+            self._sockets = {}
+
+    def scan(self, targets: Iterable[str],
+             on_reply: Optional[Callable[[str, float], None]] = None) -> Dict[str, float]:
+        """
+        Sondea todos los objetivos y retorna {ip: rtt_ms} de los que responden.
+
+        `on_reply` se invoca desde el event loop por cada respuesta recibida.
+        """
+        results: Dict[str, float] = {}
+
+        def _collect(ip: str, rtt: float):
+            results[ip] = rtt
+            if on_reply:
+                on_reply(ip, rtt)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(targets, _collect))
+        finally:
+            loop.close()
+        return results
@@ -0,0 +1,202 @@
+# network_discovery_tool/incremental.py
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .history import ScanHistory
+from .models import HostResult, PortResult
+from .ports import PortSet
+from .scanner import NetworkScanner, PortScanner
+from .targets import TargetSet
+
+# Callback de cambios: (tipo, ip, puerto o None); tipos como en history.DIFF_KINDS
+ChangeCallback = Callable[[str, str, Optional[int]], None]
+
+
+class _Counter:
+    """Iterable que cuenta los elementos consumidos."""
+
+    def __init__(self, items: Iterable):
+        self._items = items
+        self.count = 0
+
+    def __iter__(self) -> Iterator:
+        for item in self._items:
+            self.count += 1
+            yield item
+
+
+class IncrementalScanner:
+    """
+    Reescaneo incremental a partir del último escaneo del mismo objetivo.
+
+    1. Sondea primero los hosts que estaban activos y sus puertos abiertos
+       conocidos, informando de los cambios en cuanto se detectan.
+    2. Barre el resto del rango a `sweep_rate` sondas/s, o lo omite si el
+       último barrido completo es más reciente que `fresh_window` segundos.
+
+    Las estadísticas (`stats`) incluyen las sondas ahorradas frente a un
+    escaneo completo.
+    """
+
+    def __init__(self, history: ScanHistory, scanner: NetworkScanner,
+                 port_scanner: Optional[PortScanner] = None, ports: Optional[Iterable[int]] = None,
+                 sweep_rate: float = 100, fresh_window: float = 0,
+                 on_change: Optional[ChangeCallback] = None):
+        self.history = history
+        self.scanner = scanner
+        self.port_scanner = port_scanner if ports else None
+        self.ports = ports if isinstance(ports, PortSet) else PortSet.from_ports(ports or ())
+        self.sweep_rate = sweep_rate
+        self.fresh_window = fresh_window
+        self.on_change = on_change
+        self.logger = scanner.logger
+        self.stats: Dict = {}
+
+    def _change(self, kind: str, ip: str, port: Optional[int] = None):
+        labels = {
+            'host_new': '[+] Host nuevo',
+            'host_gone': '[-] Host desaparecido',
+            'port_new': '[+] Puerto abierto',
+            'port_gone': '[-] Puerto cerrado',
+        }
+        target = ip if port is None else f"{ip}:{port}"
+        self.logger.info("%s: %s", labels[kind], target)
+        if self.on_change:
+            self.on_change(kind, ip, port)
+
+    def _sweep_is_fresh(self, target: str) -> bool:
+        """True si el último barrido completo del objetivo está dentro de la ventana."""
+        if not self.fresh_window:
+            return False
+        age = self.history.last_full_sweep_age(target)
+        if age is None:
+            return False
+        self.logger.debug("Último barrido completo hace %.0fs (ventana %.0fs)", age, self.fresh_window)
+        return age < self.fresh_window
+
+    def run(self, targets: Union[str, TargetSet]
+            ) -> Tuple[List[HostResult], Dict[str, List[PortResult]]]:
+        """
+        Ejecuta el reescaneo y retorna (hosts, resultados de puertos).
+
+        `targets` es un CIDR o un TargetSet; su `label` identifica el
+        objetivo en el historial.
+        """
+        if isinstance(targets, str):
+            targets = TargetSet.from_network(targets)
+
+        start_time = time.time()
+        previous = self.history.latest_scan_id(targets.label)
+        known_hosts: Dict[str, HostResult] = {}
+        known_ports: Dict[str, Set[int]] = {}
+        if previous is None:
+            self.logger.info("Sin escaneo previo de este objetivo: se hará un barrido completo")
+        else:
+            # Solo los que siguen dentro de los objetivos (p. ej. tras un --exclude)
+            known_hosts = {
+                host.ip: host for host in self.history.scan_hosts(previous) if host.ip in targets
+            }
+            protocol = self.port_scanner.protocol if self.port_scanner else 'TCP'
+            known_ports = {
+                ip: {p.port for p in ports if p.protocol == protocol}
+                for ip, ports in self.history.scan_ports(previous).items()
+            }
+            self.logger.info(
+                "Escaneo previo #%s: %d hosts, %d puertos abiertos",
+                previous, len(known_hosts), sum(len(p) for p in known_ports.values())
+            )
+
+        host_probes = 0
+        port_probes = 0
+        port_results: Dict[str, List[PortResult]] = {}
+
+        # 1. Hosts conocidos primero
+        alive = {}
+        if known_hosts:
+            self.logger.info("Comprobando %d hosts conocidos...", len(known_hosts))
+            for host in self.scanner.scan_targets(sorted(known_hosts), total=len(known_hosts)):
+                alive[host.ip] = host
+            host_probes += len(known_hosts)
+            for ip in sorted(set(known_hosts) - set(alive)):
+                self._change('host_gone', ip)
+
+        # 2. Puertos abiertos conocidos de los hosts que siguen activos
+        if self.port_scanner and alive:
+            host_ports = {
+                ip: {port for port in known_ports.get(ip, ()) if port in self.ports}
+                for ip in alive
+            }
+            host_ports = {ip: ports for ip, ports in host_ports.items() if ports}
+            port_probes += sum(len(ports) for ports in host_ports.values())
+
+            def known_done(ip: str, open_ports: List[PortResult]):
+                still_open = {p.port for p in open_ports}
+                for port in sorted(host_ports[ip] - still_open):
+                    self._change('port_gone', ip, port)
+
+            port_results.update(self.port_scanner.scan_host_port_map(host_ports, known_done))
+
+        # 3. Resto del rango, a menor ritmo o nada si el barrido es reciente
+        swept = not self._sweep_is_fresh(targets.label)
+        new_hosts: Dict[str, HostResult] = {}
+        if swept:
+            rest = _Counter(ip for ip in targets.addresses() if ip not in known_hosts)
+            remaining = len(targets) - len(known_hosts)
+            if self.sweep_rate:
+                self.logger.info(
+                    "Barriendo %d direcciones restantes a %g sondas/s...", remaining, self.sweep_rate
+                )
+            else:
+                self.logger.info("Barriendo %d direcciones restantes...", remaining)
+
+            def host_found(host: HostResult):
+                self._change('host_new', host.ip)
+
+            for host in self.scanner.scan_targets(rest, total=remaining, on_host=host_found,
+                                                  rate=self.sweep_rate):
+                new_hosts[host.ip] = host
+            host_probes += rest.count
+
+            if self.port_scanner:
+                # Hosts nuevos: todos los puertos; conocidos: los que no estaban abiertos
+                host_ports = {ip: self.ports for ip in new_hosts}
+                for ip in alive:
+                    unknown = self.ports.difference(known_ports.get(ip, ()))
+                    if unknown:
+                        host_ports[ip] = unknown
+                port_probes += sum(len(ports) for ports in host_ports.values())
+
+                def sweep_done(ip: str, open_ports: List[PortResult]):
+                    for port in open_ports:
+                        self._change('port_new', ip, port.port)
+
+                for ip, open_ports in self.port_scanner.scan_host_port_map(host_ports, sweep_done).items():
+                    merged = port_results.get(ip, []) + open_ports
+                    port_results[ip] = sorted(merged, key=lambda p: p.port)
+        else:
+            self.logger.info(
+                "Último barrido completo dentro de la ventana de %gs: se omite el resto del rango",
+                self.fresh_window
+            )
+
+        hosts = list(alive.values()) + list(new_hosts.values())
+        if self.port_scanner:
+            for host in hosts:
+                host.open_ports = port_results.setdefault(host.ip, [])
+
+        full_probes = len(targets) + len(hosts) * len(self.ports if self.port_scanner else ())
+        probes = host_probes + port_probes
+        self.stats = {
+            'previous_scan': previous,
+            'full_sweep': swept,
+            'probes_sent': probes,
+            'full_scan_probes': full_probes,
+            'probes_saved': max(full_probes - probes, 0),
+        }
+        self.scanner.active_hosts = hosts
+        self.scanner.scan_duration = time.time() - start_time
+        self.logger.info(
+            "Escaneo incremental: %d sondas frente a %d de un escaneo completo (%d ahorradas)",
+            probes, full_probes, self.stats['probes_saved']
+        )
+        return hosts, port_results
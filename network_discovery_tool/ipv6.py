@@ -0,0 +1,167 @@
+# network_discovery_tool/ipv6.py
+import re
+import subprocess
+from ipaddress import AddressValueError, IPv6Address, IPv6Network
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .logger import get_logger
+from .models import IPV6_BASE, ip_to_int
+
+# Prefijos IPv6 de como mucho este número de direcciones (/112) se enumeran
+# completos; los mayores se recorren por pistas
+MAX_ENUMERATED = 1 << 16
+
+# Direcciones bajas por prefijo (::1 a ::N)
+DEFAULT_LOW = 256
+
+_MAC = re.compile(r'[0-9A-Fa-f]{2}([:-]?)[0-9A-Fa-f]{2}(?:\1[0-9A-Fa-f]{2}){4}')
+
+# Bit universal/local del primer byte de la MAC dentro del identificador EUI-64
+_UL_BIT = 1 << 57
+
+# Estados de la tabla de vecinos sin dirección de enlace válida
+_UNRESOLVED = ('FAILED', 'INCOMPLETE')
+
+
+def parse_mac(text: str) -> int:
+    """MAC (aa:bb:cc:dd:ee:ff, aa-bb-..., aabbccddeeff) como entero de 48 bits."""
+    text = text.strip()
+    if not _MAC.fullmatch(text):
+        raise ValueError(f"MAC inválida: {text}")
+    return int(re.sub(r'[:-]', '', text), 16)
+
+
+def eui64_interface_id(mac: int) -> int:
+    """Identificador de interfaz EUI-64 modificado (RFC 4291) de una MAC."""
+    iid = (mac >> 24) << 40 | 0xFFFE << 24 | mac & 0xFFFFFF
+    return iid ^ _UL_BIT
+
+
+def parse_neighbor_table(output: str) -> Tuple[List[str], List[int]]:
+    """
+    Direcciones y MACs de la salida de `ip -6 neigh show`.
+
+    Una dirección de enlace que no es una MAC de 6 bytes (InfiniBand, túneles
+    con una IPv4 como lladdr) solo descarta esa MAC, no el resto de la tabla.
+    """
+    addresses: List[str] = []
+    macs: List[int] = []
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields or fields[-1] in _UNRESOLVED:
+            continue
+        addresses.append(fields[0].split('%', 1)[0])
+        if 'lladdr' in fields[:-1]:
+            try:
+                macs.append(parse_mac(fields[fields.index('lladdr') + 1]))
+            except ValueError:
+                continue
+    return addresses, macs
+
+
+def parse_arp_table(lines: Iterable[str]) -> List[int]:
+    """MACs de las entradas completas de /proc/net/arp (sin la cabecera)."""
+    macs: List[int] = []
+    for line in lines:
+        fields = line.split()
+        # Flags 0x0: entrada incompleta
+        if len(fields) >= 4 and fields[2] != '0x0' and fields[3] != '00:00:00:00:00:00':
+            try:
+                macs.append(parse_mac(fields[3]))
+            except ValueError:
+                continue
+    return macs
+
+
+def read_neighbors() -> Tuple[List[str], List[int]]:
+    """
+    Direcciones IPv6 y MACs de las tablas de vecinos del sistema.
+
+    Lee la tabla NDP (`ip -6 neigh`) y, para las MACs, también la caché ARP:
+    un host de doble pila conocido por IPv4 suele tener su dirección EUI-64
+    en el prefijo IPv6 del mismo enlace.
+    """
+    try:
+        output = subprocess.run(
+            ['ip', '-6', 'neigh', 'show'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, timeout=5
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        output = ''
+    addresses, macs = parse_neighbor_table(output)
+    try:
+        with open('/proc/net/arp', encoding='ascii', errors='replace') as fh:
+            next(fh, None)
+            macs.extend(parse_arp_table(fh))
+    except OSError:
+        pass
+    return addresses, macs
+
+
+class IPv6Hints:
+    """
+    Pistas para elegir objetivos dentro de prefijos IPv6 demasiado grandes.
+
+    Un /64 no se puede recorrer, así que de cada prefijo mayor que
+    MAX_ENUMERATED solo se sondean los candidatos de las pistas:
+    - bajas: ::1 a ::`low` (routers y servidores numerados a mano)
+    - EUI-64: el identificador derivado de cada MAC conocida (`macs` y las
+      de las tablas de vecinos), en la primera /64 del prefijo
+    - explícitas: las direcciones de `addresses` que caen en el prefijo
+    - vecinos: las direcciones de la tabla NDP que caen en el prefijo
+
+    Los candidatos salen como intervalos a medida que se piden; TargetSet
+    los fusiona, así que una dirección sugerida por varias pistas se sondea
+    una sola vez. La tabla de vecinos se lee una vez, la primera vez que
+    hace falta.
+    """
+
+    def __init__(self, low: int = DEFAULT_LOW, macs: Iterable[int] = (),
+                 addresses: Iterable[str] = (), neighbors: bool = True):
+        self.low = low
+        self.macs = list(macs)
+        self.addresses = list(addresses)
+        self.neighbors = neighbors
+        self._neighbors: Optional[Tuple[List[str], List[int]]] = None
+
+    @classmethod
+    def from_specs(cls, specs: Iterable[str], low: int = DEFAULT_LOW,
+                   neighbors: bool = True) -> 'IPv6Hints':
+        """Pistas desde MACs y direcciones IPv6 (listas ya separadas)."""
+        macs: List[int] = []
+        addresses: List[str] = []
+        for spec in specs:
+            if ':' in spec and not _MAC.fullmatch(spec):
+                try:
+                    addresses.append(str(IPv6Address(spec)))
+                except (AddressValueError, ValueError):
+                    raise ValueError(f"Pista IPv6 inválida: {spec} (se espera una MAC o una IPv6)")
+            else:
+                macs.append(parse_mac(spec))
+        return cls(low=low, macs=macs, addresses=addresses, neighbors=neighbors)
+
+    def _neighbor_table(self) -> Tuple[List[str], List[int]]:
+        if self._neighbors is None:
+            self._neighbors = read_neighbors() if self.neighbors else ([], [])
+            get_logger().debug(
+                "Tabla de vecinos: %d direcciones IPv6, %d MACs",
+                len(self._neighbors[0]), len(self._neighbors[1])
+            )
+        return self._neighbors
+
+    def intervals(self, network: IPv6Network) -> Iterator[Tuple[int, int]]:
+        """Candidatos de `network` como intervalos (enteros de ip_to_int)."""
+        first = IPV6_BASE + int(network.network_address)
+        last = first + network.num_addresses - 1
+        if self.low > 0:
+            yield first + 1, min(first + self.low, last)
+
+        neighbor_addresses, neighbor_macs = self._neighbor_table()
+        if network.prefixlen <= 64:
+            for mac in dict.fromkeys(self.macs + neighbor_macs):
+                value = first + eui64_interface_id(mac)
+                yield value, value
+        for address in self.addresses + neighbor_addresses:
+            value = ip_to_int(address)
+            if isinstance(value, int) and first <= value <= last:
+                yield value, value
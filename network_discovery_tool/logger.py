@@ -1,15 +1,115 @@
 # network_discovery_tool/logger.py
+import atexit
 import logging
-import sys
+import logging.handlers
 import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+
+# Máximo de mensajes de depuración por segundo con la misma plantilla (p. ej.
+# uno por host o por respuesta); el resto se descarta y se resume en el
+# siguiente mensaje que pase
+DEFAULT_DEBUG_RATE = 20
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """FileHandler que crea el directorio y abre el fichero en la primera escritura."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class DebugRateFilter(logging.Filter):
+    """
+    Limita los mensajes DEBUG a `rate` por segundo y plantilla de mensaje.
+
+    Los mensajes por host de los bucles de sondeo comparten plantilla
+    (`"Respuesta ICMP: %s - %.2fms"`), así que en un barrido grande solo pasan
+    unos pocos por segundo. El primer mensaje que pasa tras un periodo
+    limitado indica cuántos se omitieron.
+    """
+
+    # Plantillas distintas recordadas como máximo (p. ej. mensajes ya formateados)
+    MAX_KEYS = 1024
+
+    def __init__(self, rate: int = DEFAULT_DEBUG_RATE, window: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.window = window
+        self.suppressed = 0
+        # plantilla -> [inicio de la ventana, pasados, omitidos]
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+        key = record.msg
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None and len(self._windows) >= self.MAX_KEYS:
+                self._windows.clear()
+            if state is None or now - state[0] >= self.window:
+                omitted = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+            elif state[1] < self.rate:
+                state[1] += 1
+                omitted = 0
+            else:
+                state[2] += 1
+                self.suppressed += 1
+                return False
+        if omitted:
+            if isinstance(record.args, tuple):
+                if not record.args:
+                    record.msg = str(record.msg).replace('%', '%%')
+                record.msg = f"{record.msg} [%d mensajes similares omitidos]"
+                record.args = record.args + (omitted,)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola los registros para el hilo de escritura del fichero.
+
+    En un proceso hijo (p. ej. los de --workers) el hilo del listener no
+    existe, así que los registros se escriben directamente.
+    """
+
+    def __init__(self, log_queue: queue.Queue, listener: logging.handlers.QueueListener):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.pid = os.getpid()
+
+    def emit(self, record: logging.LogRecord):
+        if os.getpid() != self.pid:
+            self.listener.handle(record)
+        else:
+            super().emit(record)
 
 class NDLogger:
-    """Logger profesional para Network Discovery Tool."""
+    """
+    Logger profesional para Network Discovery Tool.
+
+    La consola se escribe en el mismo hilo que registra el mensaje, para que
+    los logs no se mezclen con el reporte y el resumen impresos en stdout;
+    el fichero de log lo escribe un QueueListener en su propio hilo, así
+    los hilos de escaneo no esperan al disco. Los mensajes usan
+    formato diferido (`logger.debug("%s", x)`), así un nivel desactivado no
+    construye el texto, y los DEBUG repetidos se limitan con DebugRateFilter.
+    """
     
-    def __init__(self, name: str = "ndiscover", verbose: bool = False):
+    def __init__(self, name: str = "ndiscover", verbose: bool = False,
+                 debug_rate: int = DEFAULT_DEBUG_RATE):
         self.logger = logging.getLogger(name)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.rate_filter = DebugRateFilter(debug_rate)
         
         # Nivel base
         level = logging.DEBUG if verbose else logging.INFO
@@ -18,9 +118,10 @@ class NDLogger:
         # Evitar log duplicados si ya está configurado
         if not self.logger.handlers:
             self._setup_handlers(verbose)
+            self.logger.addFilter(self.rate_filter)
     
     def _setup_handlers(self, verbose: bool):
-        """Configura los handlers de logging."""
+        """Configura los handlers de consola y, detrás de una cola, el de fichero."""
         
         # Formato profesional
         detailed_format = logging.Formatter(
@@ -44,23 +145,43 @@ class NDLogger:
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(simple_format)
         
-        # 3. Handler para ARCHIVO (log detallado)
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        
+        # 3. Handler para ARCHIVO (log detallado); el directorio y el
+        # fichero se crean en el hilo del listener con el primer registro
         log_file = os.path.join(
-            log_dir, 
+            "logs",
             f"ndiscover_{datetime.now().strftime('%Y%m%d')}.log"
         )
         
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler = _LazyFileHandler(log_file, encoding='utf-8', delay=True)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_format)
         
-        # Añadir todos los handlers
         self.logger.addHandler(console_handler)
         self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
+        
+        # El fichero cuelga del listener; el logger solo encola
+        log_queue = queue.Queue(-1)
+        self.listener = logging.handlers.QueueListener(
+            log_queue, file_handler, respect_handler_level=True
+        )
+        self.logger.addHandler(_QueueHandler(log_queue, self.listener))
+        self.listener.start()
+        atexit.register(self.close)
+    
+    def close(self):
+        """Vacía la cola y detiene el hilo de escritura del fichero."""
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            if self.rate_filter.suppressed:
+                self.logger.debug(
+                    "%d mensajes de depuración omitidos por límite de tasa",
+                    self.rate_filter.suppressed
+                )
+            listener.stop()
+    
+    def is_debug(self) -> bool:
+        """True si DEBUG está activo (para evitar preparar argumentos costosos)."""
+        return self.logger.isEnabledFor(logging.DEBUG)
     
     # Métodos conveniencia
     def debug(self, msg: str, *args, **kwargs):
@@ -83,9 +204,9 @@ class NDLogger:
         self.info("=" * 50)
         self.info("INICIANDO ESCANEO DE RED")
         self.info("=" * 50)
-        self.info(f"Red: {network}")
-        self.info(f"Hilos: {threads}, Timeout: {timeout}s")
-        self.info(f"Hora inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.info("Red: %s", network)
+        self.info("Hilos: %s, Timeout: %ss", threads, timeout)
+        self.info("Hora inicio: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         self.debug("Configuración de escaneo cargada")
     
     def scan_complete(self, hosts_found: int, duration: float, open_ports: int = 0):
@@ -93,27 +214,37 @@ class NDLogger:
         self.info("=" * 50)
         self.info("ESCANEO COMPLETADO")
         self.info("=" * 50)
-        self.info(f"Hosts encontrados: {hosts_found}")
+        self.info("Hosts encontrados: %d", hosts_found)
         if open_ports > 0:
-            self.info(f"Puertos abiertos: {open_ports}")
-        self.info(f"Duración: {duration:.2f} segundos")
-        self.info(f"Velocidad: {hosts_found/duration:.1f} hosts/seg" if duration > 0 else "N/A")
-        self.info(f"Hora fin: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            self.info("Puertos abiertos: %d", open_ports)
+        self.info("Duración: %.2f segundos", duration)
+        if duration > 0:
+            self.info("Velocidad: %.1f hosts/seg", hosts_found / duration)
+        else:
+            self.info("N/A")
+        self.info("Hora fin: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     
     def host_discovered(self, ip: str, hostname: str, response_time: int):
         """Log para host descubierto."""
-        self.debug(f"Host activo: {ip} ({hostname}) - {response_time}ms")
+        self.debug("Host activo: %s (%s) - %sms", ip, hostname, response_time)
     
     def port_discovered(self, ip: str, port: int, service: str):
         """Log para puerto descubierto."""
-        self.info(f"Puerto abierto: {ip}:{port} ({service})")
+        self.info("Puerto abierto: %s:%s (%s)", ip, port, service)
 
 # Instancia global para fácil acceso
 _logger_instance: Optional[NDLogger] = None
 
-def get_logger(verbose: bool = False) -> NDLogger:
-    """Obtiene o crea una instancia del logger."""
+def get_logger(verbose: bool = False, debug_rate: Optional[int] = None) -> NDLogger:
+    """
+    Obtiene o crea una instancia del logger.
+
+    `debug_rate` (si se indica) ajusta el límite de mensajes DEBUG por
+    segundo y plantilla (0 = sin límite).
+    """
     global _logger_instance
     if _logger_instance is None:
         _logger_instance = NDLogger(verbose=verbose)
+    if debug_rate is not None:
+        _logger_instance.rate_filter.rate = debug_rate
     return _logger_instance
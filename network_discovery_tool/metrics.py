@@ -0,0 +1,332 @@
+# network_discovery_tool/metrics.py
+import bisect
+import errno
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+# Prefijo de todas las métricas exportadas
+PREFIX = 'ndiscover_'
+
+# Límites (ms) de los histogramas de latencia: de loopback a enlaces lentos
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Métricas de fase: el proceso principal las mide incluyendo a sus hijos
+PHASE_METRICS = (PREFIX + 'phase_wall_seconds_total', PREFIX + 'phase_cpu_seconds_total')
+
+# Formatos de exportación
+METRICS_FORMATS = ('json', 'prometheus')
+
+
+def _cpu_time() -> float:
+    """CPU (usuario + sistema) del proceso y de sus hijos ya terminados."""
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+class Counter:
+    """Contador monótono de una serie (una combinación de etiquetas)."""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: Union[int, float] = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict:
+        value = self.value
+        return {'value': round(value, 6) if isinstance(value, float) else value}
+
+    def merge(self, snapshot: Dict):
+        self.inc(snapshot['value'])
+
+
+class Histogram:
+    """Histograma de buckets fijos (límite superior inclusivo, como Prometheus)."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += bucket_count
+            buckets[_format_bound(bound)] = cumulative
+        return {'buckets': buckets, 'sum': round(total, 3), 'count': count}
+
+    def merge(self, snapshot: Dict):
+        previous = 0
+        counts = []
+        for cumulative in snapshot['buckets'].values():
+            counts.append(cumulative - previous)
+            previous = cumulative
+        if len(counts) != len(self.counts):
+            raise ValueError("Histogramas con buckets distintos")
+        with self._lock:
+            for index, bucket_count in enumerate(counts):
+                self.counts[index] += bucket_count
+            self.sum += snapshot['sum']
+            self.count += snapshot['count']
+
+
+def _format_bound(bound: float) -> str:
+    if bound == float('inf'):
+        return '+Inf'
+    return repr(float(bound)) if bound != int(bound) else str(int(bound))
+
+
+class _Family:
+    """Métrica con nombre y etiquetas; cada combinación de valores es una serie."""
+
+    def __init__(self, kind: str, name: str, help_text: str, labelnames: Sequence[str],
+                 buckets: Optional[Sequence[float]] = None):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self._series: Dict[tuple, Union[Counter, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Union[Counter, Histogram]:
+        """Serie para los valores de etiqueta dados (se crea la primera vez)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+        values = tuple(str(value) for value in values)
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+                    self._series[values] = series
+        return series
+
+    def inc(self, amount: Union[int, float] = 1):
+        self.labels().inc(amount)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            series = list(self._series.items())
+        return {
+            'type': self.kind,
+            'help': self.help,
+            'labels': list(self.labelnames),
+            'series': [
+                dict({'labels': dict(zip(self.labelnames, values))}, **metric.snapshot())
+                for values, metric in sorted(series)
+            ]
+        }
+
+
+class _NullMetric:
+    """Sustituto sin efecto de familias y series cuando las métricas están desactivadas."""
+
+    __slots__ = ()
+
+    def labels(self, *values) -> '_NullMetric':
+        return self
+
+    def inc(self, amount: Union[int, float] = 1):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+
+
+class ProbeMetrics:
+    """
+    Series de las sondas de una fase y un motor, resueltas una sola vez.
+
+    Los motores reciben este objeto (o None si las métricas están
+    desactivadas) y solo hacen incrementos en la ruta caliente.
+    """
+
+    __slots__ = ('sent', 'replies', 'timeouts', 'latency', '_errors', '_labels')
+
+    def __init__(self, registry: 'MetricsRegistry', phase: str, engine: str, latency_name: str,
+                 latency_help: str):
+        labels = ('phase', 'engine')
+        self._labels = (phase, engine)
+        self.sent = registry.counter('probes_total', 'Sondas enviadas', labels).labels(*self._labels)
+        self.replies = registry.counter(
+            'replies_total', 'Sondas con respuesta (abierto o cerrado en puertos)', labels
+        ).labels(*self._labels)
+        self.timeouts = registry.counter(
+            'timeouts_total', 'Sondas sin respuesta antes del timeout', labels
+        ).labels(*self._labels)
+        self.latency = registry.histogram(latency_name, latency_help, ('engine',)).labels(engine)
+        self._errors = registry.counter(
+            'errors_total', 'Sondas fallidas por errno', labels + ('errno',)
+        )
+
+    def reply(self, latency_ms: float):
+        self.replies.inc()
+        self.latency.observe(latency_ms)
+
+    def error(self, reason: Union[int, str, None]):
+        """Cuenta un error; `reason` es un errno o un texto corto."""
+        if isinstance(reason, int):
+            reason = errno.errorcode.get(reason, str(reason))
+        self._errors.labels(*self._labels, reason or 'unknown').inc()
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del escaneo: contadores e histogramas con etiquetas.
+
+    Se comparte entre NetworkScanner, PortScanner y la etapa de salida.
+    Desactivado (`enabled=False`), `counter`/`histogram` retornan un objeto
+    sin efecto, `probes` retorna None y `phase` no mide nada, de modo que el
+    coste en la ruta caliente se reduce a una comprobación.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, kind: str, name: str, help_text: str, labelnames: Sequence[str],
+                buckets: Optional[Sequence[float]] = None):
+        if not self.enabled:
+            return _NULL_METRIC
+        if not name.startswith(PREFIX):
+            name = PREFIX + name
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = _Family(kind, name, help_text, labelnames, buckets)
+                self._families[name] = family
+            elif family.kind != kind or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} registrada con otro tipo o etiquetas")
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        return self._family('counter', name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        return self._family('histogram', name, help_text, labelnames, buckets)
+
+    def probes(self, phase: str, engine: str) -> Optional[ProbeMetrics]:
+        """Series de sondas para un motor; None si las métricas están desactivadas."""
+        if not self.enabled:
+            return None
+        if phase == 'discovery':
+            return ProbeMetrics(self, phase, engine, 'rtt_milliseconds',
+                                'RTT de las respuestas de descubrimiento (ms)')
+        return ProbeMetrics(self, phase, engine, 'connect_latency_milliseconds',
+                            'Latencia de conexión hasta SYN-ACK o RST (ms)')
+
+    @contextmanager
+    def phase(self, name: str):
+        """Acumula el tiempo real y de CPU de una fase (incluye procesos hijos)."""
+        if not self.enabled:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = _cpu_time()
+        try:
+            yield
+        finally:
+            self.counter('phase_wall_seconds_total', 'Tiempo real por fase', ('phase',)) \
+                .labels(name).inc(time.perf_counter() - wall)
+            self.counter('phase_cpu_seconds_total', 'Tiempo de CPU por fase', ('phase',)) \
+                .labels(name).inc(_cpu_time() - cpu)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Estado serializable ({nombre: familia}); vacío si está desactivado."""
+        with self._lock:
+            families = sorted(self._families.items())
+        return {name: family.snapshot() for name, family in families}
+
+    def merge(self, snapshot: Dict[str, Dict], exclude: Iterable[str] = ()):
+        """Acumula el estado de otro registro (p. ej. de un proceso hijo)."""
+        excluded = set(exclude)
+        for name, data in snapshot.items():
+            if name in excluded:
+                continue
+            if data['type'] == 'histogram':
+                first = data['series'][0]['buckets'] if data['series'] else {}
+                bounds = [float(bound) for bound in first if bound != '+Inf'] or LATENCY_BUCKETS_MS
+                family = self.histogram(name, data['help'], data['labels'], bounds)
+            else:
+                family = self.counter(name, data['help'], data['labels'])
+            for series in data['series']:
+                values = [series['labels'][label] for label in data['labels']]
+                family.labels(*values).merge(series)
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Formato de texto de exposición de Prometheus."""
+        lines: List[str] = []
+        for name, data in self.snapshot().items():
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            for series in data['series']:
+                labels = series['labels']
+                if data['type'] == 'histogram':
+                    for bound, count in series['buckets'].items():
+                        lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series['value'])}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write(self, path: str, format_type: str = 'json'):
+        """Guarda las métricas en `path` como JSON o texto de Prometheus."""
+        if format_type not in METRICS_FORMATS:
+            raise ValueError(f"Formato de métricas desconocido: {format_type}")
+        text = self.to_prometheus() if format_type == 'prometheus' else self.to_json() + '\n'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in items
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
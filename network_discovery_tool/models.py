@@ -0,0 +1,163 @@
+# network_discovery_tool/models.py
+import socket
+import struct
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+from weakref import WeakValueDictionary
+
+_IPV4 = struct.Struct('!I')
+
+# Las IPv6 se numeran a partir del final del espacio IPv4: ambas familias
+# comparten una sola recta de enteros sin solaparse
+IPV6_BASE = 1 << 32
+
+
+def ip_to_int(ip: str) -> Union[int, str]:
+    """
+    Dirección como entero: IPv4 de 32 bits o IPV6_BASE + IPv6 de 128 bits.
+
+    Cualquier otro texto se conserva tal cual.
+    """
+    try:
+        return _IPV4.unpack(socket.inet_aton(ip))[0]
+    except OSError:
+        pass
+    try:
+        return IPV6_BASE + int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+    except (OSError, ValueError):
+        return ip
+
+
+def int_to_ip(value: Union[int, str]) -> str:
+    """Inversa de ip_to_int."""
+    if isinstance(value, int):
+        if value >= IPV6_BASE:
+            return socket.inet_ntop(socket.AF_INET6, (value - IPV6_BASE).to_bytes(16, 'big'))
+        return socket.inet_ntoa(_IPV4.pack(value))
+    return value
+
+
+def ip_family(ip: str) -> socket.AddressFamily:
+    """Familia de socket para sondear `ip`."""
+    return socket.AF_INET6 if ':' in ip else socket.AF_INET
+
+
+class PortResult(Mapping):
+    """
+    Puerto abierto.
+
+    Es inmutable y se comparte: `PortResult.shared` devuelve la misma
+    instancia para un (puerto, protocolo, servicio) mientras alguien la use,
+    por lo que las listas de puertos de cada host solo guardan referencias.
+    La caché guarda referencias débiles: los servicios sacados de banners no
+    tienen límite y un proceso largo (el demonio) no debe acumularlos. Se lee
+    como el diccionario {'port', 'service', 'protocol'} de versiones anteriores.
+    """
+    __slots__ = ('port', 'service', 'protocol', '__weakref__')
+
+    _KEYS = ('port', 'service', 'protocol')
+    _shared: 'WeakValueDictionary[Tuple[int, str, str], PortResult]' = WeakValueDictionary()
+
+    def __init__(self, port: int, service: str, protocol: str = 'TCP'):
+        self.port = port
+        self.service = service
+        self.protocol = protocol
+
+    @classmethod
+    def shared(cls, port: int, service: str, protocol: str = 'TCP') -> 'PortResult':
+        key = (port, service, protocol)
+        entry = cls._shared.get(key)
+        if entry is None:
+            entry = cls._shared.setdefault(key, cls(port, service, protocol))
+        return entry
+
+    def __getitem__(self, key: str):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"PortResult({self.port}/{self.protocol} {self.service})"
+
+    def to_dict(self) -> Dict:
+        return {'port': self.port, 'service': self.service, 'protocol': self.protocol}
+
+
+class HostResult(Mapping):
+    """
+    Host activo.
+
+    La IP se guarda como entero (ver ip_to_int) y los puertos como una lista de
+    PortResult compartidos; sin escaneo de puertos la lista es una tupla
+    vacía común a todos los hosts. Se lee (y admite asignación) como el
+    diccionario {'ip', 'hostname', 'status', 'response_time', 'open_ports'};
+    `to_dict` produce ese diccionario en la frontera de salida.
+    """
+    __slots__ = ('_ip', 'hostname', 'response_time', 'open_ports')
+
+    _KEYS = ('ip', 'hostname', 'status', 'response_time', 'open_ports')
+    _WRITABLE = ('hostname', 'response_time', 'open_ports')
+
+    def __init__(self, ip: str, hostname: str, response_time: int,
+                 open_ports: Sequence[PortResult] = ()):
+        self._ip = ip_to_int(ip)
+        self.hostname = hostname
+        self.response_time = response_time
+        self.open_ports = open_ports
+
+    @property
+    def ip(self) -> str:
+        return int_to_ip(self._ip)
+
+    @property
+    def ip_int(self) -> Union[int, str]:
+        return self._ip
+
+    @property
+    def status(self) -> str:
+        return 'active'
+
+    def __getitem__(self, key: str):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self._WRITABLE:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"HostResult({self.ip}, {self.hostname!r}, {self.response_time} ms)"
+
+    def to_dict(self) -> Dict:
+        return {
+            'ip': self.ip,
+            'hostname': self.hostname,
+            'status': 'active',
+            'response_time': self.response_time,
+            'open_ports': as_dicts(self.open_ports)
+        }
+
+
+def as_dict(record) -> Dict:
+    """Convierte un registro en diccionario; los diccionarios pasan tal cual."""
+    if isinstance(record, (HostResult, PortResult)):
+        return record.to_dict()
+    return record
+
+
+def as_dicts(records) -> List[Dict]:
+    return [as_dict(record) for record in records]
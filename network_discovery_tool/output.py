@@ -1,107 +1,18 @@
 import json
 import csv
-from typing import List, Dict, Optional
+import io
+import tempfile
+from html import escape
+from typing import IO, List, Dict, Optional
 from datetime import datetime
 
+from .metrics import MetricsRegistry
+from .models import as_dict, as_dicts
 
-def generate_report(
-    results: List[Dict], 
-    format_type: str = 'text',
-    port_info: Optional[Dict] = None,
-    service_scan: bool = False
-) -> str:
-    """Genera un reporte en el formato especificado."""
-    
-    if format_type == 'json':
-        report_data = {
-            'scan_date': datetime.now().isoformat(),
-            'hosts_found': len(results),
-            'hosts': results
-        }
-        if port_info:
-            report_data['port_scan'] = port_info
-        return json.dumps(report_data, indent=2)
-    
-    elif format_type == 'csv':
-        if not results:
-            return ""
-        
-        if port_info:
-            # CSV con información de puertos
-            fieldnames = ['ip', 'hostname', 'response_time', 'open_ports', 'services']
-            output = []
-            for host in results:
-                ports = port_info.get(host['ip'], [])
-                open_ports = ','.join(str(p['port']) for p in ports)
-                services = ','.join(p['service'] for p in ports) if service_scan else ''
-                
-                output.append({
-                    'ip': host['ip'],
-                    'hostname': host['hostname'],
-                    'response_time': host['response_time'],
-                    'open_ports': open_ports,
-                    'services': services
-                })
-        else:
-            # CSV básico
-            fieldnames = ['ip', 'hostname', 'response_time']
-            output = results
-        
-        # Crear CSV
-        import io
-        output_io = io.StringIO()
-        writer = csv.DictWriter(output_io, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(output)
-        return output_io.getvalue()
-    
-    elif format_type == 'html':
-        return generate_html_report(results, port_info, service_scan)
-    
-    else:  # Formato texto (default)
-        return generate_text_report(results, port_info, service_scan)
-
-
-def generate_text_report(results: List[Dict], port_info: Optional[Dict], service_scan: bool) -> str:
-    """Genera reporte en formato de texto."""
-    if not results:
-        return "No se encontraron hosts activos."
-    
-    report_lines = []
-    report_lines.append("=" * 70)
-    report_lines.append("NETWORK DISCOVERY TOOL - REPORT")
-    report_lines.append("=" * 70)
-    report_lines.append(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report_lines.append(f"Hosts encontrados: {len(results)}")
-    
-    if port_info:
-        total_open_ports = sum(len(ports) for ports in port_info.values())
-        report_lines.append(f"Puertos abiertos encontrados: {total_open_ports}")
-    
-    report_lines.append("=" * 70)
-    
-    for host in sorted(results, key=lambda x: x['ip']):
-        report_lines.append(f"\nIP: {host['ip']}")
-        report_lines.append(f"  Hostname: {host['hostname']}")
-        report_lines.append(f"  Tiempo de respuesta: {host['response_time']} ms")
-        
-        if port_info and host['ip'] in port_info:
-            ports = port_info[host['ip']]
-            if ports:
-                report_lines.append("  Puertos abiertos:")
-                for port_info in ports:
-                    service_info = f" ({port_info['service']})" if service_scan else ""
-                    report_lines.append(f"    • {port_info['port']}/TCP{service_info}")
-            else:
-                report_lines.append("  Puertos abiertos: Ninguno")
-    
-    report_lines.append("\n" + "=" * 70)
-    return "\n".join(report_lines)
+# Formatos soportados por open_writer / generate_report
+REPORT_FORMATS = ('text', 'json', 'jsonl', 'csv', 'html')
 
-
-def generate_html_report(results: List[Dict], port_info: Optional[Dict], service_scan: bool) -> str:
-    """Genera un reporte HTML visual."""
-    html_template = '''<!DOCTYPE html>
+HTML_TEMPLATE = '''<!DOCTYPE html>
 <html>
 <head>
     <title>Network Scan Report</title>
@@ -205,56 +116,364 @@ def generate_html_report(results: List[Dict], port_info: Optional[Dict], service
     </div>
 </body>
 </html>'''
-    
-    # Preparar estadísticas de puertos
-    port_stats = ""
-    if port_info:
-        total_open_ports = sum(len(ports) for ports in port_info.values())
-        hosts_with_ports = sum(1 for ports in port_info.values() if ports)
-        port_stats = f'''
-        <p><strong>Open Ports Found:</strong> {total_open_ports}</p>
-        <p><strong>Hosts with open ports:</strong> {hosts_with_ports}/{len(results)}</p>
-        '''
-    
-    # Preparar filas de la tabla
-    rows = ""
-    service_th = '<th>Services</th>' if service_scan else ''
-    
-    for host in sorted(results, key=lambda x: x['ip']):
+
+
+class _Spool:
+    """
+    Almacén temporal en disco de fragmentos ya renderizados.
+
+    Permite escribir la cabecera (que depende de los totales) después de
+    recibir todos los hosts sin mantenerlos en memoria: solo se conserva
+    la clave de orden y la posición de cada fragmento.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._index = []  # (clave, offset, longitud) por fragmento
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def append(self, text: str, key: str = ''):
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self._index.append((key, self._size, len(data)))
+        self._size += len(data)
+
+    def copy_to(self, fh: IO[str], sort: bool = False, separator: str = ''):
+        """Vuelca los fragmentos al destino, en orden de llegada o por clave."""
+        self._file.flush()
+        index = sorted(self._index, key=lambda entry: entry[0]) if sort else self._index
+        for i, (_, offset, length) in enumerate(index):
+            if i and separator:
+                fh.write(separator)
+            self._file.seek(offset)
+            fh.write(self._file.read(length).decode('utf-8'))
+
+    def close(self):
+        self._file.close()
+
+
+class ReportWriter:
+    """
+    Escritor incremental de reportes.
+
+    Recibe los hosts uno a uno con `write_host` y los escribe en `fh` a
+    medida que llegan (o los vuelca a un spool en disco si el formato
+    necesita los totales en la cabecera); `close` completa el reporte.
+    `port_scan` indica si el reporte incluye información de puertos.
+    """
+
+    def __init__(self, fh: IO[str], port_scan: bool = False, service_scan: bool = False):
+        self.fh = fh
+        self.port_scan = port_scan
+        self.service_scan = service_scan
+        self.host_count = 0
+        self.total_open_ports = 0
+        self.hosts_with_ports = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_ports(self, ip: str, ports: List[Dict]):
+        """Registra los puertos de una IP (cuenta para los totales del reporte)."""
+        self.total_open_ports += len(ports)
+        if ports:
+            self.hosts_with_ports += 1
+
+    def write_host(self, host: Dict, ports: Optional[List[Dict]] = None):
+        """
+        Añade un host; `ports` es None si no hay información de puertos para él.
+
+        Acepta diccionarios o registros de `models`; estos se convierten aquí,
+        en la frontera de salida, uno a uno.
+        """
+        self.host_count += 1
+        host = as_dict(host)
+        if ports is not None:
+            ports = as_dicts(ports)
+            self.write_ports(host['ip'], ports)
+        self._write_host(host, ports)
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def close(self):
+        """Completa el reporte. No cierra `fh`."""
+        if self._closed:
+            return
+        self._closed = True
+        self._finish()
+        self.fh.flush()
+
+
+class JSONWriter(ReportWriter):
+    """Reporte JSON idéntico a json.dumps(..., indent=2) del reporte completo."""
+
+    def __init__(self, fh: IO[str], port_scan: bool = False, service_scan: bool = False):
+        super().__init__(fh, port_scan, service_scan)
+        self._hosts = _Spool()
+        self._ports = _Spool()
+
+    @staticmethod
+    def _indented(value, level: int) -> str:
+        text = json.dumps(value, indent=2)
+        return text.replace('\n', '\n' + ' ' * level)
+
+    def write_ports(self, ip: str, ports: List[Dict]):
+        super().write_ports(ip, ports)
+        self._ports.append(f"    {json.dumps(ip)}: {self._indented(ports, 4)}")
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        self._hosts.append("    " + self._indented(host, 4))
+
+    def _finish(self):
+        fh = self.fh
+        fh.write('{\n')
+        fh.write(f'  "scan_date": {json.dumps(datetime.now().isoformat())},\n')
+        fh.write(f'  "hosts_found": {self.host_count},\n')
+        if len(self._hosts):
+            fh.write('  "hosts": [\n')
+            self._hosts.copy_to(fh, separator=',\n')
+            fh.write('\n  ]')
+        else:
+            fh.write('  "hosts": []')
+        if self.port_scan and len(self._ports):
+            fh.write(',\n  "port_scan": {\n')
+            self._ports.copy_to(fh, separator=',\n')
+            fh.write('\n  }')
+        fh.write('\n}')
+        self._hosts.close()
+        self._ports.close()
+
+
+class JSONLinesWriter(ReportWriter):
+    """JSON Lines: un objeto por host, escrito en cuanto llega."""
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        if ports is not None:
+            host = dict(host, open_ports=ports)
+        self.fh.write(json.dumps(host))
+        self.fh.write('\n')
+
+
+class CSVWriter(ReportWriter):
+    """CSV escrito fila a fila; la cabecera se emite con el primer host."""
+
+    def __init__(self, fh: IO[str], port_scan: bool = False, service_scan: bool = False):
+        super().__init__(fh, port_scan, service_scan)
+        if port_scan:
+            fieldnames = ['ip', 'hostname', 'response_time', 'open_ports', 'services']
+        else:
+            fieldnames = ['ip', 'hostname', 'response_time']
+        self._writer = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction='ignore')
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        if self.host_count == 1:
+            self._writer.writeheader()
+        if self.port_scan:
+            ports = ports or []
+            row = {
+                'ip': host['ip'],
+                'hostname': host['hostname'],
+                'response_time': host['response_time'],
+                'open_ports': ','.join(str(p['port']) for p in ports),
+                'services': ','.join(p['service'] for p in ports) if self.service_scan else ''
+            }
+        else:
+            row = host
+        self._writer.writerow(row)
+
+
+class TextWriter(ReportWriter):
+    """Reporte de texto; los hosts se ordenan por IP desde el spool."""
+
+    def __init__(self, fh: IO[str], port_scan: bool = False, service_scan: bool = False):
+        super().__init__(fh, port_scan, service_scan)
+        self._rows = _Spool()
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        lines = [
+            f"\nIP: {host['ip']}",
+            f"  Hostname: {host['hostname']}",
+            f"  Tiempo de respuesta: {host['response_time']} ms"
+        ]
+        if self.port_scan and ports is not None:
+            if ports:
+                lines.append("  Puertos abiertos:")
+                for port in ports:
+                    service_info = f" ({port['service']})" if self.service_scan else ""
+                    lines.append(f"    • {port['port']}/{port.get('protocol', 'TCP')}{service_info}")
+            else:
+                lines.append("  Puertos abiertos: Ninguno")
+        self._rows.append("\n" + "\n".join(lines), key=host['ip'])
+
+    def _finish(self):
+        fh = self.fh
+        if not self.host_count:
+            fh.write("No se encontraron hosts activos.")
+            self._rows.close()
+            return
+        
+        header = [
+            "=" * 70,
+            "NETWORK DISCOVERY TOOL - REPORT",
+            "=" * 70,
+            f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Hosts encontrados: {self.host_count}"
+        ]
+        if self.port_scan:
+            header.append(f"Puertos abiertos encontrados: {self.total_open_ports}")
+        header.append("=" * 70)
+        fh.write("\n".join(header))
+        self._rows.copy_to(fh, sort=True)
+        fh.write("\n\n" + "=" * 70)
+        self._rows.close()
+
+
+class HTMLWriter(ReportWriter):
+    """Reporte HTML; las filas se renderizan al llegar y se ordenan al cerrar."""
+
+    def __init__(self, fh: IO[str], port_scan: bool = False, service_scan: bool = False):
+        super().__init__(fh, port_scan, service_scan)
+        self._rows = _Spool()
+
+    def _write_host(self, host: Dict, ports: Optional[List[Dict]]):
+        # El servicio (banners) y el hostname (PTR) vienen de la red: se escapan
         # Puertos como badges
         ports_html = ""
         services_html = ""
         
-        if port_info and host['ip'] in port_info:
-            ports = port_info[host['ip']]
+        if self.port_scan and ports is not None:
             if ports:
                 ports_html = '<br>'.join([
-                    f'<span class="port-badge">{p["port"]}/TCP</span>' 
+                    f'<span class="port-badge">{p["port"]}/{p.get("protocol", "TCP")}</span>' 
                     for p in ports
                 ])
                 
-                if service_scan:
+                if self.service_scan:
                     services_html = '<br>'.join([
-                        f'<span class="service-badge">{p["service"]}</span>' 
+                        f'<span class="service-badge">{escape(str(p["service"]))}</span>' 
                         for p in ports
                     ])
             else:
                 ports_html = '<span class="no-ports">None</span>'
         
-        rows += f'''
+        self._rows.append(f'''
         <tr class="host-up">
             <td><strong>{host['ip']}</strong></td>
-            <td>{host['hostname']}</td>
+            <td>{escape(str(host['hostname']))}</td>
             <td>{host['response_time']} ms</td>
             <td>{ports_html}</td>
-            {f'<td>{services_html}</td>' if service_scan else ''}
+            {f'<td>{services_html}</td>' if self.service_scan else ''}
         </tr>
+        ''', key=host['ip'])
+
+    def _finish(self):
+        # Preparar estadísticas de puertos
+        port_stats = ""
+        if self.port_scan:
+            port_stats = f'''
+        <p><strong>Open Ports Found:</strong> {self.total_open_ports}</p>
+        <p><strong>Hosts with open ports:</strong> {self.hosts_with_ports}/{self.host_count}</p>
         '''
+        
+        head, tail = HTML_TEMPLATE.split('{rows}')
+        self.fh.write(head.format(
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            host_count=self.host_count,
+            port_stats=port_stats,
+            service_th='<th>Services</th>' if self.service_scan else ''
+        ))
+        self._rows.copy_to(self.fh, sort=True)
+        self.fh.write(tail.format())
+        self._rows.close()
+
+
+_WRITERS = {
+    'text': TextWriter,
+    'json': JSONWriter,
+    'jsonl': JSONLinesWriter,
+    'csv': CSVWriter,
+    'html': HTMLWriter,
+}
+
+
+def open_writer(format_type: str, fh: IO[str], port_scan: bool = False,
+                service_scan: bool = False) -> ReportWriter:
+    """Crea el escritor incremental para el formato indicado."""
+    try:
+        writer_class = _WRITERS[format_type]
+    except KeyError:
+        raise ValueError(f"Formato de reporte desconocido: {format_type}")
+    return writer_class(fh, port_scan=port_scan, service_scan=service_scan)
+
+
+def write_report(
+    writer: ReportWriter,
+    results: List[Dict],
+    port_info: Optional[Dict] = None,
+    metrics: Optional[MetricsRegistry] = None
+):
+    """
+    Alimenta un escritor con una lista de hosts y su información de puertos.
+
+    Con `metrics`, el tiempo de la fase 'report' y los hosts y puertos
+    escritos se acumulan en el registro.
+    """
+    if metrics is None:
+        metrics = MetricsRegistry(enabled=False)
+    with metrics.phase('report'):
+        for host in results:
+            ports = port_info.get(host['ip']) if port_info else None
+            writer.write_host(host, ports)
+        if port_info:
+            # Puertos de IPs que no figuran entre los hosts: solo cuentan en totales
+            reported = {host['ip'] for host in results}
+            for ip, ports in port_info.items():
+                if ip not in reported:
+                    writer.write_ports(ip, as_dicts(ports))
+        writer.close()
+    count_report(writer, metrics)
+
+
+def count_report(writer: ReportWriter, metrics: MetricsRegistry):
+    """Acumula en `metrics` los hosts y puertos de un reporte ya cerrado."""
+    metrics.counter('report_hosts_total', 'Hosts escritos en reportes').inc(writer.host_count)
+    metrics.counter('report_ports_total', 'Puertos abiertos escritos en reportes') \
+        .inc(writer.total_open_ports)
+
+
+def generate_report(
+    results: List[Dict], 
+    format_type: str = 'text',
+    port_info: Optional[Dict] = None,
+    service_scan: bool = False,
+    metrics: Optional[MetricsRegistry] = None
+) -> str:
+    """Genera un reporte en el formato especificado."""
+    if format_type not in _WRITERS:
+        format_type = 'text'  # Formato texto (default)
     
-    return html_template.format(
-        timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        host_count=len(results),
-        port_stats=port_stats,
-        service_th=service_th,
-        rows=rows
-    )
+    output_io = io.StringIO()
+    writer = open_writer(format_type, output_io, port_scan=bool(port_info), service_scan=service_scan)
+    write_report(writer, results, port_info, metrics)
+    return output_io.getvalue()
+
+
+def generate_text_report(results: List[Dict], port_info: Optional[Dict], service_scan: bool) -> str:
+    """Genera reporte en formato de texto."""
+    return generate_report(results, 'text', port_info, service_scan)
+
+
+def generate_html_report(results: List[Dict], port_info: Optional[Dict], service_scan: bool) -> str:
+    """Genera un reporte HTML visual."""
+    return generate_report(results, 'html', port_info, service_scan)
@@ -0,0 +1,53 @@
+# network_discovery_tool/pipeline.py
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .models import HostResult, PortResult
+from .scanner import NetworkScanner, PortScanner
+from .targets import TargetSet
+
+# Hosts pendientes del escaneo de puertos antes de frenar el descubrimiento
+DEFAULT_QUEUE = 256
+
+# Callback de la etapa de reporte: (host con sus puertos, puertos abiertos)
+ResultCallback = Callable[[HostResult, List[PortResult]], None]
+
+
+def scan_pipelined(scanner: NetworkScanner, port_scanner: PortScanner, targets: TargetSet,
+                   ports: Iterable[int], max_hosts: int = DEFAULT_QUEUE,
+                   on_result: Optional[ResultCallback] = None,
+                   on_host: Optional[Callable[[HostResult], None]] = None
+                   ) -> Tuple[List[HostResult], Dict[str, List[PortResult]]]:
+    """
+    Descubrimiento y escaneo de puertos en paralelo.
+
+    Cada host que encuentra `scanner` entra en el planificador de
+    `port_scanner` en cuanto se descubre, y cada host cuyos puertos terminan
+    pasa a `on_result` (la etapa de reporte; se invoca con un lock, de uno
+    en uno); `on_host` recibe cada host al descubrirse. Con `max_hosts`
+    hosts pendientes de puertos el descubrimiento espera, así ninguna etapa
+    acumula trabajo sin límite y el tiempo total se acerca al de la fase
+    más lenta en lugar de a la suma de ambas.
+
+    Retorna (hosts, puertos por IP) como las dos fases por separado.
+    """
+    hosts_by_ip: Dict[str, HostResult] = {}
+    report_lock = threading.Lock()
+
+    def host_done(ip: str, open_ports: List[PortResult]):
+        host = hosts_by_ip[ip]
+        host.open_ports = open_ports
+        if on_result:
+            with report_lock:
+                on_result(host, open_ports)
+
+    def host_up(host: HostResult):
+        hosts_by_ip[host.ip] = host
+        if on_host:
+            on_host(host)
+        stream.add(host)
+
+    stream = port_scanner.open_stream(ports, host_done, max_hosts)
+    # Si el descubrimiento falla (o Ctrl+C) no se espera a los puertos pendientes
+    hosts = scanner.scan_target_set(targets, on_host=host_up)
+    return hosts, stream.close()
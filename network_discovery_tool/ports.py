@@ -0,0 +1,139 @@
+# network_discovery_tool/ports.py
+from typing import Dict, Iterable, Iterator, List
+
+from .targets import Interval, IntervalSet
+
+# Puertos TCP ordenados de más a menos probable de encontrarse abiertos.
+# Orden aproximado a partir de estadísticas públicas de escaneos de Internet
+# (como las frecuencias de nmap-services), completado con servicios actuales
+# habituales (bases de datos, colas de mensajes, Kubernetes, etc.).
+# Los puertos que no aparecen se consideran menos probables que cualquiera
+# de la tabla y se ordenan por número.
+TOP_PORTS = (
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306,
+    8080, 1723, 111, 995, 993, 5900, 1025, 587, 8888, 199, 1720, 465, 548, 113,
+    81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554, 26, 1433,
+    49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049,
+    88, 79, 5800, 106, 2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543,
+    544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009, 7070, 5190, 3000, 5432,
+    1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100,
+    119, 37, 1000, 3001, 5001, 82, 10010, 1030, 9090, 2107, 1024, 2103, 6004, 1801,
+    5050, 19, 8031, 1041, 255, 1049, 1048, 2967, 1053, 3703, 1065, 1064, 1056, 1054,
+    17, 808, 3689, 1031, 1044, 1071, 5901, 100, 9102, 8010, 2869, 1039, 5120, 4001,
+    9000, 2105, 636, 1038, 2601, 1, 7000, 1066, 1069, 625, 311, 280, 254, 4000,
+    1761, 5003, 2002, 2005, 1998, 1032, 1050, 6112, 3690, 1521, 2161, 6002, 1080, 2401,
+    4045, 902, 7937, 787, 1058, 2383, 32771, 1059, 1040, 1033, 50000, 5555, 10001, 1494,
+    593, 2301, 3, 3268, 7938, 1234, 1022, 1074, 8002, 1036, 1035, 9001, 1037, 464,
+    497, 1935, 6666, 6543, 24, 1352, 3269, 1111, 407, 500, 20, 2006, 3260, 15000,
+    1218, 1034, 4444, 264, 2004, 33, 1042, 42510, 999, 3052, 1023, 1068, 222, 7100,
+    888, 563, 1717, 2008, 992, 32770, 7001, 2007, 8082, 5550, 2009, 5801, 1043, 512,
+    2701, 7019, 50001, 1700, 4662, 2065, 2010, 42, 9535, 2602, 3333, 161, 5100, 5002,
+    4002, 2604, 9595, 9594, 6379, 27017, 9200, 5601, 11211, 2375, 2376, 6443, 10250, 5985,
+    5986, 5672, 15672, 9092, 2181, 8086, 1883, 8883, 502, 102, 8089, 6667, 2222, 2082,
+    2083, 2086, 2087, 2095, 2096, 10443, 5938, 8291, 8728, 5222, 5269, 1194, 25565, 27015,
+    5984, 7474, 9042, 8500, 8200, 2379, 2380, 4369, 61616, 1099, 8083, 8090, 8180, 8983,
+    9080, 9443, 8880,
+)
+
+# Posición de cada puerto en TOP_PORTS
+_RANK: Dict[int, int] = {port: index for index, port in enumerate(TOP_PORTS)}
+
+MAX_PORT = 65535
+
+# Puertos por defecto si la especificación no contiene ninguno válido
+DEFAULT_PORTS = (22, 80, 443)
+
+
+def port_priority(port: int) -> int:
+    """Clave de orden: posición en TOP_PORTS o, si no está, detrás de todos ellos."""
+    return _RANK.get(port, len(TOP_PORTS) + port)
+
+
+def by_likelihood(ports: Iterable[int]) -> List[int]:
+    """Puertos ordenados del más al menos probable de estar abierto."""
+    if isinstance(ports, PortSet):
+        return list(ports.ordered())
+    return sorted(ports, key=port_priority)
+
+
+class PortSet(IntervalSet):
+    """
+    Conjunto de puertos como intervalos ordenados.
+
+    `1-65535` ocupa un único intervalo en lugar de 65535 enteros. La
+    iteración es ascendente, como un set ordenado; `ordered()` recorre los
+    puertos por probabilidad (TOP_PORTS primero), que es el orden en que se
+    sondean para que los servicios abiertos aparezcan pronto y un escaneo
+    interrumpido haya cubierto los puertos más útiles.
+    """
+
+    @classmethod
+    def parse(cls, spec: str, default: Iterable[int] = DEFAULT_PORTS) -> 'PortSet':
+        """
+        Convierte una especificación ('22,80,8000-8100') en un conjunto.
+
+        '-' equivale a 1-65535. Las partes inválidas o fuera de rango se
+        ignoran; si no queda ninguna se usa `default`.
+        """
+        spec = spec.strip()
+        if spec == '-':
+            return cls([(1, MAX_PORT)])
+        intervals: List[Interval] = []
+        for part in spec.split(','):
+            part = part.strip()
+            try:
+                if '-' in part:
+                    start_str, end_str = part.split('-')
+                    start, end = int(start_str.strip()), int(end_str.strip())
+                    if 1 <= start <= MAX_PORT and 1 <= end <= MAX_PORT:
+                        intervals.append((min(start, end), max(start, end)))
+                else:
+                    port = int(part)
+                    if 1 <= port <= MAX_PORT:
+                        intervals.append((port, port))
+            except ValueError:
+                continue
+        return cls(intervals) if intervals else cls.from_ports(default)
+
+    @classmethod
+    def from_ports(cls, ports: Iterable[int]) -> 'PortSet':
+        return cls((port, port) for port in ports)
+
+    @classmethod
+    def top(cls, count: int) -> 'PortSet':
+        """Los `count` puertos más probables (más allá de TOP_PORTS, por número)."""
+        count = max(0, min(count, MAX_PORT))
+        chosen = list(TOP_PORTS[:count])
+        if count > len(TOP_PORTS):
+            extra = count - len(TOP_PORTS)
+            for port in range(1, MAX_PORT + 1):
+                if extra == 0:
+                    break
+                if port not in _RANK:
+                    chosen.append(port)
+                    extra -= 1
+        return cls.from_ports(chosen)
+
+    def ordered(self) -> Iterator[int]:
+        """Puertos del conjunto del más al menos probable, generados bajo demanda."""
+        for port in TOP_PORTS:
+            if port in self:
+                yield port
+        for port in self:
+            if port not in _RANK:
+                yield port
+
+    def difference(self, ports: Iterable[int]) -> 'PortSet':
+        """Copia del conjunto sin `ports`."""
+        result = PortSet(self._intervals)
+        result.difference_update((port, port) for port in ports)
+        return result
+
+    def spec(self) -> str:
+        """Especificación compacta ('22,80,8000-8100')."""
+        return ','.join(
+            str(first) if first == last else f"{first}-{last}" for first, last in self._intervals
+        )
+
+    def __repr__(self) -> str:
+        return f"PortSet({self.spec()})"
@@ -0,0 +1,344 @@
+# network_discovery_tool/probes.py
+import asyncio
+import errno
+import socket
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from .icmp import (ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, ICMPV6_ECHO_REPLY, ICMPV6_ECHO_REQUEST,
+                   build_echo_request)
+from .metrics import ProbeMetrics
+from .models import ip_family
+from .ratelimit import RateLimiter
+from .tcp import close_with_rst, fd_budget
+
+# Puertos por defecto de las sondas TCP: servicios habituales en servidores y
+# estaciones; cualquier respuesta (SYN-ACK o RST) confirma el host
+DEFAULT_TCP_PROBE_PORTS = (80, 443, 22, 445, 3389)
+
+# Puerto UDP poco probable de estar abierto: se espera un ICMP port unreachable
+DEFAULT_UDP_PROBE_PORTS = (40125,)
+
+_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+# Protocolo, tipo de Echo Request y tipo de Echo Reply por familia
+_ECHO = {
+    socket.AF_INET: (socket.IPPROTO_ICMP, ICMP_ECHO_REQUEST, ICMP_ECHO_REPLY),
+    socket.AF_INET6: (socket.IPPROTO_ICMPV6, ICMPV6_ECHO_REQUEST, ICMPV6_ECHO_REPLY),
+}
+
+
+def _set_result(future: asyncio.Future, value: bool):
+    if not future.done():
+        future.set_result(value)
+
+
+async def _wait_socket(sock: socket.socket, timeout: float, writable: bool) -> bool:
+    """Espera a que el socket sea escribible (o legible); False si vence el timeout."""
+    loop = asyncio.get_event_loop()
+    fd = sock.fileno()
+    waiter = loop.create_future()
+    if writable:
+        loop.add_writer(fd, _set_result, waiter, True)
+    else:
+        loop.add_reader(fd, _set_result, waiter, True)
+    timer = loop.call_later(timeout, _set_result, waiter, False)
+    try:
+        return await waiter
+    finally:
+        timer.cancel()
+        if writable:
+            loop.remove_writer(fd)
+        else:
+            loop.remove_reader(fd)
+
+
+class DiscoveryProbe:
+    """
+    Sonda de descubrimiento: un intento por puerto con un socket no bloqueante.
+
+    `attempt` retorna True si la respuesta demuestra que el host está activo
+    y registra el resultado en `metrics` (si no es None).
+    """
+
+    name = ''
+    DEFAULT_PORTS: Sequence[int] = ()
+
+    def __init__(self, ports: Iterable[int] = ()):
+        self.ports = tuple(ports) or tuple(self.DEFAULT_PORTS)
+
+    def check(self):
+        """Comprueba que la sonda puede usarse; lanza PermissionError si no."""
+
+    async def attempt(self, ip: str, port: int, timeout: float,
+                      metrics: Optional[ProbeMetrics]) -> bool:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{self.name}:{','.join(str(port) for port in self.ports)}"
+
+
+class TCPProbe(DiscoveryProbe):
+    """Connect TCP: tanto SYN-ACK (abierto) como RST (cerrado) indican host activo."""
+
+    name = 'tcp'
+    DEFAULT_PORTS = DEFAULT_TCP_PROBE_PORTS
+
+    async def attempt(self, ip: str, port: int, timeout: float,
+                      metrics: Optional[ProbeMetrics]) -> bool:
+        loop = asyncio.get_event_loop()
+        sock = socket.socket(ip_family(ip), socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if metrics is not None:
+            metrics.sent.inc()
+        started = loop.time()
+        try:
+            err = sock.connect_ex((ip, port))
+            if err in _IN_PROGRESS:
+                if not await _wait_socket(sock, timeout, writable=True):
+                    if metrics is not None:
+                        metrics.timeouts.inc()
+                    return False
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        finally:
+            close_with_rst(sock)
+
+        if err in (0, errno.ECONNREFUSED):
+            if metrics is not None:
+                metrics.reply((loop.time() - started) * 1000)
+            return True
+        if metrics is not None:
+            metrics.error(err)
+        return False
+
+
+class UDPProbe(DiscoveryProbe):
+    """
+    Datagrama UDP vacío: una respuesta o un ICMP port unreachable (que el
+    kernel entrega como ECONNREFUSED en un socket conectado) indican host activo.
+    """
+
+    name = 'udp'
+    DEFAULT_PORTS = DEFAULT_UDP_PROBE_PORTS
+
+    async def attempt(self, ip: str, port: int, timeout: float,
+                      metrics: Optional[ProbeMetrics]) -> bool:
+        loop = asyncio.get_event_loop()
+        sock = socket.socket(ip_family(ip), socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        started = loop.time()
+        try:
+            try:
+                sock.connect((ip, port))
+                sock.send(b'')
+            except OSError as e:
+                if metrics is not None:
+                    metrics.error(e.errno)
+                return False
+            if metrics is not None:
+                metrics.sent.inc()
+            if not await _wait_socket(sock, timeout, writable=False):
+                if metrics is not None:
+                    metrics.timeouts.inc()
+                return False
+            try:
+                sock.recv(2048)
+            except ConnectionRefusedError:
+                pass
+            except OSError as e:
+                if metrics is not None:
+                    metrics.error(e.errno)
+                return False
+        finally:
+            sock.close()
+
+        if metrics is not None:
+            metrics.reply((loop.time() - started) * 1000)
+        return True
+
+
+class ICMPProbe(DiscoveryProbe):
+    """
+    Echo Request por un socket ICMP sin privilegios conectado al destino.
+
+    A diferencia de ICMPEngine (un socket para todas las sondas), aquí cada
+    sonda tiene su socket para poder combinarse con las sondas TCP y UDP.
+    """
+
+    name = 'icmp'
+    DEFAULT_PORTS = (0,)
+
+    def check(self):
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+        except OSError as e:
+            raise PermissionError(
+                "Sondas ICMP no disponibles sin privilegios: añade tu grupo a "
+                "net.ipv4.ping_group_range"
+            ) from e
+
+    async def attempt(self, ip: str, port: int, timeout: float,
+                      metrics: Optional[ProbeMetrics]) -> bool:
+        loop = asyncio.get_event_loop()
+        proto, request_type, reply = _ECHO[ip_family(ip)]
+        try:
+            sock = socket.socket(ip_family(ip), socket.SOCK_DGRAM, proto)
+        except OSError as e:
+            # ICMPv6 puede no estar permitido aunque ICMP sí (check solo prueba IPv4)
+            if metrics is not None:
+                metrics.error(e.errno)
+            return False
+        sock.setblocking(False)
+        started = loop.time()
+        try:
+            try:
+                sock.connect((ip, 0))
+                # El kernel asigna el identificador y filtra las respuestas
+                sock.send(build_echo_request(0, 1, request_type=request_type))
+            except OSError as e:
+                if metrics is not None:
+                    metrics.error(e.errno)
+                return False
+            if metrics is not None:
+                metrics.sent.inc()
+            while True:
+                remaining = timeout - (loop.time() - started)
+                if remaining <= 0 or not await _wait_socket(sock, remaining, writable=False):
+                    if metrics is not None:
+                        metrics.timeouts.inc()
+                    return False
+                try:
+                    data = sock.recv(2048)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError as e:
+                    if metrics is not None:
+                        metrics.error(e.errno)
+                    return False
+                if data and data[0] == reply:
+                    break
+        finally:
+            sock.close()
+
+        if metrics is not None:
+            metrics.reply((loop.time() - started) * 1000)
+        return True
+
+
+# Sondas disponibles por nombre (--probes)
+PROBES = {
+    'tcp': TCPProbe,
+    'udp': UDPProbe,
+    'icmp': ICMPProbe,
+}
+
+
+def build_probes(names: Iterable[str], tcp_ports: Iterable[int] = (),
+                 udp_ports: Iterable[int] = ()) -> List[DiscoveryProbe]:
+    """Crea las sondas indicadas por nombre con sus puertos."""
+    ports = {'tcp': tcp_ports, 'udp': udp_ports}
+    probes = []
+    for name in names:
+        try:
+            probe_class = PROBES[name]
+        except KeyError:
+            raise ValueError(f"Sonda de descubrimiento desconocida: {name}")
+        probes.append(probe_class(ports.get(name, ())))
+    return probes
+
+
+class ProbeEngine:
+    """
+    Motor de descubrimiento con sondas TCP/UDP/ICMP sobre un único event loop.
+
+    Todas las sondas de un host salen a la vez y la primera respuesta
+    positiva lo da por activo y cancela el resto; cada intento cuesta un
+    socket no bloqueante en lugar de un proceso. `max_inflight` limita los
+    hosts en vuelo, acotado por los descriptores disponibles.
+    """
+
+    def __init__(self, probes: Sequence[DiscoveryProbe], timeout: float = 1.0,
+                 max_inflight: int = 1024,
+                 timeout_for: Optional[Callable[[str], float]] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[Dict[str, ProbeMetrics]] = None):
+        if not probes:
+            raise ValueError("Se necesita al menos una sonda de descubrimiento")
+        self.probes = list(probes)
+        self.timeout = timeout
+        self.timeout_for = timeout_for
+        self.limiter = limiter
+        # Métricas por sonda (None o vacío = desactivadas)
+        self.metrics = metrics or {}
+        attempts_per_host = sum(len(probe.ports) for probe in self.probes)
+        self.max_inflight = max(1, min(max_inflight, fd_budget() // attempts_per_host))
+        self.hosts_probed = 0
+        self.attempts = 0
+        self.alive = 0
+
+    async def _probe_host(self, ip: str, semaphore: asyncio.Semaphore,
+                          on_reply: Callable[[str, float], None]):
+        loop = asyncio.get_event_loop()
+        timeout = self.timeout_for(ip) if self.timeout_for else self.timeout
+        started = loop.time()
+        pending = {
+            loop.create_task(probe.attempt(ip, port, timeout, self.metrics.get(probe.name)))
+            for probe in self.probes
+            for port in probe.ports
+        }
+        self.hosts_probed += 1
+        self.attempts += len(pending)
+        alive = False
+        try:
+            while pending and not alive:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                alive = any(task.result() for task in done)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                # Dejar que los intentos cancelados cierren sus sockets
+                await asyncio.wait(pending)
+            if self.limiter:
+                self.limiter.release(ip)
+            semaphore.release()
+
+        if alive:
+            self.alive += 1
+            on_reply(ip, (loop.time() - started) * 1000)
+
+    async def _run(self, targets: Iterable[str], on_reply: Callable[[str, float], None]):
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        for ip in targets:
+            await semaphore.acquire()
+            if self.limiter:
+                await self.limiter.acquire_async(ip)
+            task = loop.create_task(self._probe_host(ip, semaphore, on_reply))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def scan(self, targets: Iterable[str],
+             on_reply: Optional[Callable[[str, float], None]] = None) -> Dict[str, float]:
+        """
+        Sondea todos los objetivos y retorna {ip: ms hasta la primera respuesta}.
+
+        `on_reply` se invoca desde el event loop por cada host activo.
+        """
+        for probe in self.probes:
+            probe.check()
+        results: Dict[str, float] = {}
+
+        def _collect(ip: str, rtt: float):
+            results[ip] = rtt
+            if on_reply:
+                on_reply(ip, rtt)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(targets, _collect))
+        finally:
+            loop.close()
+        return results
@@ -0,0 +1,205 @@
+# network_discovery_tool/ratelimit.py
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Optional
+
+from .models import IPV6_BASE, ip_to_int
+
+# Espera entre reintentos cuando un destino o una subred están al límite
+CAP_RETRY_INTERVAL = 0.005
+
+# Retraso de los temporizadores (sleep) que se recupera sin perder tasa
+TIMER_SLACK = 0.005
+
+
+class RateLimiter:
+    """
+    Limitador de sondas compartido por los motores de descubrimiento y de puertos.
+
+    - Tasa global en sondas/s con un token bucket (GCRA): las sondas salen
+      espaciadas 1/rate segundos, con ráfagas de como mucho `burst`.
+    - Límite de sondas en vuelo por destino (`per_host`) y por subred
+      (`per_subnet`, /24 por defecto; /64 en IPv6).
+
+    `try_acquire(ip)` nunca bloquea: reserva la sonda y retorna 0, o retorna
+    los segundos a esperar antes de reintentar. Los hilos usan `acquire` /
+    `slot` y los event loops `acquire_async`; toda sonda reservada se libera
+    con `release(ip)`. Un valor 0 desactiva cada límite.
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 1, per_host: int = 0,
+                 per_subnet: int = 0, prefixlen: int = 24):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.per_host = per_host
+        self.per_subnet = per_subnet
+        self.prefixlen = prefixlen
+        self._interval = 1.0 / rate if rate else 0.0
+        # Instante teórico de salida de la siguiente sonda (reloj monotónico)
+        self._tat = 0.0
+        self._host_inflight: Dict[str, int] = {}
+        self._subnet_inflight: Dict[Hashable, int] = {}
+        self._cond = threading.Condition()
+        self.reset_stats()
+
+    @property
+    def active(self) -> bool:
+        return bool(self.rate or self.per_host or self.per_subnet)
+
+    def config(self) -> Dict:
+        """Parámetros del limitador (para crear otro equivalente en otro proceso)."""
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'per_host': self.per_host,
+            'per_subnet': self.per_subnet,
+            'prefixlen': self.prefixlen
+        }
+
+    def with_rate(self, rate: float) -> 'RateLimiter':
+        """Limitador con los mismos límites en vuelo y la menor de las dos tasas."""
+        config = self.config()
+        if rate and (not self.rate or rate < self.rate):
+            config['rate'] = rate
+        return RateLimiter(**config)
+
+    def _subnet_of(self, ip: str) -> Hashable:
+        value = ip_to_int(ip)
+        if isinstance(value, int) and value >= IPV6_BASE:
+            # IPv6: el /64 del host
+            return 6, (value - IPV6_BASE) >> 64
+        if isinstance(value, int):
+            return value >> (32 - self.prefixlen)
+        return ip
+
+    def try_acquire(self, ip: str) -> float:
+        """Reserva una sonda hacia `ip`; retorna 0 o los segundos a esperar."""
+        with self._cond:
+            subnet = None
+            if self.per_host and self._host_inflight.get(ip, 0) >= self.per_host:
+                self.cap_waits += 1
+                return CAP_RETRY_INTERVAL
+            if self.per_subnet:
+                subnet = self._subnet_of(ip)
+                if self._subnet_inflight.get(subnet, 0) >= self.per_subnet:
+                    self.cap_waits += 1
+                    return CAP_RETRY_INTERVAL
+
+            now = time.monotonic()
+            if self._interval:
+                # Las sondas que salen tarde por la granularidad del sleep se
+                # compensan después; tras un periodo inactivo no se acumula más
+                tat = max(self._tat, now - TIMER_SLACK)
+                allowance = (self.burst - 1) * self._interval
+                if tat - now > allowance:
+                    self.rate_waits += 1
+                    return tat - now - allowance
+                self._tat = tat + self._interval
+
+            if self.per_host:
+                inflight = self._host_inflight.get(ip, 0) + 1
+                self._host_inflight[ip] = inflight
+                self.peak_host_inflight = max(self.peak_host_inflight, inflight)
+            if subnet is not None:
+                inflight = self._subnet_inflight.get(subnet, 0) + 1
+                self._subnet_inflight[subnet] = inflight
+                self.peak_subnet_inflight = max(self.peak_subnet_inflight, inflight)
+
+            self.probes += 1
+            wall = time.time()
+            if self.first_probe_at is None:
+                self.first_probe_at = wall
+            self.last_probe_at = wall
+            return 0.0
+
+    def release(self, ip: str):
+        """Libera la sonda reservada hacia `ip`."""
+        if not (self.per_host or self.per_subnet):
+            return
+        with self._cond:
+            if self.per_host:
+                inflight = self._host_inflight.get(ip, 0) - 1
+                if inflight > 0:
+                    self._host_inflight[ip] = inflight
+                else:
+                    self._host_inflight.pop(ip, None)
+            if self.per_subnet:
+                subnet = self._subnet_of(ip)
+                inflight = self._subnet_inflight.get(subnet, 0) - 1
+                if inflight > 0:
+                    self._subnet_inflight[subnet] = inflight
+                else:
+                    self._subnet_inflight.pop(subnet, None)
+            self._cond.notify_all()
+
+    def acquire(self, ip: str):
+        """Reserva una sonda bloqueando el hilo el tiempo necesario."""
+        while True:
+            wait = self.try_acquire(ip)
+            if not wait:
+                return
+            with self._cond:
+                # Una liberación despierta antes a los que esperan por un límite
+                self._cond.wait(wait)
+
+    async def acquire_async(self, ip: str):
+        """Reserva una sonda sin bloquear el event loop."""
+        while True:
+            wait = self.try_acquire(ip)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    @contextmanager
+    def slot(self, ip: str):
+        self.acquire(ip)
+        try:
+            yield
+        finally:
+            self.release(ip)
+
+    def reset_stats(self):
+        """Reinicia las estadísticas (p. ej. al comenzar una fase)."""
+        with self._cond:
+            self.probes = 0
+            self.rate_waits = 0
+            self.cap_waits = 0
+            self.peak_host_inflight = 0
+            self.peak_subnet_inflight = 0
+            self.first_probe_at: Optional[float] = None
+            self.last_probe_at: Optional[float] = None
+
+    def merge_stats(self, stats: Dict):
+        """Acumula las estadísticas de otro limitador (otro proceso o fase)."""
+        with self._cond:
+            self.probes += stats['probes']
+            self.rate_waits += stats['rate_waits']
+            self.cap_waits += stats['cap_waits']
+            self.peak_host_inflight = max(self.peak_host_inflight, stats['peak_host_inflight'])
+            self.peak_subnet_inflight = max(self.peak_subnet_inflight, stats['peak_subnet_inflight'])
+            for key, pick in (('first_probe_at', min), ('last_probe_at', max)):
+                if stats[key] is not None:
+                    current = getattr(self, key)
+                    setattr(self, key, stats[key] if current is None else pick(current, stats[key]))
+
+    def stats(self) -> Dict:
+        """Tasa conseguida frente a la objetivo y contadores de esperas."""
+        with self._cond:
+            elapsed = 0.0
+            if self.first_probe_at is not None:
+                elapsed = self.last_probe_at - self.first_probe_at
+            return {
+                'target_pps': self.rate,
+                'achieved_pps': round((self.probes - 1) / elapsed, 1) if elapsed > 0 else 0,
+                'probes': self.probes,
+                'rate_waits': self.rate_waits,
+                'cap_waits': self.cap_waits,
+                'per_host': self.per_host,
+                'per_subnet': self.per_subnet,
+                'peak_host_inflight': self.peak_host_inflight,
+                'peak_subnet_inflight': self.peak_subnet_inflight,
+                'first_probe_at': self.first_probe_at,
+                'last_probe_at': self.last_probe_at
+            }
@@ -0,0 +1,284 @@
+# network_discovery_tool/resolver.py
+import concurrent.futures
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from .models import ip_family
+
+# Valor mostrado cuando una IP no tiene registro PTR
+NO_HOSTNAME = "N/A"
+
+_MISS = object()
+
+# Segundos que se recuerda un fallo transitorio (timeout, SERVFAIL, error de
+# red): evita repetir la consulta en el mismo escaneo sin tomarlo por NXDOMAIN
+FAILURE_TTL = 30
+
+# h_errno de gethostbyaddr que indican que la IP no tiene nombre
+_HOST_NOT_FOUND = 1
+_NO_DATA = 4
+
+_DNS_HEADER = struct.Struct('!HHHHHH')
+_DNS_TYPE_PTR = 12
+_DNS_CLASS_IN = 1
+_DNS_RCODE_NXDOMAIN = 3
+
+
+class DNSError(Exception):
+    """Error de transporte o de protocolo consultando un servidor DNS."""
+
+
+def reverse_name(ip: str) -> str:
+    """Nombre in-addr.arpa (IPv4) o ip6.arpa (IPv6, por nibbles) de una dirección."""
+    if ip_family(ip) == socket.AF_INET6:
+        nibbles = socket.inet_pton(socket.AF_INET6, ip).hex()
+        return '.'.join(reversed(nibbles)) + '.ip6.arpa'
+    return '.'.join(reversed(ip.split('.'))) + '.in-addr.arpa'
+
+
+def build_ptr_query(ip: str, query_id: int) -> bytes:
+    """Construye una consulta DNS PTR con recursión deseada."""
+    header = _DNS_HEADER.pack(query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(
+        bytes([len(label)]) + label.encode('ascii')
+        for label in reverse_name(ip).split('.')
+    ) + b'\x00'
+    return header + qname + struct.pack('!HH', _DNS_TYPE_PTR, _DNS_CLASS_IN)
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Decodifica un nombre DNS (con compresión) y retorna (nombre, siguiente offset)."""
+    labels = []
+    end = None
+    for _ in range(128):  # Protección contra bucles de punteros
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return '.'.join(labels), (end if end is not None else offset)
+        labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    raise DNSError("Nombre DNS mal formado")
+
+
+def parse_ptr_response(data: bytes, query_id: int) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Extrae el primer registro PTR de una respuesta DNS.
+
+    Retorna (hostname, ttl); hostname es None si la IP no tiene PTR.
+    """
+    if len(data) < _DNS_HEADER.size:
+        raise DNSError("Respuesta DNS truncada")
+    rid, flags, qdcount, ancount, _, _ = _DNS_HEADER.unpack_from(data)
+    if rid != query_id:
+        raise DNSError("Identificador de respuesta DNS inesperado")
+    rcode = flags & 0x000F
+    if rcode == _DNS_RCODE_NXDOMAIN:
+        return None, None
+    if rcode != 0:
+        raise DNSError(f"Error del servidor DNS (rcode={rcode})")
+
+    try:
+        offset = _DNS_HEADER.size
+        for _ in range(qdcount):
+            _, offset = _read_name(data, offset)
+            offset += 4
+        for _ in range(ancount):
+            _, offset = _read_name(data, offset)
+            rtype, _, ttl, rdlength = struct.unpack_from('!HHIH', data, offset)
+            offset += 10
+            if rtype == _DNS_TYPE_PTR:
+                hostname, _ = _read_name(data, offset)
+                return hostname, ttl
+            offset += rdlength
+    except (IndexError, struct.error) as e:
+        raise DNSError("Respuesta DNS mal formada") from e
+    return None, None
+
+
+def query_ptr(ip: str, server: Tuple[str, int], timeout: float = 2.0) -> Tuple[Optional[str], Optional[int]]:
+    """Consulta el PTR de `ip` directamente a un servidor DNS por UDP."""
+    query_id = random.randint(0, 0xFFFF)
+    with socket.socket(ip_family(server[0]), socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(server)
+        sock.send(build_ptr_query(ip, query_id))
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                data = sock.recv(4096)
+            except socket.timeout as e:
+                raise DNSError(f"Timeout consultando {server[0]}:{server[1]}") from e
+            except OSError as e:
+                raise DNSError(str(e)) from e
+            try:
+                return parse_ptr_response(data, query_id)
+            except DNSError:
+                # Respuestas ajenas o tardías: seguir esperando la nuestra
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise
+                sock.settimeout(remaining)
+
+
+def parse_server(spec: str) -> Tuple[str, int]:
+    """Convierte 'ip', 'ip:puerto', 'ipv6' o '[ipv6]:puerto' en una dirección para UDP."""
+    if spec.startswith('['):
+        host, _, port = spec[1:].partition(']')
+        return host, int(port[1:]) if port else 53
+    if spec.count(':') > 1:
+        return spec, 53
+    host, _, port = spec.partition(':')
+    return host, int(port) if port else 53
+
+
+class ReverseResolver:
+    """
+    Etapa de resolución inversa (PTR) independiente del descubrimiento.
+
+    Resuelve en un pool propio con `max_workers` consultas simultáneas,
+    deduplica las consultas en curso para la misma IP y mantiene una caché
+    positiva y negativa con TTL, opcionalmente persistida en `cache_file`.
+    Los fallos transitorios (timeouts, errores del servidor o de red) solo
+    se recuerdan FAILURE_TTL segundos y nunca se persisten.
+    Sin `dns_server` usa el resolvedor del sistema (gethostbyaddr).
+    """
+
+    def __init__(self, max_workers: int = 16, ttl: float = 3600, negative_ttl: float = 300,
+                 cache_file: Optional[str] = None, dns_server: Optional[str] = None,
+                 timeout: float = 2.0):
+        self.max_workers = max(1, max_workers)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache_file = cache_file
+        self.server = parse_server(dns_server) if dns_server else None
+        self.timeout = timeout
+        self.lookups = 0
+        self.cache_hits = 0
+        self._cache: Dict[str, Tuple[Optional[str], float]] = {}
+        # IPs cuya entrada en caché es un fallo transitorio (no se persisten)
+        self._failed: Set[str] = set()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='ndiscover-dns'
+        )
+        if cache_file:
+            self.load()
+
+    def _lookup(self, ip: str) -> Tuple[Optional[str], float, bool]:
+        """
+        Consulta el PTR y retorna (hostname o None, ttl a aplicar, fallo transitorio).
+
+        Solo NXDOMAIN o una respuesta sin PTR cuentan como respuesta negativa.
+        """
+        if self.server:
+            try:
+                hostname, ttl = query_ptr(ip, self.server, self.timeout)
+            except DNSError:
+                return None, FAILURE_TTL, True
+            if hostname is None:
+                return None, self.negative_ttl, False
+            return hostname, min(ttl, self.ttl) if ttl else self.ttl, False
+
+        try:
+            hostname, _, _ = socket.gethostbyaddr(ip)
+            return hostname, self.ttl, False
+        except socket.herror as e:
+            if e.errno in (_HOST_NOT_FOUND, _NO_DATA):
+                return None, self.negative_ttl, False
+            return None, FAILURE_TTL, True
+        except (socket.gaierror, OSError):
+            return None, FAILURE_TTL, True
+
+    def _cached(self, ip: str):
+        """Hostname en caché (None si es negativo) o _MISS si no está o caducó."""
+        entry = self._cache.get(ip)
+        if entry is None:
+            return _MISS
+        hostname, expires = entry
+        if expires < time.time():
+            del self._cache[ip]
+            self._failed.discard(ip)
+            return _MISS
+        return hostname
+
+    def _resolve_and_store(self, ip: str) -> str:
+        hostname, ttl, failed = self._lookup(ip)
+        with self._lock:
+            self.lookups += 1
+            self._cache[ip] = (hostname, time.time() + ttl)
+            if failed:
+                self._failed.add(ip)
+            else:
+                self._failed.discard(ip)
+            self._inflight.pop(ip, None)
+        return hostname or NO_HOSTNAME
+
+    def submit(self, ip: str) -> concurrent.futures.Future:
+        """Programa la resolución de `ip` y retorna un Future con el hostname."""
+        with self._lock:
+            cached = self._cached(ip)
+            if cached is not _MISS:
+                self.cache_hits += 1
+                future = concurrent.futures.Future()
+                future.set_result(cached or NO_HOSTNAME)
+                return future
+            future = self._inflight.get(ip)
+            if future is None:
+                future = self._executor.submit(self._resolve_and_store, ip)
+                self._inflight[ip] = future
+            return future
+
+    def resolve(self, ip: str) -> str:
+        """Resuelve `ip` de forma bloqueante (usando la caché)."""
+        return self.submit(ip).result()
+
+    def resolve_many(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Resuelve varias IPs en paralelo y retorna {ip: hostname}."""
+        futures = {ip: self.submit(ip) for ip in ips}
+        return {ip: future.result() for ip, future in futures.items()}
+
+    def load(self):
+        """Carga la caché persistida descartando las entradas caducadas."""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for ip, (hostname, expires) in data.items():
+                if expires > now:
+                    self._cache[ip] = (hostname, expires)
+
+    def save(self):
+        """Persiste la caché vigente en `cache_file` (escritura atómica)."""
+        if not self.cache_file:
+            return
+        now = time.time()
+        with self._lock:
+            data = {
+                ip: [hostname, expires]
+                for ip, (hostname, expires) in self._cache.items()
+                if expires > now and ip not in self._failed
+            }
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def close(self):
+        """Espera a las consultas pendientes, guarda la caché y libera el pool."""
+        self._executor.shutdown(wait=True)
+        self.save()
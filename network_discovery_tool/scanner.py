@@ -1,14 +1,27 @@
 # network_discovery_tool/scanner.py
+import asyncio
 import concurrent.futures
+import errno
+import itertools
 import socket
 import subprocess
 import platform
-from ipaddress import IPv4Network, AddressValueError
-from typing import List, Dict, Optional, Set
+import threading
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 import time
 
 # Importar logger
 from .logger import get_logger
+from .metrics import MetricsRegistry, ProbeMetrics
+from .models import HostResult, PortResult, ip_family
+from .ports import PortSet, by_likelihood
+from .probes import DiscoveryProbe
+from .ratelimit import RateLimiter
+from .resolver import NO_HOSTNAME, ReverseResolver
+from .services import ServiceDetector
+from .targets import TargetSet
+from .timing import RTTEstimator, effective_timeout, format_wait
+from .udp import DEFAULT_HOST_RATE, OPEN, UDP_SERVICE_PORTS, UDPScanEngine
 
 # Diccionario de servicios comunes
 SERVICE_PORTS = {
@@ -28,18 +41,91 @@ SERVICE_PORTS = {
     8443: 'HTTPS-Alt'
 }
 
+def bounded_map(executor: concurrent.futures.Executor, fn: Callable, items: Iterable,
+                window: int) -> Iterator[Tuple[object, object]]:
+    """
+    Aplica `fn` a `items` en el executor con como mucho `window` futures en vuelo.
+
+    Consume `items` de forma perezosa y produce (item, resultado) en orden de
+    finalización, por lo que la memoria no depende del número de objetivos.
+    """
+    items = iter(items)
+    window = max(1, window)
+    inflight = {
+        executor.submit(fn, item): item
+        for item in itertools.islice(items, window)
+    }
+    while inflight:
+        done, _ = concurrent.futures.wait(
+            inflight, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            item = inflight.pop(future)
+            yield item, future.result()
+        for item in itertools.islice(items, len(done)):
+            inflight[executor.submit(fn, item)] = item
+
+
+
+def _recorded(items: Iterable[str], consumed: List[str]) -> Iterator[str]:
+    """Produce `items` guardando en `consumed` cada elemento leído."""
+    for item in items:
+        consumed.append(item)
+        yield item
+
+
+# Resultados de connect_ex que indican que venció el timeout
+_TIMEOUT_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT, errno.EINPROGRESS)
+
+# Motores de descubrimiento disponibles para NetworkScanner
+DISCOVERY_ENGINES = ('ping', 'icmp', 'probe')
+
+
 class NetworkScanner:
-    def __init__(self, timeout: int = 2, max_threads: int = 50, verbose: bool = False):  # <-- VERBOSE AÑADIDO
-        self.timeout = timeout
+    # Futures en vuelo por hilo del pool en el motor 'ping'
+    WINDOW_FACTOR = 4
+    
+    def __init__(self, timeout: int = 2, max_threads: int = 50, verbose: bool = False,  # <-- VERBOSE AÑADIDO
+                 engine: str = 'ping', max_inflight: int = 1024,
+                 resolve: bool = True, resolver: Optional[ReverseResolver] = None,
+                 rtt_estimator: Optional[RTTEstimator] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 probes: Optional[List[DiscoveryProbe]] = None):
+        if engine not in DISCOVERY_ENGINES:
+            raise ValueError(f"Motor de descubrimiento desconocido: {engine}")
+        self.timeout = timeout  # Techo del timeout si es adaptativo
+        # Con estimador, el timeout de cada sonda se adapta al RTT de su subred
+        self.rtt = rtt_estimator
         self.max_threads = max_threads
+        self.engine = engine
+        self.max_inflight = max_inflight
+        # Sondas del motor 'probe' (por defecto connect TCP a puertos comunes)
+        self.probes = probes
+        # Tasa de sondas y límites en vuelo, compartible con PortScanner
+        self.limiter = rate_limiter
+        self.rate_stats: Dict = {}
+        # Registro de métricas, compartible con PortScanner y la salida
+        self.metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self._probe_metrics: Optional[ProbeMetrics] = None
+        # Etapa de resolución inversa separada del descubrimiento
+        if resolve and resolver is None:
+            resolver = ReverseResolver()
+        self.resolver = resolver if resolve else None
         self.active_hosts = []
         self.scan_duration = 0
+        self.probes_sent = 0
+        self._ping_error_logged = False
         self.logger = get_logger(verbose)  # <-- PASA VERBOSE
         
-    def ping_host(self, ip: str) -> Optional[Dict]:
+    def ping_host(self, ip: str) -> Optional[HostResult]:
         """Realiza un ping a un host y retorna información si está activo."""
         param = '-n' if platform.system().lower() == 'windows' else '-c'
-        command = ['ping', param, '1', '-W', str(self.timeout), ip]
+        timeout = effective_timeout(self.rtt, ip, self.timeout)
+        command = ['ping', param, '1', '-W', format_wait(timeout), ip]
+        metrics = self._probe_metrics
+        if metrics is not None:
+            metrics.sent.inc()
         
         try:
             start_time = time.time()
@@ -47,74 +133,311 @@ class NetworkScanner:
                 command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                timeout=self.timeout + 1,
+                timeout=timeout + 1,
                 text=True
             )
-            response_time = int((time.time() - start_time) * 1000)
+            elapsed_ms = (time.time() - start_time) * 1000
+            response_time = int(elapsed_ms)
             
             if output.returncode == 0:
-                hostname = self.resolve_hostname(ip)
-                return {
-                    'ip': ip,
-                    'hostname': hostname,
-                    'status': 'active',
-                    'response_time': response_time,
-                    'open_ports': []  # Se llenará después si se escanean puertos
-                }
-        except Exception:
-            pass
+                if self.rtt:
+                    self.rtt.observe(ip, elapsed_ms)
+                if metrics is not None:
+                    metrics.reply(elapsed_ms)
+                # El hostname lo completa la etapa de resolución inversa
+                return HostResult(ip, NO_HOSTNAME, response_time)
+            # ping sale con 1 si no hubo respuesta y con 2 ante errores
+            if output.returncode == 1:
+                if metrics is not None:
+                    metrics.timeouts.inc()
+            else:
+                if metrics is not None:
+                    metrics.error(f"exit {output.returncode}")
+                self._ping_failed(command, output)
+        except subprocess.TimeoutExpired:
+            if metrics is not None:
+                metrics.timeouts.inc()
+        except Exception as e:
+            if metrics is not None:
+                metrics.error(getattr(e, 'errno', None) or type(e).__name__)
         
         return None
     
+    def _ping_failed(self, command: List[str], output: subprocess.CompletedProcess):
+        """
+        Avisa (una vez por escaneo) de que ping falló en lugar de no recibir
+        respuesta: con un error de uso todos los hosts parecerían caídos.
+        """
+        if self._ping_error_logged:
+            return
+        self._ping_error_logged = True
+        self.logger.error(
+            "ping falló (código %d) con '%s': %s", output.returncode, ' '.join(command),
+            output.stderr.strip() or "sin mensaje"
+        )
+
     def resolve_hostname(self, ip: str) -> str:
         """Resuelve el nombre de host para una IP."""
+        if self.resolver is None:
+            return NO_HOSTNAME
+        return self.resolver.resolve(ip)
+    
+    def _host_found(self, host: HostResult, pending: List[concurrent.futures.Future],
+                    on_host: Optional[Callable[[HostResult], None]]):
+        """
+        Pasa un host activo a la etapa de resolución inversa.
+
+        El worker de descubrimiento queda libre de inmediato; `on_host` se
+        invoca (desde el pool del resolvedor) cuando el hostname está listo.
+        """
+        # Se completa cuando el host está listo, tras ejecutar `on_host`
+        stage_done = concurrent.futures.Future()
+        
+        def _resolved(hostname: str):
+            try:
+                host.hostname = hostname
+                self.logger.debug("Host activo: %s (%s)", host.ip, hostname)
+                if on_host:
+                    on_host(host)
+            finally:
+                stage_done.set_result(host)
+        
+        pending.append(stage_done)
+        if self.resolver is None:
+            _resolved(NO_HOSTNAME)
+        else:
+            self.resolver.submit(host.ip).add_done_callback(lambda f: _resolved(f.result()))
+    
+    def scan_network(self, network_cidr: str,
+                     on_host: Optional[Callable[[HostResult], None]] = None) -> List[HostResult]:
+        """
+        Escanea un rango de red completo.
+
+        `on_host(host)` se invoca por cada host activo en cuanto se descubre.
+        """
         try:
-            hostname, _, _ = socket.gethostbyaddr(ip)
-            return hostname
-        except:
-            return "N/A"
+            targets = TargetSet.from_network(network_cidr)
+        except ValueError:
+            self.logger.error("Formato de red inválido: %s", network_cidr)
+            raise
+        return self.scan_target_set(targets, on_host)
+    
+    def scan_target_set(self, targets: TargetSet,
+                        on_host: Optional[Callable[[HostResult], None]] = None) -> List[HostResult]:
+        """Escanea un conjunto de objetivos; cada dirección se sondea una sola vez."""
+        total = len(targets)
+        self.logger.info("Escaneando %d direcciones IP...", total)
+        return self.scan_targets(targets, total=total, on_host=on_host)
     
-    def scan_network(self, network_cidr: str) -> List[Dict]:
-        """Escanea un rango de red completo."""
+    def scan_targets(self, targets: Union[TargetSet, Iterable[str]], total: int = 0,
+                     on_host: Optional[Callable[[HostResult], None]] = None,
+                     rate: float = 0) -> List[HostResult]:
+        """
+        Sondea un TargetSet o una secuencia (perezosa) de IPs.
+
+        `total` solo se usa para el progreso; `rate` limita las sondas por
+        segundo (0 = sin límite) además del limitador del escáner.
+        """
+        start_time = time.time()
+        
+        limiter = self.limiter
+        if limiter:
+            limiter.reset_stats()
+        if rate:
+            limiter = limiter.with_rate(rate) if limiter else RateLimiter(rate)
+        
+        self.probes_sent = 0
+        self._ping_error_logged = False
+        hosts_data: List[HostResult] = []
+        with self.metrics.phase('discovery'):
+            addresses = targets.addresses() if isinstance(targets, TargetSet) else targets
+            if self.engine == 'probe':
+                hosts_data = self._scan_network_probe(addresses, on_host, limiter)
+            
+            if self.engine == 'icmp':
+                hosts_data, addresses = self._scan_icmp_or_fallback(
+                    targets, addresses, on_host, limiter
+                )
+            
+            if self.engine == 'ping':
+                # Tras un relevo desde 'icmp' se suman sus hosts y sondas
+                icmp_probes = self.probes_sent
+                hosts_data += self._scan_network_ping(addresses, total, on_host, limiter)
+                self.probes_sent += icmp_probes
+        
+        self.scan_duration = time.time() - start_time
+        self.active_hosts = hosts_data
+        self.rate_stats = limiter.stats() if limiter else {}
+        if self.limiter and limiter is not self.limiter:
+            self.limiter.merge_stats(self.rate_stats)
+        
+        self.logger.info(
+            "Escaneo completado: %d hosts en %.2f segundos", len(hosts_data), self.scan_duration
+        )
+        
+        return hosts_data
+    
+    def _scan_icmp_or_fallback(self, targets: Union[TargetSet, Iterable[str]],
+                               addresses: Iterable[str],
+                               on_host: Optional[Callable[[HostResult], None]],
+                               limiter: Optional[RateLimiter]
+                               ) -> Tuple[List[HostResult], Iterable[str]]:
+        """
+        Descubrimiento ICMP; si falta el permiso, prepara el relevo del motor 'ping'.
+
+        Retorna (hosts, objetivos pendientes). El socket de una familia se
+        abre con su primer objetivo, así que el permiso puede faltar a mitad
+        del barrido: los hosts ya descubiertos se conservan y 'ping' sondea
+        el resto desde el principio (TargetSet o secuencia) o, si los
+        objetivos son un generador, los ya leídos sin respuesta y los que
+        quedan.
+        """
+        # Un generador no puede recorrerse otra vez: se guarda lo leído
+        restartable = isinstance(targets, TargetSet) or iter(targets) is not targets
+        consumed: List[str] = []
+        hosts_data: List[HostResult] = []
         try:
-            network = IPv4Network(network_cidr, strict=False)
-        except AddressValueError:
-            self.logger.error(f"Formato de red inválido: {network_cidr}")
-            raise ValueError(f"Formato de red inválido: {network_cidr}")
+            self._scan_network_icmp(
+                addresses if restartable else _recorded(addresses, consumed),
+                on_host, limiter, hosts_data
+            )
+            return hosts_data, ()
+        except PermissionError as e:
+            self.logger.warning("%s. Usando el motor 'ping'", e)
+            self.engine = 'ping'
         
-        self.logger.info(f"Escaneando {network.num_addresses} direcciones IP...")
-        start_time = time.time()
+        if isinstance(targets, TargetSet):
+            pending = targets.addresses()
+        elif restartable:
+            pending = targets
+        else:
+            pending = itertools.chain(consumed, addresses)
+        answered = {host.ip for host in hosts_data}
+        return hosts_data, (ip for ip in pending if ip not in answered)
+    
+    def _scan_network_ping(self, targets: Iterable[str], total: int,
+                           on_host: Optional[Callable[[HostResult], None]] = None,
+                           limiter: Optional[RateLimiter] = None) -> List[HostResult]:
+        """Descubrimiento con un proceso ping por IP en un pool de hilos."""
         hosts_data = []
+        pending = []
+        
+        def limited_probe(ip: str) -> Optional[HostResult]:
+            with limiter.slot(ip):
+                return self.ping_host(ip)
+        
+        probe = limited_probe if limiter else self.ping_host
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            future_to_ip = {
-                executor.submit(self.ping_host, str(ip)): ip 
-                for ip in network.hosts()
-            }
+            # Ventana acotada: los objetivos se generan a medida que se liberan
+            # huecos, sin crear un future por cada IP de la red
+            window = self.max_threads * self.WINDOW_FACTOR
             
             completed = 0
-            total = network.num_addresses - 2
+            self._probe_metrics = self.metrics.probes('discovery', 'ping')
             
-            for future in concurrent.futures.as_completed(future_to_ip):
+            for _, result in bounded_map(executor, probe, targets, window):
                 completed += 1
+                self.probes_sent = completed
                 if completed % 50 == 0:
-                    self.logger.debug(f"Progreso: {completed}/{total}")
+                    self.logger.debug("Progreso: %d/%s", completed, total or '?')
                 
-                result = future.result()
                 if result:
                     hosts_data.append(result)
-                    self.logger.debug(
-                        f"Host activo: {result['ip']} ({result['hostname']})"
-                    )
+                    self._host_found(result, pending, on_host)
         
-        self.scan_duration = time.time() - start_time
-        self.active_hosts = hosts_data
+        concurrent.futures.wait(pending)
+        return hosts_data
+    
+    def _scan_network_icmp(self, targets: Iterable[str],
+                           on_host: Optional[Callable[[HostResult], None]] = None,
+                           limiter: Optional[RateLimiter] = None,
+                           hosts_data: Optional[List[HostResult]] = None) -> List[HostResult]:
+        """
+        Descubrimiento con el motor ICMP asíncrono en proceso.
+
+        Los hosts se añaden a `hosts_data` a medida que responden, así que
+        quedan ahí aunque el escaneo termine con PermissionError.
+        """
+        from .icmp import ICMPEngine
         
-        self.logger.info(
-            f"Escaneo completado: {len(hosts_data)} hosts en "
-            f"{self.scan_duration:.2f} segundos"
+        if hosts_data is None:
+            hosts_data = []
+        pending = []
+        
+        def on_reply(ip: str, rtt: float):
+            self.logger.debug("Respuesta ICMP: %s - %.2fms", ip, rtt)
+            if self.rtt:
+                self.rtt.observe(ip, rtt)
+            # Cada host pasa a la siguiente etapa en cuanto responde
+            host = HostResult(ip, NO_HOSTNAME, int(rtt))
+            hosts_data.append(host)
+            self._host_found(host, pending, on_host)
+        
+        engine = ICMPEngine(
+            timeout=self.timeout,
+            max_inflight=self.max_inflight,
+            timeout_for=(lambda ip: self.rtt.timeout_for(ip, self.timeout)) if self.rtt else None,
+            limiter=limiter,
+            metrics=self.metrics.probes('discovery', 'icmp')
+        )
+        try:
+            engine.scan(targets, on_reply=on_reply)
+        finally:
+            self.probes_sent = engine.probes_sent
+            concurrent.futures.wait(pending)
+        self.logger.debug(
+            "Sondas ICMP enviadas: %d, respuestas: %d", engine.probes_sent, engine.replies
         )
+        return hosts_data
+    
+    def _scan_network_probe(self, targets: Iterable[str],
+                            on_host: Optional[Callable[[HostResult], None]] = None,
+                            limiter: Optional[RateLimiter] = None) -> List[HostResult]:
+        """Descubrimiento con sondas TCP/UDP/ICMP sobre sockets no bloqueantes."""
+        from .probes import ProbeEngine, TCPProbe
         
+        probes = list(self.probes) if self.probes else [TCPProbe()]
+        usable = []
+        for probe in probes:
+            try:
+                probe.check()
+                usable.append(probe)
+            except PermissionError as e:
+                self.logger.warning("%s. Se omite la sonda '%s'", e, probe.name)
+        if not usable:
+            usable = [TCPProbe()]
+            self.logger.warning("Ninguna sonda disponible. Usando connect TCP")
+        
+        hosts_data = []
+        pending = []
+        
+        def on_reply(ip: str, rtt: float):
+            self.logger.debug("Respuesta de sonda: %s - %.2fms", ip, rtt)
+            if self.rtt:
+                self.rtt.observe(ip, rtt)
+            host = HostResult(ip, NO_HOSTNAME, int(rtt))
+            hosts_data.append(host)
+            self._host_found(host, pending, on_host)
+        
+        engine = ProbeEngine(
+            usable,
+            timeout=self.timeout,
+            max_inflight=self.max_inflight,
+            timeout_for=(lambda ip: self.rtt.timeout_for(ip, self.timeout)) if self.rtt else None,
+            limiter=limiter,
+            metrics={probe.name: self.metrics.probes('discovery', probe.name) for probe in usable}
+        )
+        try:
+            engine.scan(targets, on_reply=on_reply)
+        finally:
+            self.probes_sent = engine.attempts
+        self.logger.debug(
+            "Sondas %s: %d hosts, %d intentos, %d activos",
+            ', '.join(map(repr, usable)), engine.hosts_probed, engine.attempts, engine.alive
+        )
+        
+        concurrent.futures.wait(pending)
         return hosts_data
     
     def get_scan_stats(self) -> Dict:
@@ -123,99 +446,478 @@ class NetworkScanner:
             'total_hosts_found': len(self.active_hosts),
             'scan_duration': round(self.scan_duration, 2),
             'hosts_per_second': round(len(self.active_hosts) / self.scan_duration, 2) 
-            if self.scan_duration > 0 else 0
+            if self.scan_duration > 0 else 0,
+            # Rendimiento real de las sondas, con o sin respuesta
+            'probes_sent': self.probes_sent,
+            'probes_per_second': round(self.probes_sent / self.scan_duration, 2)
+            if self.scan_duration > 0 else 0,
+            'adaptive_timeout': self.rtt is not None,
+            'probe_timeouts': self.rtt.snapshot(self.timeout) if self.rtt else {},
+            'rate': self.rate_stats
         }
 
 
+# Motores de escaneo de puertos disponibles para PortScanner ('udp' escanea UDP)
+PORT_ENGINES = ('thread', 'async', 'udp')
+
+
 class PortScanner:
-    def __init__(self, timeout: int = 1, max_threads: int = 100, verbose: bool = False):  # <-- VERBOSE AÑADIDO
-        self.timeout = timeout
+    def __init__(self, timeout: int = 1, max_threads: int = 100, verbose: bool = False,  # <-- VERBOSE AÑADIDO
+                 engine: str = 'thread', max_inflight: int = 1024, per_host_limit: int = 0,
+                 rtt_estimator: Optional[RTTEstimator] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 services: Optional[ServiceDetector] = None,
+                 udp_retries: int = 2, udp_host_rate: float = DEFAULT_HOST_RATE):
+        if engine not in PORT_ENGINES:
+            raise ValueError(f"Motor de escaneo de puertos desconocido: {engine}")
+        if engine == 'udp' and services is not None:
+            raise ValueError("La detección de servicios solo está disponible para TCP")
+        self.timeout = timeout  # Techo del timeout si es adaptativo
+        self.rtt = rtt_estimator
         self.max_threads = max_threads
+        self.engine = engine
+        self.max_inflight = max_inflight
+        self.per_host_limit = per_host_limit  # 0 = automático según la concurrencia
+        # Tasa de sondas y límites en vuelo, compartible con NetworkScanner
+        self.limiter = rate_limiter
+        self.metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self._probe_metrics: Optional[ProbeMetrics] = None
+        # Detección de servicios sobre las conexiones abiertas (None = por puerto)
+        self.services = services
+        self._detections: Dict[Tuple[str, int], concurrent.futures.Future] = {}
+        # Reintentos y ritmo por host del motor UDP
+        self.udp_retries = udp_retries
+        self.udp_host_rate = udp_host_rate
+        self.udp_stats: Dict = {}
+        self.probes_sent = 0
+        self.scan_duration = 0
         self.logger = get_logger(verbose)  # <-- PASA VERBOSE
         
     @staticmethod
-    def parse_port_range(port_spec: str) -> Set[int]:
-        """Convierte una especificación de puertos a un conjunto."""
-        ports = set()
-        
-        for part in port_spec.split(','):
-            part = part.strip()
-            if '-' in part:
-                # Rango de puertos
-                start_str, end_str = part.split('-')
-                try:
-                    start = int(start_str.strip())
-                    end = int(end_str.strip())
-                    if 1 <= start <= 65535 and 1 <= end <= 65535:
-                        ports.update(range(min(start, end), max(start, end) + 1))
-                except ValueError:
-                    continue
-            else:
-                # Puerto individual
-                try:
-                    port = int(part)
-                    if 1 <= port <= 65535:
-                        ports.add(port)
-                except ValueError:
-                    continue
-        
-        return ports if ports else {22, 80, 443}  # Default si está vacío
+    def parse_port_range(port_spec: str) -> PortSet:
+        """Convierte una especificación de puertos en un PortSet ('-' = 1-65535)."""
+        return PortSet.parse(port_spec)
+    
+    @property
+    def protocol(self) -> str:
+        """Protocolo de los puertos que escanea el motor elegido."""
+        return 'UDP' if self.engine == 'udp' else 'TCP'
     
     def scan_port(self, ip: str, port: int) -> Optional[int]:
         """Escanea un puerto TCP específico."""
+        if self.limiter is None:
+            return self._connect_port(ip, port)
+        with self.limiter.slot(ip):
+            return self._connect_port(ip, port)
+    
+    def _connect_port(self, ip: str, port: int) -> Optional[int]:
+        metrics = self._probe_metrics
+        if metrics is not None:
+            metrics.sent.inc()
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
+            sock = socket.socket(ip_family(ip), socket.SOCK_STREAM)
+            sock.settimeout(effective_timeout(self.rtt, ip, self.timeout))
+            start_time = time.perf_counter()
             result = sock.connect_ex((ip, port))
-            sock.close()
+            if result in (0, errno.ECONNREFUSED):
+                latency = (time.perf_counter() - start_time) * 1000
+                if self.rtt:
+                    self.rtt.observe(ip, latency)
+                if metrics is not None:
+                    metrics.reply(latency)
+            elif metrics is not None:
+                if result in _TIMEOUT_ERRNOS:
+                    metrics.timeouts.inc()
+                else:
+                    metrics.error(result)
+            if result == 0 and self.services is not None:
+                # La conexión abierta pasa a la etapa de detección
+                self._hand_over(ip, port, sock)
+            else:
+                sock.close()
             return port if result == 0 else None
-        except (socket.timeout, socket.error, OSError):
+        except socket.timeout:
+            if metrics is not None:
+                metrics.timeouts.inc()
             return None
+        except (socket.error, OSError) as e:
+            if metrics is not None:
+                metrics.error(e.errno)
+            return None
+    
+    def _hand_over(self, ip: str, port: int, sock: socket.socket):
+        """Entrega un socket conectado al detector de servicios."""
+        self._detections[(ip, port)] = self.services.submit(ip, port, sock)
     
-    def scan_ports(self, ip: str, ports: Set[int]) -> List[Dict]:
-        """Escanea múltiples puertos en un host y retorna información detallada."""
+    def _port_entry(self, port: int, service: Optional[str] = None) -> PortResult:
+        """Resultado (compartido) de un puerto abierto; sin servicio detectado, por número."""
+        if self.engine == 'udp':
+            return PortResult.shared(port, service or UDP_SERVICE_PORTS.get(port, 'Unknown'), 'UDP')
+        return PortResult.shared(port, service or SERVICE_PORTS.get(port, 'Unknown'))
+    
+    @staticmethod
+    def _detected(future: Optional[concurrent.futures.Future]) -> Optional[str]:
+        if future is None or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+    
+    def _port_entries(self, ip: str, port_numbers: Iterable[int]) -> List[PortResult]:
+        """Resultados de los puertos abiertos de `ip`, esperando a su detección."""
+        return [
+            self._port_entry(port, self._detected(self._detections.pop((ip, port), None)))
+            for port in port_numbers
+        ]
+    
+    def _when_detected(self, ip: str, port_numbers: List[int],
+                       callback: Callable[[List[PortResult]], None]) -> concurrent.futures.Future:
+        """
+        Invoca `callback(puertos)` cuando terminan las detecciones de `ip`, sin bloquear.
+
+        Retorna un Future que se completa tras ejecutar `callback`.
+        """
+        waiting = [
+            self._detections[(ip, port)] for port in port_numbers
+            if (ip, port) in self._detections
+        ]
+        stage_done = concurrent.futures.Future()
+        remaining = [len(waiting) or 1]
+        lock = threading.Lock()
+        
+        def finish(_=None):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            try:
+                callback(self._port_entries(ip, port_numbers))
+            finally:
+                stage_done.set_result(None)
+        
+        if not waiting:
+            finish()
+        for future in waiting:
+            future.add_done_callback(finish)
+        return stage_done
+    
+    def scan_ports(self, ip: str, ports: Iterable[int]) -> List[PortResult]:
+        """
+        Escanea múltiples puertos en un host y retorna información detallada.
+
+        Los puertos se sondean del más al menos probable de estar abierto.
+        """
+        if self.limiter:
+            self.limiter.reset_stats()
+        start_time = time.time()
+        self.probes_sent = len(ports)
+        with self.metrics.phase('ports'):
+            if self.engine == 'udp':
+                open_ports = self._scan_ports_udp(ip, ports)
+            elif self.engine == 'async':
+                open_ports = self._scan_ports_async(ip, ports)
+            else:
+                open_ports = self._scan_ports_threaded(ip, ports)
+        self.scan_duration = time.time() - start_time
+        return open_ports
+    
+    def _scan_ports_threaded(self, ip: str, ports: Iterable[int]) -> List[PortResult]:
+        """Escanea los puertos de un host con un pool de hilos."""
+        self._probe_metrics = self.metrics.probes('ports', 'thread')
         open_ports = []
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            future_to_port = {
-                executor.submit(self.scan_port, ip, port): port 
-                for port in ports
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_port):
-                port = future_to_port[future]
-                if future.result():
-                    service = SERVICE_PORTS.get(port, 'Unknown')
-                    open_ports.append({
-                        'port': port,
-                        'service': service,
-                        'protocol': 'TCP'
-                    })
+            # Ventana acotada: los puertos salen en orden de probabilidad sin
+            # crear un future por cada puerto del rango
+            probes = bounded_map(
+                executor, lambda port: self.scan_port(ip, port), by_likelihood(ports),
+                self.max_threads * NetworkScanner.WINDOW_FACTOR
+            )
+            for port, result in probes:
+                if result:
+                    open_ports.append(port)
         
         # Ordenar por número de puerto
-        return sorted(open_ports, key=lambda x: x['port'])
+        return self._port_entries(ip, sorted(open_ports))
     
-    def scan_hosts_ports(self, hosts: List[Dict], ports: Set[int]) -> Dict[str, List[Dict]]:
-        """Escanea puertos en múltiples hosts."""
-        results = {}
+    def _connect_engine(self):
+        """Crea el motor TCP no bloqueante con la configuración del escáner."""
+        from .tcp import TCPConnectEngine, fd_budget
         
-        self.logger.info(f"Escaneando puertos en {len(hosts)} hosts activos...")
-        self.logger.debug(f"Puertos a escanear: {sorted(ports)}")
+        metrics = self.metrics.probes('ports', 'async')
+        max_inflight = self.max_inflight
+        on_connected = None
+        if self.services is not None:
+            # Las conexiones en detección también ocupan descriptores
+            max_inflight = max(1, min(max_inflight, fd_budget() - self.services.max_concurrent))
+            on_connected = self._hand_over
+        if self.rtt is None:
+            return TCPConnectEngine(
+                timeout=self.timeout, max_inflight=max_inflight, limiter=self.limiter,
+                metrics=metrics, on_connected=on_connected
+            )
+        return TCPConnectEngine(
+            timeout=self.timeout,
+            max_inflight=max_inflight,
+            timeout_for=lambda ip: self.rtt.timeout_for(ip, self.timeout),
+            on_rtt=self.rtt.observe,
+            limiter=self.limiter,
+            metrics=metrics,
+            on_connected=on_connected
+        )
+    
+    def _scan_ports_async(self, ip: str, ports: Iterable[int]) -> List[PortResult]:
+        """Escanea los puertos de un host con el motor TCP no bloqueante."""
+        engine = self._connect_engine()
+        found = engine.scan((ip, port) for port in by_likelihood(ports))
+        self.logger.debug(
+            "%s: %d intentos, %d abiertos, %d cerrados, %d timeouts, %d errores",
+            ip, engine.attempts, engine.open, engine.refused, engine.timeouts, engine.errors
+        )
+        return self._port_entries(ip, [port for _, port in sorted(found)])
+    
+    def _udp_engine(self):
+        """Crea el motor UDP no bloqueante con la configuración del escáner."""
+        options = dict(
+            timeout=self.timeout,
+            retries=self.udp_retries,
+            host_rate=self.udp_host_rate,
+            max_inflight=self.max_inflight,
+            limiter=self.limiter,
+            metrics=self.metrics.probes('ports', 'udp')
+        )
+        if self.rtt is not None:
+            options.update(
+                timeout_for=lambda ip: self.rtt.timeout_for(ip, self.timeout),
+                on_rtt=self.rtt.observe
+            )
+        return UDPScanEngine(**options)
+    
+    def _log_udp(self, engine, label: str):
+        self.udp_stats = engine.stats()
+        self.logger.debug(
+            "%s: %d sondas UDP (%d reintentos), %d abiertos, %d cerrados, %d filtrados, "
+            "%d open|filtered, %d errores, ritmo reducido %d veces",
+            label, engine.attempts, engine.retransmits, engine.open, engine.closed,
+            engine.filtered, engine.open_filtered, engine.errors, engine.backoffs
+        )
+        if not engine.icmp_errors:
+            self.logger.warning(
+                "Sin acceso a los errores ICMP del socket: los puertos UDP cerrados "
+                "no se distinguen de los open|filtered"
+            )
+    
+    def _scan_ports_udp(self, ip: str, ports: Iterable[int]) -> List[PortResult]:
+        """Escanea los puertos UDP de un host con el motor no bloqueante."""
+        engine = self._udp_engine()
+        states = engine.scan((ip, port) for port in by_likelihood(ports))
+        self._log_udp(engine, ip)
+        return self._port_entries(
+            ip, sorted(port for (_, port), state in states.items() if state == OPEN)
+        )
+    
+    def scan_hosts_ports(self, hosts: List[Dict], ports: Iterable[int],
+                         on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None
+                         ) -> Dict[str, List[PortResult]]:
+        """
+        Escanea puertos en múltiples hosts con una única cola de trabajo global.
+
+        Todos los pares (host, puerto) se intercalan entre hosts con un límite
+        de sondas simultáneas por host; cada host recorre los puertos del más
+        al menos probable. `on_host_done(ip, puertos)` se invoca en cuanto
+        cada host termina.
+        """
+        self.logger.info("Escaneando puertos en %d hosts activos...", len(hosts))
+        self.logger.debug("Puertos a escanear: %r", ports)
         
-        for i, host in enumerate(hosts, 1):
-            ip = host['ip']
-            self.logger.debug(f"Host {i}/{len(hosts)}: {ip}")
-            
-            open_ports = self.scan_ports(ip, ports)
-            if open_ports:
-                port_list = [p['port'] for p in open_ports]
-                self.logger.info(f"{ip}: Puertos abiertos: {port_list}")
-                results[ip] = open_ports
-            else:
-                self.logger.debug(f"{ip}: Sin puertos abiertos")
-                results[ip] = []
+        results = {host['ip']: [] for host in hosts}
+        if not ports:
+            return results
+        
+        self._run_scheduler({ip: None for ip in results}, by_likelihood(ports), results, on_host_done)
         
         total_ports = sum(len(ports) for ports in results.values())
-        self.logger.info(f"Escaneo de puertos completado: {total_ports} puertos abiertos")
+        self.logger.info("Escaneo de puertos completado: %d puertos abiertos", total_ports)
         
         return results
+    
+    def scan_host_port_map(self, host_ports: Dict[str, Iterable[int]],
+                           on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None
+                           ) -> Dict[str, List[PortResult]]:
+        """Como scan_hosts_ports, pero con una lista de puertos distinta por host."""
+        results = {ip: [] for ip in host_ports}
+        # Los hosts que comparten el mismo objeto de puertos comparten también la lista
+        ordered: Dict[int, List[int]] = {}
+        for ports in host_ports.values():
+            if id(ports) not in ordered:
+                ordered[id(ports)] = by_likelihood(ports)
+        self._run_scheduler(
+            {ip: ordered[id(ports)] for ip, ports in host_ports.items()}, [], results, on_host_done
+        )
+        return results
+    
+    def open_stream(self, ports: Iterable[int],
+                    on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None,
+                    max_hosts: int = 0) -> 'PortScanStream':
+        """
+        Empieza un escaneo de puertos que recibe los hosts a medida que llegan.
+
+        Ver PortScanStream; `max_hosts` acota los hosts pendientes de terminar.
+        """
+        self.logger.info("Escaneando puertos a medida que se descubren los hosts...")
+        self.logger.debug("Puertos a escanear: %r", ports)
+        self.probes_sent = 0
+        return PortScanStream(self, ports, on_host_done, max_hosts)
+    
+    def _new_scheduler(self, ports: List[int], max_hosts: int = 0, hosts: int = 0):
+        """
+        Planificador global con el límite por host según la concurrencia.
+
+        El límite automático reparte la concurrencia entre los `hosts` que
+        se van a escanear (como mucho 8); sin saber cuántos llegarán, se
+        asume 8.
+        """
+        from .scheduler import HostPortScheduler
+        
+        workers = self.max_threads if self.engine == 'thread' else self.max_inflight
+        per_host_limit = self.per_host_limit or max(4, workers // min(8, hosts or 8))
+        if self.limiter:
+            self.limiter.reset_stats()
+            if self.limiter.per_host:
+                # Sin sentido repartir más sondas por host de las que deja salir
+                per_host_limit = min(per_host_limit, self.limiter.per_host)
+        return HostPortScheduler(ports, per_host_limit, max_hosts)
+    
+    def _run_scheduler(self, host_ports: Dict[str, Optional[List[int]]], ports: List[int],
+                       results: Dict[str, List[PortResult]],
+                       on_host_done: Optional[Callable[[str, List[PortResult]], None]]):
+        """Ejecuta el planificador global y rellena `results` por host."""
+        scheduler = self._new_scheduler(ports, hosts=len(host_ports))
+        for ip, ip_ports in host_ports.items():
+            scheduler.add_host(ip, ip_ports)
+        scheduler.close()
+        self.probes_sent = sum(
+            len(ports) if ip_ports is None else len(ip_ports) for ip_ports in host_ports.values()
+        )
+        self._drive_scheduler(scheduler, results, on_host_done)
+    
+    def _drive_scheduler(self, scheduler, results: Dict[str, List[PortResult]],
+                         on_host_done: Optional[Callable[[str, List[PortResult]], None]]):
+        """Sondea los pares del planificador hasta que se cierra y se vacía."""
+        from .scheduler import run_async, run_threaded
+        
+        completed = 0
+        detecting: List[concurrent.futures.Future] = []
+        
+        def report(ip: str, open_ports: List[PortResult]):
+            nonlocal completed
+            completed += 1
+            results[ip] = open_ports
+            self.logger.debug("Host %d/%d: %s", completed, len(results), ip)
+            if open_ports:
+                self.logger.info("%s: Puertos abiertos: %s", ip, [port.port for port in open_ports])
+            else:
+                self.logger.debug("%s: Sin puertos abiertos", ip)
+            if on_host_done:
+                on_host_done(ip, open_ports)
+        
+        def host_done(ip: str, open_port_numbers: List[int]):
+            if self.services is None:
+                report(ip, [self._port_entry(port) for port in open_port_numbers])
+            else:
+                # El host se publica cuando terminan sus detecciones de servicio
+                detecting.append(self._when_detected(
+                    ip, open_port_numbers, lambda open_ports: report(ip, open_ports)
+                ))
+        
+        start_time = time.time()
+        with self.metrics.phase('ports'):
+            if self.engine == 'udp':
+                engine = self._udp_engine()
+                loop = asyncio.new_event_loop()
+                try:
+                    loop.run_until_complete(
+                        run_async(scheduler, engine.connect, engine.max_inflight, host_done)
+                    )
+                finally:
+                    engine.close()
+                    loop.close()
+                self._log_udp(engine, "Escaneo UDP")
+            elif self.engine == 'async':
+                engine = self._connect_engine()
+                loop = asyncio.new_event_loop()
+                try:
+                    loop.run_until_complete(
+                        run_async(scheduler, engine.connect, engine.max_inflight, host_done)
+                    )
+                finally:
+                    loop.close()
+            else:
+                self._probe_metrics = self.metrics.probes('ports', 'thread')
+                run_threaded(scheduler, self.scan_port, self.max_threads, host_done)
+            concurrent.futures.wait(detecting)
+        self.scan_duration = time.time() - start_time
+    
+    def get_scan_stats(self) -> Dict:
+        """Retorna las sondas y los timeouts usados en el último escaneo."""
+        return {
+            'probes_sent': self.probes_sent,
+            'scan_duration': round(self.scan_duration, 2),
+            'probes_per_second': round(self.probes_sent / self.scan_duration, 2)
+            if self.scan_duration > 0 else 0,
+            'adaptive_timeout': self.rtt is not None,
+            'connect_timeouts': self.rtt.snapshot(self.timeout) if self.rtt else {},
+            'rate': self.limiter.stats() if self.limiter else {},
+            'udp': self.udp_stats
+        }
+
+
+class PortScanStream:
+    """
+    Escaneo de puertos alimentado mientras el descubrimiento avanza.
+
+    El planificador de PortScanner corre en su propio hilo desde el primer
+    host. `add` encola un host y bloquea mientras haya `max_hosts` sin
+    terminar (0 = sin límite): así el descubrimiento espera al escaneo de
+    puertos en lugar de acumular hosts. `on_host_done(ip, puertos)` se
+    invoca por cada host terminado y `close` espera al resto y retorna los
+    resultados por host.
+    """
+
+    def __init__(self, scanner: PortScanner, ports: Iterable[int],
+                 on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None,
+                 max_hosts: int = 0):
+        self.scanner = scanner
+        self.results: Dict[str, List[PortResult]] = {}
+        ports = by_likelihood(ports)
+        self._ports_per_host = len(ports)
+        self._scheduler = scanner._new_scheduler(ports, max_hosts)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(
+            target=self._run, args=(on_host_done,), name='ndiscover-ports', daemon=True
+        )
+        self._thread.start()
+    
+    def _run(self, on_host_done: Optional[Callable[[str, List[PortResult]], None]]):
+        try:
+            self.scanner._drive_scheduler(self._scheduler, self.results, on_host_done)
+        except BaseException as e:
+            self._error = e
+            # Sin esto, add bloquearía para siempre esperando hueco
+            self._scheduler.abort(e)
+    
+    def add(self, host: Dict):
+        """Encola un host (HostResult o diccionario con 'ip'); relanza el fallo del escaneo."""
+        ip = host['ip']
+        if self._scheduler.add_host(ip):
+            self.results.setdefault(ip, [])
+            self.scanner.probes_sent += self._ports_per_host
+    
+    def close(self) -> Dict[str, List[PortResult]]:
+        """Espera a que terminen los hosts encolados y retorna sus puertos."""
+        self._scheduler.close()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        total_ports = sum(len(ports) for ports in self.results.values())
+        self.scanner.logger.info("Escaneo de puertos completado: %d puertos abiertos", total_ports)
+        return self.results
@@ -0,0 +1,250 @@
+# network_discovery_tool/scheduler.py
+import asyncio
+import concurrent.futures
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+# Callback invocado cuando un host termina: (ip, puertos_abiertos_ordenados)
+HostDoneCallback = Callable[[str, List[int]], None]
+
+
+class _HostState:
+    """Estado de escaneo de un host dentro del planificador."""
+    __slots__ = ('ip', 'ports', 'next_index', 'inflight', 'open_ports')
+
+    def __init__(self, ip: str, ports: List[int]):
+        self.ip = ip
+        self.ports = ports
+        self.next_index = 0
+        self.inflight = 0
+        self.open_ports: List[int] = []
+
+
+class HostPortScheduler:
+    """
+    Cola de trabajo global de pares (host, puerto).
+
+    Reparte los puertos de todos los hosts en round-robin, de modo que un
+    host lento o filtrado nunca bloquea al resto, y limita las sondas en
+    vuelo por host a `per_host_limit`. El límite es estricto: si todos los
+    hosts con puertos pendientes están en su límite, `next_task` retorna
+    None y el ejecutor espera a que termine alguna sonda.
+
+    Los hosts pueden añadirse mientras el escaneo avanza. Con `max_hosts`,
+    `add_host` bloquea mientras haya ese número de hosts sin terminar, de
+    modo que quien los produce no se adelanta al escaneo de puertos. Si el
+    ejecutor falla, `abort` despierta a los productores y `add_host`
+    relanza su error.
+    """
+
+    def __init__(self, ports: Iterable[int], per_host_limit: int = 8, max_hosts: int = 0):
+        self.ports = list(ports)
+        self.per_host_limit = max(1, per_host_limit)
+        self.max_hosts = max_hosts  # 0 = sin límite
+        self._hosts: Dict[str, _HostState] = {}
+        self._rotation: Deque[_HostState] = deque()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        # Avisos (sin el lock) de trabajo nuevo para ejecutores que no esperan en _work
+        self._listeners: List[Callable[[], None]] = []
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Registra `callback()` para cada host añadido y para el cierre."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        self._listeners.remove(callback)
+
+    def _notify_listeners(self):
+        for callback in list(self._listeners):
+            callback()
+
+    def add_host(self, ip: str, ports: Optional[Iterable[int]] = None) -> bool:
+        """
+        Añade un host a la cola; `ports` sustituye a los puertos comunes.
+
+        Retorna False si el host ya estaba en la cola o no tiene puertos.
+        """
+        ports = self.ports if ports is None else list(ports)
+        with self._lock:
+            if ip in self._hosts or not ports:
+                return False
+            if self.max_hosts:
+                self._space.wait_for(
+                    lambda: self._error is not None or len(self._hosts) < self.max_hosts
+                )
+            if self._error is not None:
+                raise self._error
+            state = _HostState(ip, ports)
+            self._hosts[ip] = state
+            self._rotation.append(state)
+            self._work.notify_all()
+        self._notify_listeners()
+        return True
+
+    def abort(self, error: BaseException):
+        """Registra el fallo del ejecutor y despierta a quien espera en la cola."""
+        with self._lock:
+            self._error = error
+            self._space.notify_all()
+            self._work.notify_all()
+        self._notify_listeners()
+
+    def close(self):
+        """Indica que no se añadirán más hosts."""
+        with self._lock:
+            self._closed = True
+            self._work.notify_all()
+        self._notify_listeners()
+
+    def _assignable(self) -> bool:
+        """True si algún host con puertos pendientes está por debajo de su límite."""
+        return any(state.inflight < self.per_host_limit for state in self._rotation)
+
+    def wait_for_work(self, timeout: Optional[float] = None):
+        """Bloquea hasta que haya sondas por asignar o se agote la cola."""
+        with self._lock:
+            self._work.wait_for(
+                lambda: (self._closed and not self._rotation) or self._assignable(), timeout
+            )
+
+    @property
+    def exhausted(self) -> bool:
+        """True si no quedan sondas por asignar ni hosts por llegar."""
+        with self._lock:
+            return self._closed and not self._rotation
+
+    @property
+    def finished(self) -> bool:
+        """True si todas las sondas asignadas han terminado."""
+        with self._lock:
+            return self._closed and not self._hosts
+
+    def next_task(self) -> Optional[Tuple[str, int]]:
+        """Retorna el siguiente par (ip, puerto) a sondear, o None si no hay."""
+        with self._lock:
+            rotation = self._rotation
+            if not rotation:
+                return None
+            # Siguiente host por debajo de su límite
+            chosen = None
+            for _ in range(len(rotation)):
+                state = rotation[0]
+                rotation.rotate(-1)
+                if state.inflight < self.per_host_limit:
+                    chosen = state
+                    break
+            if chosen is None:
+                # Todos en su límite: esperar a que termine alguna sonda
+                return None
+
+            port = chosen.ports[chosen.next_index]
+            chosen.next_index += 1
+            chosen.inflight += 1
+            if chosen.next_index >= len(chosen.ports):
+                rotation.remove(chosen)
+                if self._closed and not rotation:
+                    self._work.notify_all()
+            return chosen.ip, port
+
+    def complete(self, ip: str, port: int, is_open: bool) -> Optional[Tuple[str, List[int]]]:
+        """
+        Registra el resultado de una sonda.
+
+        Retorna (ip, puertos_abiertos) si era la última sonda del host.
+        """
+        with self._lock:
+            state = self._hosts[ip]
+            state.inflight -= 1
+            if state.inflight == self.per_host_limit - 1 and state.next_index < len(state.ports):
+                # El host vuelve a tener un hueco libre
+                self._work.notify_all()
+            if is_open:
+                state.open_ports.append(port)
+            if state.inflight == 0 and state.next_index >= len(state.ports):
+                del self._hosts[ip]
+                self._space.notify()
+                return ip, sorted(state.open_ports)
+        return None
+
+
+def run_threaded(scheduler: HostPortScheduler,
+                 probe: Callable[[str, int], Optional[int]],
+                 max_workers: int,
+                 on_host_done: HostDoneCallback):
+    """Ejecuta el planificador sobre un único ThreadPoolExecutor compartido."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        inflight: Dict[concurrent.futures.Future, Tuple[str, int]] = {}
+        while True:
+            while len(inflight) < max_workers:
+                task = scheduler.next_task()
+                if task is None:
+                    break
+                inflight[executor.submit(probe, *task)] = task
+
+            if not inflight:
+                if scheduler.exhausted:
+                    break
+                scheduler.wait_for_work()
+                continue
+
+            done, _ = concurrent.futures.wait(
+                inflight, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                ip, port = inflight.pop(future)
+                finished = scheduler.complete(ip, port, bool(future.result()))
+                if finished:
+                    on_host_done(*finished)
+
+
+async def run_async(scheduler: HostPortScheduler,
+                    connect: Callable[[str, int], 'asyncio.Future'],
+                    max_inflight: int,
+                    on_host_done: HostDoneCallback):
+    """Ejecuta el planificador con `max_inflight` corrutinas en un event loop."""
+    loop = asyncio.get_event_loop()
+    wakeup = asyncio.Condition()
+    waiting = 0
+
+    async def notify():
+        async with wakeup:
+            wakeup.notify_all()
+
+    def on_work():
+        # Hosts añadidos desde otro hilo: despertar a las corrutinas en espera
+        asyncio.run_coroutine_threadsafe(notify(), loop)
+
+    async def worker():
+        nonlocal waiting
+        while True:
+            task = scheduler.next_task()
+            if task is None:
+                if scheduler.exhausted:
+                    return
+                waiting += 1
+                try:
+                    async with wakeup:
+                        await wakeup.wait()
+                finally:
+                    waiting -= 1
+                continue
+
+            ip, port = task
+            is_open = await connect(ip, port)
+            finished = scheduler.complete(ip, port, is_open)
+            if finished:
+                on_host_done(*finished)
+            if waiting:
+                async with wakeup:
+                    wakeup.notify_all()
+
+    scheduler.add_listener(on_work)
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, max_inflight))))
+    finally:
+        scheduler.remove_listener(on_work)
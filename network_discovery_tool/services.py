@@ -0,0 +1,240 @@
+# network_discovery_tool/services.py
+import asyncio
+import concurrent.futures
+import re
+import socket
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .metrics import MetricsRegistry
+from .tcp import close_with_rst
+
+# Firmas de servicio: (nombre, patrón del banner, patrón de versión o None).
+# Los patrones se anclan al inicio del banner y exigen el final de la línea
+# (o de las cabeceras), así una coincidencia indica que no hace falta leer
+# más. El orden importa: ante dos firmas que coinciden gana la primera.
+SIGNATURES: Sequence[Tuple[str, bytes, Optional[bytes]]] = (
+    ('SSH', rb'SSH-\d+\.\d+-[^\r\n]*\r?\n', rb'SSH-[\d.]+-([^\s]+)'),
+    ('HTTP', rb'HTTP/\d\.\d \d{3}[^\r\n]*\r\n.*?\r\n\r\n', rb'\r\nServer: *([^\r\n]+)'),
+    ('FTP', rb'220[ -][^\r\n]*FTP[^\r\n]*\r?\n',
+     rb'((?:vsFTPd|ProFTPD|Pure-FTPd|FileZilla Server)[ \w.]*?)\)?\s*\r?\n'),
+    ('SMTP', rb'220[ -][^\r\n]*(?:SMTP|Postfix|Exim|Sendmail|mail)[^\r\n]*\r?\n',
+     rb'(Postfix|Exim [\d.]+|Sendmail [\d./]+|Microsoft ESMTP MAIL Service)'),
+    ('POP3', rb'\+OK[^\r\n]*\r?\n', rb'(Dovecot|Cyrus[ \w.]*?|Courier)'),
+    ('IMAP', rb'\* OK[^\r\n]*\r?\n', rb'(Dovecot|Cyrus IMAP[ v\d.]*|Courier-IMAP)'),
+    ('MySQL', rb'[\x00-\xff]{3}\x00\x0a[\d.]+[^\x00]*\x00', rb'\x0a([\d.]+[^\x00]*)\x00'),
+    ('VNC', rb'RFB \d{3}\.\d{3}\n', rb'RFB (\d{3}\.\d{3})'),
+    ('Redis', rb'-(?:ERR|NOAUTH|DENIED)[^\r\n]*\r\n', None),
+    ('SSL/TLS', rb'\x15\x03[\x00-\x04]\x00\x02', None),
+    ('Telnet', rb'\xff[\xfb-\xfe]', None),
+)
+
+# Sonda para servicios que esperan a que hable el cliente
+HTTP_PROBE = b'GET / HTTP/1.0\r\n\r\n'
+
+# Puertos donde el cliente habla primero: la sonda sale sin esperar banner
+CLIENT_FIRST_PORTS = frozenset((80, 443, 3000, 5000, 6379, 8000, 8008, 8080, 8443, 8888))
+
+
+class SignatureIndex:
+    """
+    Índice de firmas compilado una sola vez.
+
+    Todas las firmas se combinan en una única expresión regular con un grupo
+    con nombre por firma, de modo que identificar un banner cuesta una sola
+    pasada del motor de regex en lugar de probar las firmas una a una; el
+    patrón de versión solo se evalúa para la firma que coincidió.
+    """
+
+    def __init__(self, signatures: Sequence[Tuple[str, bytes, Optional[bytes]]] = SIGNATURES):
+        self.names: List[str] = []
+        self._versions: Dict[str, Optional['re.Pattern']] = {}
+        alternatives = []
+        for index, (name, pattern, version) in enumerate(signatures):
+            group = f"s{index}"
+            self.names.append(name)
+            self._versions[group] = re.compile(version, re.DOTALL) if version else None
+            alternatives.append(b'(?P<' + group.encode() + b'>' + pattern + b')')
+        self._pattern = re.compile(b'|'.join(alternatives), re.DOTALL | re.IGNORECASE)
+
+    def match(self, banner: bytes) -> Optional[str]:
+        """Nombre del servicio (con versión si se conoce) o None si no hay firma."""
+        found = self._pattern.match(banner)
+        if found is None:
+            return None
+        group = found.lastgroup
+        name = self.names[int(group[1:])]
+        version_pattern = self._versions[group]
+        if version_pattern is not None:
+            version = version_pattern.search(banner)
+            if version:
+                text = version.group(1).decode('latin-1').strip()
+                if text:
+                    return f"{name} {text[:60]}"
+        return name
+
+
+_DEFAULT_INDEX: Optional[SignatureIndex] = None
+
+
+def default_index() -> SignatureIndex:
+    """Índice de SIGNATURES, compilado la primera vez que se pide."""
+    global _DEFAULT_INDEX
+    if _DEFAULT_INDEX is None:
+        _DEFAULT_INDEX = SignatureIndex()
+    return _DEFAULT_INDEX
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ServiceDetector:
+    """
+    Etapa de detección de servicios sobre conexiones ya abiertas.
+
+    PortScanner le entrega el socket conectado de cada puerto abierto, sin
+    volver a conectar. La lectura del banner usa un event loop propio en un
+    hilo: primero espera a que el servidor hable (`banner_wait`) y, si calla
+    o el puerto es de los que esperan al cliente, envía una sonda HTTP. Cada
+    conexión lee como mucho `max_bytes` durante `timeout` segundos y se
+    detiene en cuanto una firma coincide. `max_concurrent` limita las
+    conexiones en detección: `submit` bloquea (contrapresión) si está lleno.
+    """
+
+    def __init__(self, max_concurrent: int = 256, timeout: float = 2.0,
+                 banner_wait: float = 0.5, max_bytes: int = 2048,
+                 index: Optional[SignatureIndex] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout = timeout
+        self.banner_wait = min(banner_wait, timeout)
+        self.max_bytes = max_bytes
+        self.index = index or default_index()
+        metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self._results = metrics.counter(
+            'service_detections_total', 'Detecciones de servicio por resultado', ('result',)
+        )
+        self.grabbed = 0
+        self.matched = 0
+        self.silent = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def config(self) -> Dict:
+        """Parámetros para crear un detector equivalente en otro proceso."""
+        return {
+            'max_concurrent': self.max_concurrent,
+            'timeout': self.timeout,
+            'banner_wait': self.banner_wait,
+            'max_bytes': self.max_bytes
+        }
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='ndiscover-banner', daemon=True
+                )
+                self._thread.start()
+
+    async def _read(self, sock: socket.socket, buffer: bytearray, until: float) -> bool:
+        """Lee hasta una firma, EOF, `max_bytes` o `until`; True si hubo firma."""
+        loop = self._loop
+        while len(buffer) < self.max_bytes:
+            remaining = until - loop.time()
+            if remaining <= 0:
+                return False
+            waiter = loop.create_future()
+            loop.add_reader(sock.fileno(), _wake, waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                loop.remove_reader(sock.fileno())
+            try:
+                chunk = sock.recv(self.max_bytes - len(buffer))
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                return False
+            if not chunk:
+                return False
+            buffer += chunk
+            if self.index.match(bytes(buffer)):
+                return True
+        return False
+
+    async def _grab(self, port: int, sock: socket.socket) -> bytes:
+        loop = self._loop
+        buffer = bytearray()
+        deadline = loop.time() + self.timeout
+        try:
+            sock.setblocking(False)
+            if port not in CLIENT_FIRST_PORTS:
+                if await self._read(sock, buffer, loop.time() + self.banner_wait):
+                    return bytes(buffer)
+                if buffer:
+                    # Banner sin firma conocida: esperar al resto hasta el límite
+                    await self._read(sock, buffer, deadline)
+                    return bytes(buffer)
+            try:
+                sock.send(HTTP_PROBE)
+            except OSError:
+                return bytes(buffer)
+            await self._read(sock, buffer, deadline)
+            return bytes(buffer)
+        finally:
+            close_with_rst(sock)
+
+    def _detect(self, port: int, banner: bytes) -> Optional[str]:
+        service = self.index.match(banner) if banner else None
+        with self._lock:
+            self.grabbed += 1
+            if service:
+                self.matched += 1
+            elif not banner:
+                self.silent += 1
+        self._results.labels('matched' if service else 'unmatched' if banner else 'silent').inc()
+        return service
+
+    async def _run(self, port: int, sock: socket.socket) -> Optional[str]:
+        try:
+            banner = await self._grab(port, sock)
+        finally:
+            self._slots.release()
+        return self._detect(port, banner)
+
+    def submit(self, ip: str, port: int, sock: socket.socket) -> concurrent.futures.Future:
+        """
+        Toma posesión del socket conectado a `ip:port` y detecta el servicio.
+
+        Retorna un Future con el nombre del servicio, o None si ninguna firma
+        coincide; el socket se cierra al terminar.
+        """
+        self._start()
+        self._slots.acquire()
+        try:
+            return asyncio.run_coroutine_threadsafe(self._run(port, sock), self._loop)
+        except Exception:
+            self._slots.release()
+            close_with_rst(sock)
+            raise
+
+    def stats(self) -> Dict:
+        return {'grabbed': self.grabbed, 'matched': self.matched, 'silent': self.silent}
+
+    def close(self):
+        """Detiene el event loop de detección (las detecciones deben haber terminado)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
@@ -0,0 +1,473 @@
+# network_discovery_tool/sharding.py
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import PHASE_METRICS, MetricsRegistry
+from .models import HostResult, PortResult
+from .ports import by_likelihood
+from .ratelimit import RateLimiter
+from .resolver import NO_HOSTNAME
+from .scanner import NetworkScanner, PortScanner
+from .services import ServiceDetector
+from .targets import Interval, TargetSet
+from .timing import RTTEstimator, subnet_of
+
+# Resultados por mensaje enviado desde cada proceso
+BATCH_SIZE = 256
+
+# Subred mínima que se mantiene en un único fragmento (localidad del RTT)
+SHARD_ALIGN = 256
+
+
+class ShardError(RuntimeError):
+    """
+    Uno o más fragmentos fallaron: el escaneo no cubrió todo el rango.
+
+    `failed` asocia el índice de cada fragmento fallido con su error.
+    """
+
+    def __init__(self, failed: Dict[int, str], shards: int):
+        self.failed = failed
+        detail = '; '.join(f"fragmento {shard}: {error}" for shard, error in sorted(failed.items()))
+        super().__init__(
+            f"Escaneo incompleto: fallaron {len(failed)} de {shards} fragmentos ({detail})"
+        )
+
+
+def default_workers() -> int:
+    """Un proceso por núcleo disponible."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split_intervals(intervals: List[Interval], shards: int) -> List[List[Interval]]:
+    """
+    Reparte intervalos ordenados y disjuntos en como mucho `shards` fragmentos.
+
+    Cada fragmento recibe aproximadamente el mismo número de direcciones.
+    Si cada uno abarca al menos un /24, los cortes se llevan a la frontera
+    de /24 más cercana para que cada subred quede en un único proceso.
+    """
+    count = sum(last - first + 1 for first, last in intervals)
+    if not count:
+        return []
+    shards = max(1, min(shards, count))
+    aligned = count // shards >= SHARD_ALIGN - 2
+
+    # Cortes como direcciones: la posición index*count/shards de la secuencia
+    first_address = intervals[0][0]
+    cuts = [first_address]
+    position = 0  # Direcciones de los intervalos anteriores a `current`
+    current = 0
+    for index in range(1, shards):
+        offset = index * count // shards
+        while offset - position > intervals[current][1] - intervals[current][0]:
+            position += intervals[current][1] - intervals[current][0] + 1
+            current += 1
+        cut = intervals[current][0] + offset - position
+        if aligned:
+            cut = (cut + SHARD_ALIGN // 2) // SHARD_ALIGN * SHARD_ALIGN
+        if cuts[-1] < cut <= intervals[-1][1]:
+            cuts.append(cut)
+    cuts.append(intervals[-1][1] + 1)
+
+    result: List[List[Interval]] = []
+    for start, end in zip(cuts, cuts[1:]):
+        shard = [
+            (max(first, start), min(last, end - 1))
+            for first, last in intervals
+            if first < end and last >= start
+        ]
+        if shard:
+            result.append(shard)
+    return result
+
+
+def split_range(first: int, last: int, shards: int) -> List[Tuple[int, int]]:
+    """Divide [first, last] en como mucho `shards` tramos contiguos alineados a /24."""
+    return [shard[0] for shard in split_intervals([(first, last)], shards)]
+
+
+def _limiter_for(config: Optional[Dict]) -> Optional[RateLimiter]:
+    return RateLimiter(**config) if config else None
+
+
+def _rtt_for(min_timeout: Optional[float], prefixlen: int,
+             state: Optional[Dict] = None) -> Optional[RTTEstimator]:
+    if min_timeout is None:
+        return None
+    estimator = RTTEstimator(min_timeout=min_timeout, prefixlen=prefixlen)
+    if state:
+        estimator.merge_state(state)
+    return estimator
+
+
+class _Batcher:
+    """Agrupa resultados de un proceso y los envía por la cola en lotes."""
+
+    def __init__(self, results: multiprocessing.Queue, kind: str, shard: int):
+        self.results = results
+        self.kind = kind
+        self.shard = shard
+        self._items = []
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) < BATCH_SIZE:
+                return
+            items, self._items = self._items, []
+        self.results.put((self.kind, self.shard, items))
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+        if items:
+            self.results.put((self.kind, self.shard, items))
+
+
+def _discovery_worker(shard: int, ranges: List[Interval], options: Dict,
+                      results: multiprocessing.Queue):
+    """Proceso de descubrimiento: barre sus intervalos con su propio motor."""
+    try:
+        rtt = _rtt_for(options.pop('min_timeout'), options.pop('prefixlen'))
+        limiter = _limiter_for(options.pop('limiter'))
+        metrics = MetricsRegistry(enabled=options.pop('metrics'))
+        scanner = NetworkScanner(resolve=False, rtt_estimator=rtt, rate_limiter=limiter,
+                                 metrics=metrics, **options)
+        batch = _Batcher(results, 'hosts', shard)
+        start = time.time()
+        targets = TargetSet(ranges)
+        hosts = scanner.scan_targets(
+            targets,
+            total=len(targets),
+            on_host=lambda host: batch.add((host.ip, host.response_time))
+        )
+        batch.flush()
+        results.put(('done', shard, {
+            'targets': len(targets),
+            'hosts': len(hosts),
+            'engine': scanner.engine,
+            'duration': time.time() - start,
+            'rtt_state': rtt.export_state() if rtt else {},
+            'rate': scanner.rate_stats,
+            'metrics': metrics.snapshot()
+        }))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        results.put(('error', shard, f"{type(e).__name__}: {e}"))
+
+
+def _port_worker(shard: int, ips: List[str], ports: List[int], options: Dict,
+                 results: multiprocessing.Queue):
+    """Proceso de escaneo de puertos para un grupo de hosts."""
+    try:
+        rtt = _rtt_for(options.pop('min_timeout'), options.pop('prefixlen'), options.pop('rtt_state'))
+        limiter = _limiter_for(options.pop('limiter'))
+        metrics = MetricsRegistry(enabled=options.pop('metrics'))
+        services_options = options.pop('services')
+        services = ServiceDetector(metrics=metrics, **services_options) if services_options else None
+        port_scanner = PortScanner(rtt_estimator=rtt, rate_limiter=limiter, metrics=metrics,
+                                   services=services, **options)
+        batch = _Batcher(results, 'ports', shard)
+        start = time.time()
+
+        def host_done(ip: str, open_ports: List[PortResult]):
+            batch.add((ip, [(p.port, p.service, p.protocol) for p in open_ports]))
+
+        found = port_scanner.scan_host_port_map({ip: ports for ip in ips}, host_done)
+        if services:
+            services.close()
+        batch.flush()
+        results.put(('done', shard, {
+            'targets': len(ips) * len(ports),
+            'hosts': len(ips),
+            'open_ports': sum(len(p) for p in found.values()),
+            'engine': port_scanner.engine,
+            'duration': time.time() - start,
+            'rtt_state': rtt.export_state() if rtt else {},
+            'rate': limiter.stats() if limiter else {},
+            'metrics': metrics.snapshot()
+        }))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        results.put(('error', shard, f"{type(e).__name__}: {e}"))
+
+
+class ShardedScanner:
+    """
+    Reparte un escaneo entre varios procesos.
+
+    Cada proceso recibe un fragmento del rango (tramos contiguos alineados a
+    /24) o un grupo de hosts, ejecuta su propio motor de sondas con la
+    configuración de `scanner` / `port_scanner` y envía los resultados en
+    lotes por una cola. El proceso principal los fusiona, resuelve los
+    nombres con el resolvedor de `scanner` y deja las estadísticas y el
+    estado RTT combinados en los escáneres originales. Si algún fragmento
+    falla se lanza ShardError: un barrido parcial nunca se da por completo.
+    """
+
+    def __init__(self, scanner: NetworkScanner, port_scanner: Optional[PortScanner] = None,
+                 workers: int = 0, verbose: bool = False):
+        self.scanner = scanner
+        self.port_scanner = port_scanner
+        self.workers = workers or default_workers()
+        self.verbose = verbose
+        self.logger = scanner.logger
+        self.shard_stats: List[Dict] = []
+
+    @staticmethod
+    def _rtt_options(estimator: Optional[RTTEstimator]) -> Dict:
+        return {
+            'min_timeout': estimator.min_timeout if estimator else None,
+            'prefixlen': estimator.prefixlen if estimator else 24
+        }
+
+    @staticmethod
+    def _limiter_options(limiter: Optional[RateLimiter], shards: int) -> Optional[Dict]:
+        """Configuración del limitador de cada proceso: la tasa global se reparte."""
+        if limiter is None:
+            return None
+        config = limiter.config()
+        config['rate'] = config['rate'] / shards
+        return config
+
+    def _merge_metrics(self, metrics: MetricsRegistry):
+        # El tiempo de fase lo mide el proceso principal, que ya incluye la
+        # CPU de los procesos hijos
+        for stats in self.shard_stats:
+            if stats.get('metrics'):
+                metrics.merge(stats['metrics'], exclude=PHASE_METRICS)
+
+    def _merge_rate_stats(self, limiter: Optional[RateLimiter]):
+        if limiter is None:
+            return
+        limiter.reset_stats()
+        for stats in self.shard_stats:
+            if stats.get('rate'):
+                limiter.merge_stats(stats['rate'])
+
+    def _check_failed(self):
+        """Lanza ShardError si algún fragmento no terminó: el resultado sería parcial."""
+        failed = {
+            shard: stats['error'] for shard, stats in enumerate(self.shard_stats)
+            if 'error' in stats
+        }
+        if failed:
+            raise ShardError(failed, len(self.shard_stats))
+
+    def _run(self, target: Callable, shard_args: List[Tuple],
+             on_batch: Callable[[str, List], None]) -> List[Dict]:
+        """Lanza un proceso por fragmento y atiende su cola hasta que todos terminan."""
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        processes = [
+            context.Process(target=target, args=(shard,) + args + (results,), daemon=True)
+            for shard, args in enumerate(shard_args)
+        ]
+        for process in processes:
+            process.start()
+
+        stats: List[Dict] = [{} for _ in processes]
+        remaining = set(range(len(processes)))
+        suspect = set()
+        try:
+            while remaining:
+                try:
+                    kind, shard, payload = results.get(timeout=0.5)
+                except queue.Empty:
+                    # Un proceso muerto sin avisar se da por perdido tras un
+                    # segundo intervalo sin mensajes
+                    dead = {shard for shard in remaining if not processes[shard].is_alive()}
+                    for shard in dead & suspect:
+                        self.logger.error(
+                            "El proceso del fragmento %d terminó sin resultados (código %s)",
+                            shard, processes[shard].exitcode
+                        )
+                        stats[shard] = {'error': f"exitcode {processes[shard].exitcode}"}
+                        remaining.discard(shard)
+                    suspect = dead
+                    continue
+
+                if kind == 'done':
+                    stats[shard] = payload
+                    remaining.discard(shard)
+                    self.logger.debug(
+                        "Fragmento %d/%d: %d hosts, %d sondas en %.2fs", shard + 1,
+                        len(processes), payload['hosts'], payload['targets'], payload['duration']
+                    )
+                elif kind == 'error':
+                    self.logger.error("Error en el fragmento %d: %s", shard, payload)
+                    stats[shard] = {'error': payload}
+                    remaining.discard(shard)
+                else:
+                    on_batch(kind, payload)
+        finally:
+            if remaining:  # Interrumpido: no esperar a los fragmentos pendientes
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+            for process in processes:
+                process.join()
+            results.close()
+        return stats
+
+    def scan_network(self, network_cidr: str,
+                     on_host: Optional[Callable[[HostResult], None]] = None) -> List[HostResult]:
+        """Como NetworkScanner.scan_network, repartido en `workers` procesos."""
+        try:
+            targets = TargetSet.from_network(network_cidr)
+        except ValueError:
+            self.logger.error("Formato de red inválido: %s", network_cidr)
+            raise
+        return self.scan_target_set(targets, on_host)
+
+    def scan_target_set(self, targets: TargetSet,
+                        on_host: Optional[Callable[[HostResult], None]] = None) -> List[HostResult]:
+        """Como NetworkScanner.scan_target_set, repartido en `workers` procesos."""
+        scanner = self.scanner
+        shards = split_intervals(targets.intervals(), self.workers)
+        self.logger.info(
+            "Escaneando %d direcciones IP en %d procesos...", len(targets), len(shards)
+        )
+        options = dict(
+            timeout=scanner.timeout,
+            max_threads=scanner.max_threads,
+            verbose=self.verbose,
+            engine=scanner.engine,
+            max_inflight=scanner.max_inflight,
+            probes=scanner.probes,
+            limiter=self._limiter_options(scanner.limiter, len(shards)),
+            metrics=scanner.metrics.enabled,
+            **self._rtt_options(scanner.rtt)
+        )
+
+        start_time = time.time()
+        hosts_data: List[HostResult] = []
+        pending: List[concurrent.futures.Future] = []
+
+        def on_batch(kind: str, items: List[Tuple[str, int]]):
+            for ip, response_time in items:
+                host = HostResult(ip, NO_HOSTNAME, response_time)
+                hosts_data.append(host)
+                scanner._host_found(host, pending, on_host)
+
+        with scanner.metrics.phase('discovery'):
+            self.shard_stats = self._run(
+                _discovery_worker, [(ranges, dict(options)) for ranges in shards], on_batch
+            )
+            concurrent.futures.wait(pending)
+
+        for stats in self.shard_stats:
+            if scanner.rtt and stats.get('rtt_state'):
+                scanner.rtt.merge_state(stats['rtt_state'])
+        self._merge_rate_stats(scanner.limiter)
+        self._merge_metrics(scanner.metrics)
+        scanner.rate_stats = scanner.limiter.stats() if scanner.limiter else {}
+        engines = {stats['engine'] for stats in self.shard_stats if 'engine' in stats}
+        if len(engines) == 1:
+            scanner.engine = engines.pop()
+
+        scanner.scan_duration = time.time() - start_time
+        scanner.probes_sent = sum(stats.get('targets', 0) for stats in self.shard_stats)
+        scanner.active_hosts = hosts_data
+        self._check_failed()
+        self.logger.info(
+            "Escaneo completado: %d hosts en %.2f segundos (%d procesos)",
+            len(hosts_data), scanner.scan_duration, len(shards)
+        )
+        return hosts_data
+
+    @staticmethod
+    def _group_by_subnet(ips: Iterable[str], groups: int, prefixlen: int
+                         ) -> List[Tuple[List[str], List[str]]]:
+        """
+        Reparte IPs en grupos equilibrados sin partir ninguna subred.
+
+        Retorna (subredes, ips) por grupo no vacío.
+        """
+        subnets: Dict[str, List[str]] = {}
+        for ip in ips:
+            subnet = subnet_of(ip, prefixlen)
+            subnets.setdefault(subnet, []).append(ip)
+        buckets = [([], []) for _ in range(groups)]
+        for subnet, members in sorted(subnets.items(), key=lambda item: len(item[1]), reverse=True):
+            names, bucket = min(buckets, key=lambda b: len(b[1]))
+            names.append(subnet)
+            bucket.extend(members)
+        return [bucket for bucket in buckets if bucket[1]]
+
+    def scan_hosts_ports(self, hosts: List[HostResult], ports: Iterable[int],
+                         on_host_done: Optional[Callable[[str, List[PortResult]], None]] = None
+                         ) -> Dict[str, List[PortResult]]:
+        """Como PortScanner.scan_hosts_ports, repartido en `workers` procesos."""
+        port_scanner = self.port_scanner
+        if port_scanner is None:
+            raise ValueError("ShardedScanner sin PortScanner para el escaneo de puertos")
+
+        ports = by_likelihood(ports)
+        results: Dict[str, List[PortResult]] = {host['ip']: [] for host in hosts}
+        if not ports or not results:
+            return results
+        rtt = port_scanner.rtt
+        groups = self._group_by_subnet(results, self.workers, rtt.prefixlen if rtt else 24)
+        self.logger.info(
+            "Escaneando puertos en %d hosts activos (%d procesos)...", len(results), len(groups)
+        )
+
+        rtt_state = rtt.export_state() if rtt else {}
+        options = dict(
+            timeout=port_scanner.timeout,
+            max_threads=port_scanner.max_threads,
+            verbose=self.verbose,
+            engine=port_scanner.engine,
+            max_inflight=port_scanner.max_inflight,
+            per_host_limit=port_scanner.per_host_limit,
+            udp_retries=port_scanner.udp_retries,
+            udp_host_rate=port_scanner.udp_host_rate,
+            services=port_scanner.services.config() if port_scanner.services else None,
+            limiter=self._limiter_options(port_scanner.limiter, len(groups)),
+            metrics=port_scanner.metrics.enabled,
+            **self._rtt_options(rtt)
+        )
+
+        def on_batch(kind: str, items: List[Tuple[str, List[Tuple]]]):
+            for ip, open_ports in items:
+                open_ports = [PortResult.shared(*entry) for entry in open_ports]
+                results[ip] = open_ports
+                if on_host_done:
+                    on_host_done(ip, open_ports)
+
+        # Cada proceso parte del estado RTT de sus propias subredes y, como es
+        # su único dueño, el estado que devuelve sustituye al de partida
+        shard_args = [
+            (ips, ports, dict(options, rtt_state={
+                subnet: rtt_state[subnet] for subnet in subnets if subnet in rtt_state
+            }))
+            for subnets, ips in groups
+        ]
+        start_time = time.time()
+        with port_scanner.metrics.phase('ports'):
+            self.shard_stats = self._run(_port_worker, shard_args, on_batch)
+        port_scanner.scan_duration = time.time() - start_time
+        port_scanner.probes_sent = sum(stats.get('targets', 0) for stats in self.shard_stats)
+        for stats in self.shard_stats:
+            if rtt and stats.get('rtt_state'):
+                rtt.merge_state(stats['rtt_state'], replace=True)
+        self._merge_rate_stats(port_scanner.limiter)
+        self._merge_metrics(port_scanner.metrics)
+        self._check_failed()
+
+        total_ports = sum(len(open_ports) for open_ports in results.values())
+        self.logger.info("Escaneo de puertos completado: %d puertos abiertos", total_ports)
+        return results
@@ -0,0 +1,301 @@
+# network_discovery_tool/targets.py
+import bisect
+import re
+import socket
+import sys
+from ipaddress import (AddressValueError, IPv4Address, IPv4Network, IPv6Address, IPv6Network,
+                       ip_network)
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .ipv6 import MAX_ENUMERATED, IPv6Hints
+from .models import IPV6_BASE, int_to_ip, ip_to_int
+
+# Intervalo de direcciones [primera, última], ambas incluidas, como enteros
+Interval = Tuple[int, int]
+
+# Separadores entre objetivos en ficheros y listas (--exclude 10.0.0.1,10.0.0.9)
+_SEPARATORS = re.compile(r'[\s,]+')
+
+# Objetivos numéricos (direcciones, CIDR y rangos); el resto son nombres de host
+_NUMERIC = re.compile(r'[\d./-]+')
+
+# Un objetivo con ':' es IPv6 (los nombres de host no pueden contenerlo)
+_IPV6 = re.compile(r'[0-9A-Fa-f:.]+(/\d+|-[0-9A-Fa-f:.]+)?')
+
+
+def host_range(network: IPv4Network) -> Interval:
+    """Primera y última IP (enteros) que recorre network.hosts()."""
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen < 31:
+        first += 1
+        last -= 1
+    return first, last
+
+
+def ipv6_intervals(network: IPv6Network, hints: Optional[IPv6Hints] = None) -> List[Interval]:
+    """
+    Intervalos de un prefijo IPv6.
+
+    Hasta MAX_ENUMERATED direcciones se recorre entero (sin la dirección
+    anycast de la subred, ::0); los mayores solo aportan los candidatos de
+    `hints`. Sin `hints` se retorna el prefijo completo, p. ej. para
+    excluirlo.
+    """
+    first = IPV6_BASE + int(network.network_address)
+    last = first + network.num_addresses - 1
+    if network.num_addresses > MAX_ENUMERATED:
+        if hints is None:
+            return [(first, last)]
+        return list(hints.intervals(network))
+    if network.prefixlen < 127:
+        first += 1
+    return [(first, last)]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Ordena y fusiona intervalos solapados o contiguos."""
+    merged: List[Interval] = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+class IntervalSet:
+    """
+    Conjunto de direcciones IPv4 e IPv6 como intervalos ordenados y disjuntos.
+
+    Las direcciones son los enteros de ip_to_int, con las IPv6 después de
+    todas las IPv4. La memoria depende del número de intervalos, no de
+    direcciones: un /8 ocupa lo mismo que una IP. La iteración produce los enteros de forma
+    perezosa y en orden, cada dirección una sola vez.
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self._intervals = merge_intervals(intervals)
+
+    def update(self, intervals: Iterable[Interval]):
+        """Añade intervalos (unión)."""
+        self._intervals = merge_intervals(self._intervals + list(intervals))
+
+    def difference_update(self, intervals: Iterable[Interval]):
+        """Quita las direcciones de `intervals` (diferencia)."""
+        result: List[Interval] = []
+        excluded = merge_intervals(intervals)
+        index = 0
+        for first, last in self._intervals:
+            # Saltar exclusiones que terminan antes de este intervalo
+            while index < len(excluded) and excluded[index][1] < first:
+                index += 1
+            cursor = first
+            probe = index
+            while probe < len(excluded) and excluded[probe][0] <= last:
+                ex_first, ex_last = excluded[probe]
+                if ex_first > cursor:
+                    result.append((cursor, ex_first - 1))
+                cursor = max(cursor, ex_last + 1)
+                probe += 1
+            if cursor <= last:
+                result.append((cursor, last))
+        self._intervals = result
+
+    def intervals(self) -> List[Interval]:
+        return list(self._intervals)
+
+    def __len__(self) -> int:
+        return sum(last - first + 1 for first, last in self._intervals)
+
+    def __bool__(self) -> bool:
+        return bool(self._intervals)
+
+    def __iter__(self) -> Iterator[int]:
+        for first, last in self._intervals:
+            yield from range(first, last + 1)
+
+    def __contains__(self, address) -> bool:
+        value = ip_to_int(address) if isinstance(address, str) else address
+        if not isinstance(value, int):
+            return False
+        index = bisect.bisect_right(self._intervals, (value, float('inf'))) - 1
+        return index >= 0 and self._intervals[index][0] <= value <= self._intervals[index][1]
+
+    def addresses(self) -> Iterator[str]:
+        """Direcciones en forma de texto, generadas a medida que se consumen."""
+        return (int_to_ip(value) for value in self)
+
+
+def parse_target(spec: str, hints: Optional[IPv6Hints] = None) -> List[Interval]:
+    """
+    Convierte un objetivo en intervalos.
+
+    Admite CIDR (192.168.1.0/24, sin red ni broadcast), rangos
+    (10.0.0.1-10.0.0.50 o 10.0.0.1-50), direcciones sueltas y nombres de
+    host (todas sus direcciones IPv4). Lo mismo en IPv6 (2001:db8::/120,
+    2001:db8::1-ff); de los prefijos IPv6 mayores que un /112 solo se
+    toman los candidatos de `hints` (ver ipv6_intervals).
+    """
+    spec = spec.strip()
+    if not spec:
+        raise ValueError("Objetivo vacío")
+    if ':' in spec and _IPV6.fullmatch(spec):
+        return _parse_ipv6(spec, hints)
+    if not _NUMERIC.fullmatch(spec):
+        return _resolve_target(spec)
+    try:
+        if '/' in spec:
+            return [host_range(IPv4Network(spec, strict=False))]
+        if '-' in spec:
+            start, end = spec.split('-', 1)
+            first = int(IPv4Address(start.strip()))
+            end = end.strip()
+            if '.' in end:
+                last = int(IPv4Address(end))
+            else:
+                octet = int(end)
+                if not 0 <= octet <= 255:
+                    raise ValueError(f"octeto fuera de rango: {end}")
+                last = (first & 0xFFFFFF00) | octet
+            if last < first:
+                raise ValueError("el final del rango es anterior al inicio")
+            return [(first, last)]
+        value = int(IPv4Address(spec))
+        return [(value, value)]
+    except (AddressValueError, ValueError) as e:
+        raise ValueError(f"Objetivo inválido: {spec} ({e})")
+
+
+def _parse_ipv6(spec: str, hints: Optional[IPv6Hints]) -> List[Interval]:
+    try:
+        if '/' in spec:
+            return ipv6_intervals(IPv6Network(spec, strict=False), hints)
+        if '-' in spec:
+            start, end = spec.split('-', 1)
+            first = int(IPv6Address(start.strip()))
+            end = end.strip()
+            if ':' in end:
+                last = int(IPv6Address(end))
+            else:
+                group = int(end, 16)
+                if not 0 <= group <= 0xFFFF:
+                    raise ValueError(f"grupo fuera de rango: {end}")
+                last = (first & ~0xFFFF) | group
+            if last < first:
+                raise ValueError("el final del rango es anterior al inicio")
+            if last - first >= MAX_ENUMERATED:
+                raise ValueError("rango demasiado amplio para enumerarlo; usa un prefijo y pistas")
+            return [(IPV6_BASE + first, IPV6_BASE + last)]
+        value = IPV6_BASE + int(IPv6Address(spec))
+        return [(value, value)]
+    except (AddressValueError, ValueError) as e:
+        raise ValueError(f"Objetivo inválido: {spec} ({e})")
+
+
+def _resolve_target(spec: str) -> List[Interval]:
+    """Direcciones IPv4 de un nombre de host (se resuelve una vez, al cargar)."""
+    try:
+        _, _, addresses = socket.gethostbyname_ex(spec)
+    except (socket.gaierror, socket.herror, UnicodeError) as e:
+        raise ValueError(f"No se pudo resolver el objetivo {spec}: {e}")
+    return [(value, value) for value in (int(IPv4Address(ip)) for ip in addresses)]
+
+
+def split_specs(text: str) -> List[str]:
+    """Separa una lista de objetivos por comas o espacios."""
+    return [spec for spec in _SEPARATORS.split(text) if spec]
+
+
+def read_target_file(path: str) -> Iterator[str]:
+    """Objetivos de un fichero ('-' = stdin): separados por líneas, comas o espacios; # comenta."""
+    fh = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in fh:
+            yield from split_specs(line.split('#', 1)[0])
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+class TargetSet(IntervalSet):
+    """
+    Objetivos de un escaneo: la unión de los incluidos menos los excluidos.
+
+    `label` identifica el objetivo en el historial y en los nombres de
+    fichero; con un único CIDR es el propio CIDR. `duplicates` cuenta las
+    direcciones repetidas en la entrada que solo se sondearán una vez.
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = (), label: str = ''):
+        intervals = list(intervals)
+        super().__init__(intervals)
+        self.label = label
+        self.duplicates = sum(last - first + 1 for first, last in intervals) - len(self)
+        self.excluded = 0
+
+    @classmethod
+    def from_specs(cls, specs: Sequence[str], exclude: Sequence[str] = (),
+                   target_files: Sequence[str] = (), exclude_files: Sequence[str] = (),
+                   hints: Optional[IPv6Hints] = None) -> 'TargetSet':
+        """
+        Construye el conjunto desde la línea de comandos y ficheros de objetivos.
+
+        `hints` elige los candidatos de los prefijos IPv6 grandes (por
+        defecto, direcciones bajas y tabla de vecinos); las exclusiones
+        siempre quitan el prefijo completo.
+        """
+        if hints is None:
+            hints = IPv6Hints()
+        intervals: List[Interval] = []
+        for spec in specs:
+            intervals.extend(parse_target(spec, hints))
+        for path in target_files:
+            for spec in read_target_file(path):
+                intervals.extend(parse_target(spec, hints))
+
+        excluded: List[Interval] = []
+        exclude_specs = [spec for text in exclude for spec in split_specs(text)]
+        for spec in exclude_specs:
+            excluded.extend(parse_target(spec))
+        for path in exclude_files:
+            for spec in read_target_file(path):
+                excluded.extend(parse_target(spec))
+
+        parts = list(specs) + [f"@{'stdin' if path == '-' else path}" for path in target_files]
+        label = ','.join(parts)
+        exclusions = exclude_specs + [f"@{path}" for path in exclude_files]
+        if exclusions:
+            label += ' -' + ','.join(exclusions)
+
+        targets = cls(intervals, label)
+        if excluded:
+            before = len(targets)
+            targets.difference_update(excluded)
+            targets.excluded = before - len(targets)
+        return targets
+
+    @classmethod
+    def from_network(cls, network_cidr: str, hints: Optional[IPv6Hints] = None) -> 'TargetSet':
+        """
+        Conjunto de un único CIDR (las mismas direcciones que network.hosts()).
+
+        Un prefijo IPv6 mayor que un /112 se reduce a los candidatos de
+        `hints` (por defecto, direcciones bajas y tabla de vecinos).
+        """
+        try:
+            network = ip_network(network_cidr, strict=False)
+        except (AddressValueError, ValueError):
+            raise ValueError(f"Formato de red inválido: {network_cidr}")
+        if network.version == 6:
+            return cls(ipv6_intervals(network, hints if hints is not None else IPv6Hints()),
+                       network_cidr)
+        return cls([host_range(network)], network_cidr)
+
+    def file_label(self, max_length: int = 80) -> str:
+        """`label` apto para nombres de fichero."""
+        return re.sub(r'[^0-9A-Za-z.-]+', '_', self.label).strip('_')[:max_length] or 'targets'
+
+    def __str__(self) -> str:
+        return self.label
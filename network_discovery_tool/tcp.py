@@ -0,0 +1,204 @@
+# network_discovery_tool/tcp.py
+import asyncio
+import errno
+import socket
+import struct
+from typing import Callable, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .metrics import ProbeMetrics
+from .models import ip_family
+from .ratelimit import RateLimiter
+
+# SO_LINGER activado con tiempo 0: close() envía RST en lugar de FIN,
+# así el socket no pasa por TIME_WAIT
+_LINGER_RST = struct.pack('ii', 1, 0)
+
+# Descriptores reservados para logs, ficheros de salida, pipes, etc.
+FD_RESERVE = 64
+
+
+def fd_budget(reserve: int = FD_RESERVE) -> int:
+    """
+    Número de sockets que pueden abrirse a la vez según RLIMIT_NOFILE.
+
+    Intenta subir el límite blando hasta el duro antes de calcularlo.
+    """
+    if resource is None:
+        return 512
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        target = hard if hard != resource.RLIM_INFINITY else max(soft, 65536)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return max(1, soft - reserve)
+
+
+def close_with_rst(sock: socket.socket):
+    """Cierra el socket abortando la conexión (RST)."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+    except OSError:
+        pass
+    sock.close()
+
+
+def _set_done(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TCPConnectEngine:
+    """
+    Motor de escaneo TCP connect no bloqueante.
+
+    Mantiene hasta `max_inflight` conexiones en curso desde un único hilo
+    con asyncio, limitado por el número de descriptores disponibles.
+    """
+
+    def __init__(self, timeout: float = 1.0, max_inflight: int = 1024,
+                 timeout_for: Optional[Callable[[str], float]] = None,
+                 on_rtt: Optional[Callable[[str, float], None]] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[ProbeMetrics] = None,
+                 on_connected: Optional[Callable[[str, int, socket.socket], None]] = None):
+        self.timeout = timeout
+        # Si se indica, recibe el socket de cada puerto abierto en lugar de
+        # cerrarlo (p. ej. para leer el banner sin reconectar)
+        self.on_connected = on_connected
+        # Timeout por destino y callback con el RTT (ms) de cada handshake
+        self.timeout_for = timeout_for
+        self.on_rtt = on_rtt
+        # Tasa global y límites en vuelo por destino / subred
+        self.limiter = limiter
+        # Contadores e histograma de latencia (None = métricas desactivadas)
+        self.metrics = metrics
+        self.max_inflight = max(1, min(max_inflight, fd_budget()))
+        self.attempts = 0
+        self.open = 0
+        self.refused = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def connect(self, ip: str, port: int) -> bool:
+        """Intenta una conexión TCP y retorna True si el puerto está abierto."""
+        if self.limiter is None:
+            return await self._connect(ip, port)
+        await self.limiter.acquire_async(ip)
+        try:
+            return await self._connect(ip, port)
+        finally:
+            self.limiter.release(ip)
+
+    async def _connect(self, ip: str, port: int) -> bool:
+        loop = asyncio.get_event_loop()
+        sock = socket.socket(ip_family(ip), socket.SOCK_STREAM)
+        sock.setblocking(False)
+        self.attempts += 1
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.sent.inc()
+        timeout = self.timeout_for(ip) if self.timeout_for else self.timeout
+        started = loop.time()
+        handed_over = False
+        try:
+            err = sock.connect_ex((ip, port))
+            if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                # Esperar a que el socket sea escribible o venza el timeout,
+                # sin crear tareas adicionales por conexión
+                fd = sock.fileno()
+                waiter = loop.create_future()
+                loop.add_writer(fd, _set_done, waiter)
+                timer = loop.call_later(timeout, _set_done, waiter)
+                try:
+                    await waiter
+                finally:
+                    timer.cancel()
+                    loop.remove_writer(fd)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0:
+                    # Sin error y sin conexión establecida: venció el timeout
+                    try:
+                        sock.getpeername()
+                    except OSError:
+                        self.timeouts += 1
+                        if metrics is not None:
+                            metrics.timeouts.inc()
+                        return False
+            if err == 0 and self.on_connected is not None:
+                self.on_connected(ip, port, sock)
+                handed_over = True
+        finally:
+            if not handed_over:
+                close_with_rst(sock)
+
+        if err in (0, errno.ECONNREFUSED):
+            # Tanto SYN-ACK como RST miden el RTT hasta el destino
+            latency = (loop.time() - started) * 1000
+            if self.on_rtt:
+                self.on_rtt(ip, latency)
+            if metrics is not None:
+                metrics.reply(latency)
+        if err == 0:
+            self.open += 1
+            return True
+        if err == errno.ECONNREFUSED:
+            self.refused += 1
+        elif err == errno.ETIMEDOUT:
+            self.timeouts += 1
+            if metrics is not None:
+                metrics.timeouts.inc()
+        else:
+            self.errors += 1
+            if metrics is not None:
+                metrics.error(err)
+        return False
+
+    async def _probe(self, ip: str, port: int, semaphore: asyncio.Semaphore,
+                     on_open: Callable[[str, int], None]):
+        try:
+            if await self.connect(ip, port):
+                on_open(ip, port)
+        finally:
+            semaphore.release()
+
+    async def _run(self, targets: Iterable[Tuple[str, int]],
+                   on_open: Callable[[str, int], None]):
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        for ip, port in targets:
+            await semaphore.acquire()
+            task = loop.create_task(self._probe(ip, port, semaphore, on_open))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def scan(self, targets: Iterable[Tuple[str, int]],
+             on_open: Optional[Callable[[str, int], None]] = None) -> List[Tuple[str, int]]:
+        """
+        Sondea los pares (ip, puerto) y retorna los que están abiertos.
+
+        `on_open` se invoca desde el event loop por cada puerto abierto.
+        """
+        results: List[Tuple[str, int]] = []
+
+        def _collect(ip: str, port: int):
+            results.append((ip, port))
+            if on_open:
+                on_open(ip, port)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(targets, _collect))
+        finally:
+            loop.close()
+        return results
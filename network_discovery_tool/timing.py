@@ -0,0 +1,167 @@
+# network_discovery_tool/timing.py
+import math
+import socket
+import threading
+from ipaddress import ip_network
+from typing import Dict, Hashable, Optional, Tuple
+
+from .models import IPV6_BASE, ip_family, ip_to_int
+
+# Prefijo de las subredes IPv6: un /64 es un enlace, sea cual sea el prefijo IPv4
+IPV6_PREFIXLEN = 64
+
+
+def subnet_of(ip: str, prefixlen: int = 24) -> str:
+    """Subred (CIDR) de una IP: /`prefixlen` en IPv4, /64 en IPv6."""
+    if ip_family(ip) != socket.AF_INET:
+        prefixlen = IPV6_PREFIXLEN
+    return str(ip_network(f"{ip}/{prefixlen}", strict=False))
+
+
+class _SubnetRTT:
+    """Estado SRTT/RTTVAR de una subred."""
+    __slots__ = ('srtt', 'rttvar', 'samples')
+
+    def __init__(self):
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.samples = 0
+
+
+class RTTEstimator:
+    """
+    Estimador de RTT por subred al estilo de TCP (RFC 6298).
+
+    Se alimenta con los tiempos de respuesta medidos (en ms) y deriva para
+    cada subred un timeout SRTT + max(G, K * RTTVAR), acotado entre un
+    suelo y un techo y con resolución de milisegundos. Las subredes sin
+    muestras propias usan el techo: la estimación de otras subredes puede
+    ser mucho menor y, si sus hosts no responden a tiempo, la subred nunca
+    obtendría muestras que la corrijan.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    GRANULARITY_MS = 1.0
+
+    def __init__(self, min_timeout: float = 0.05, prefixlen: int = 24):
+        self.min_timeout = min_timeout
+        self.prefixlen = prefixlen
+        self._subnets: Dict[str, _SubnetRTT] = {}
+        # Nombre CIDR por clave entera de subred: evita un objeto ip_network por sonda
+        self._names: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+    def subnet_of(self, ip: str) -> str:
+        """Subred (CIDR) a la que se asigna una IP."""
+        value = ip_to_int(ip)
+        if not isinstance(value, int):
+            return subnet_of(ip, self.prefixlen)
+        if value >= IPV6_BASE:
+            key: Hashable = (6, (value - IPV6_BASE) >> (128 - IPV6_PREFIXLEN))
+        else:
+            key = value >> (32 - self.prefixlen)
+        name = self._names.get(key)
+        if name is None:
+            name = self._names[key] = subnet_of(ip, self.prefixlen)
+        return name
+
+    @classmethod
+    def _update(cls, state: _SubnetRTT, rtt_ms: float):
+        if state.samples == 0:
+            state.srtt = rtt_ms
+            state.rttvar = rtt_ms / 2
+        else:
+            state.rttvar = (1 - cls.BETA) * state.rttvar + cls.BETA * abs(state.srtt - rtt_ms)
+            state.srtt = (1 - cls.ALPHA) * state.srtt + cls.ALPHA * rtt_ms
+        state.samples += 1
+
+    def observe(self, ip: str, rtt_ms: float):
+        """Registra un RTT medido (en ms) para la subred de `ip`."""
+        subnet = self.subnet_of(ip)
+        with self._lock:
+            state = self._subnets.get(subnet)
+            if state is None:
+                state = self._subnets[subnet] = _SubnetRTT()
+            self._update(state, rtt_ms)
+
+    def _rto(self, state: _SubnetRTT, ceiling: float) -> float:
+        if state.samples == 0:
+            return ceiling
+        rto_ms = state.srtt + max(self.GRANULARITY_MS, self.K * state.rttvar)
+        rto = round(rto_ms) / 1000
+        return min(max(rto, self.min_timeout), ceiling)
+
+    def timeout_for(self, ip: str, ceiling: float) -> float:
+        """Timeout en segundos (resolución de ms) para sondear `ip`."""
+        subnet = self.subnet_of(ip)
+        with self._lock:
+            state = self._subnets.get(subnet)
+            return ceiling if state is None else self._rto(state, ceiling)
+
+    def snapshot(self, ceiling: float) -> Dict[str, Dict]:
+        """Estado por subred con el timeout elegido en ms."""
+        with self._lock:
+            return {
+                subnet: {
+                    'srtt_ms': round(state.srtt, 3),
+                    'rttvar_ms': round(state.rttvar, 3),
+                    'timeout_ms': int(self._rto(state, ceiling) * 1000),
+                    'samples': state.samples
+                }
+                for subnet, state in sorted(self._subnets.items())
+            }
+
+    def export_state(self) -> Dict[str, Tuple[float, float, int]]:
+        """Estado por subred como (srtt, rttvar, muestras), serializable entre procesos."""
+        with self._lock:
+            return {
+                subnet: (state.srtt, state.rttvar, state.samples)
+                for subnet, state in self._subnets.items()
+            }
+
+    def merge_state(self, states: Dict[str, Tuple[float, float, int]], replace: bool = False):
+        """
+        Incorpora el estado exportado por otro estimador.
+
+        Las subredes ya conocidas se combinan ponderando por número de
+        muestras, salvo con `replace`, que sobrescribe las recibidas (p. ej.
+        cuando el otro estimador partió de este mismo estado).
+        """
+        with self._lock:
+            for subnet, (srtt, rttvar, samples) in states.items():
+                if not samples:
+                    continue
+                state = self._subnets.get(subnet)
+                if state is None:
+                    state = self._subnets[subnet] = _SubnetRTT()
+                if replace:
+                    state.srtt, state.rttvar, state.samples = srtt, rttvar, samples
+                else:
+                    self._combine(state, srtt, rttvar, samples)
+
+    @staticmethod
+    def _combine(state: _SubnetRTT, srtt: float, rttvar: float, samples: int):
+        total = state.samples + samples
+        state.srtt = (state.srtt * state.samples + srtt * samples) / total
+        state.rttvar = (state.rttvar * state.samples + rttvar * samples) / total
+        state.samples = total
+
+
+def format_wait(timeout: float) -> str:
+    """
+    Formatea un timeout para `ping -W` en segundos enteros, redondeando arriba.
+
+    BusyBox y las versiones antiguas de iputils rechazan valores fraccionarios
+    y salen con error; la resolución de milisegundos queda para los motores
+    icmp y probe, que no pasan por el binario.
+    """
+    return str(max(1, math.ceil(timeout)))
+
+
+def effective_timeout(estimator: Optional[RTTEstimator], ip: str, ceiling: float) -> float:
+    """Timeout adaptativo si hay estimador; si no, el techo configurado."""
+    if estimator is None:
+        return ceiling
+    return estimator.timeout_for(ip, ceiling)
@@ -0,0 +1,429 @@
+# network_discovery_tool/udp.py
+import asyncio
+import errno
+import socket
+import struct
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from .metrics import ProbeMetrics
+from .models import ip_family
+from .ratelimit import RateLimiter
+
+# Estados de un puerto UDP
+OPEN = 'open'
+CLOSED = 'closed'
+FILTERED = 'filtered'
+OPEN_FILTERED = 'open|filtered'
+
+# Diccionario de servicios UDP comunes
+UDP_SERVICE_PORTS = {
+    53: 'DNS',
+    67: 'DHCP',
+    69: 'TFTP',
+    123: 'NTP',
+    137: 'NetBIOS-NS',
+    161: 'SNMP',
+    500: 'IKE',
+    514: 'Syslog',
+    1900: 'SSDP',
+    5353: 'mDNS'
+}
+
+# Sondas por defecto hacia un host antes de frenar su ritmo (sondas/seg)
+DEFAULT_HOST_RATE = 200.0
+
+# Suelo del ritmo por host: Linux responde por defecto ~1 ICMP/s por destino
+MIN_HOST_RATE = 1.0
+
+# Puertos sin respuesta tras los que, si ningún reintento obtuvo respuesta,
+# se deja de reintentar más de una vez hacia ese host
+SILENT_LIMIT = 32
+
+# Búfer de recepción solicitado para el socket compartido
+RCVBUF_SIZE = 4 * 1024 * 1024
+
+# Linux: IP_RECVERR / IPV6_RECVERR encolan los ICMP de error del socket
+# (Python no siempre las expone)
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+
+# struct sock_extended_err: errno, origen, tipo, código, relleno, info, data
+_EXTENDED_ERR = struct.Struct('=IBBBBII')
+
+# Por familia: (nivel, opción, origen ICMP, tipo destino inalcanzable, código puerto inalcanzable)
+_RECVERR = {
+    socket.AF_INET: (socket.IPPROTO_IP, IP_RECVERR, 2, 3, 3),
+    socket.AF_INET6: (socket.IPPROTO_IPV6, IPV6_RECVERR, 3, 1, 4),
+}
+
+# Errores que un ICMP recibido deja pendientes en el socket (sk_err) y que
+# el siguiente sendto/recvfrom devuelve aunque sean de otro destino
+_PENDING_ERRNOS = (errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN)
+
+
+def _ber(tag: int, content: bytes) -> bytes:
+    """Elemento BER con longitud corta (< 128 bytes)."""
+    return bytes((tag, len(content))) + content
+
+
+def _dns_query(qname: bytes, qtype: int, flags: int = 0x0100) -> bytes:
+    return struct.pack('!HHHHHH', 0x4e44, flags, 1, 0, 0, 0) + qname + struct.pack('!HH', qtype, 1)
+
+
+# Consulta SNMPv1 GetRequest de sysDescr.0 con la comunidad 'public'
+_SNMP_GET = _ber(0x30, (
+    _ber(0x02, b'\x00')
+    + _ber(0x04, b'public')
+    + _ber(0xa0, (
+        _ber(0x02, b'\x4e\x44')
+        + _ber(0x02, b'\x00')
+        + _ber(0x02, b'\x00')
+        + _ber(0x30, _ber(0x30, _ber(0x06, b'\x2b\x06\x01\x02\x01\x01\x01\x00') + b'\x05\x00'))
+    ))
+))
+
+# Carga útil por puerto: un servicio UDP solo responde a una petición válida
+# de su protocolo. El resto de puertos reciben un datagrama vacío.
+UDP_PAYLOADS = {
+    # NS de la raíz: cualquier servidor responde, aunque sea REFUSED
+    53: _dns_query(b'\x00', 2),
+    # Petición de cliente NTPv4 (LI 3, VN 4, modo 3)
+    123: b'\xe3' + b'\x00' * 47,
+    # NBSTAT del nombre comodín '*'
+    137: _dns_query(b'\x20CK' + b'A' * 30 + b'\x00', 0x21, flags=0),
+    161: _SNMP_GET,
+    # Syslog nunca responde: solo puede confirmarse cerrado (ICMP)
+    514: b'<15>ndiscover: udp probe\n',
+    1900: (b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\n'
+           b'MAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n'),
+    # Consulta unicast de los servicios DNS-SD anunciados
+    5353: _dns_query(b'\x09_services\x07_dns-sd\x04_udp\x05local\x00', 12, flags=0),
+}
+
+
+class _HostPacing:
+    """Ritmo y reintentos hacia un host."""
+    __slots__ = ('rate', 'next_send', 'last_backoff', 'late', 'silent')
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.next_send = 0.0
+        self.last_backoff = 0.0
+        self.late = 0    # Respuestas que llegaron tras un reintento
+        self.silent = 0  # Puertos sin respuesta tras todos los intentos
+
+
+def _set_result(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+class UDPScanEngine:
+    """
+    Motor de escaneo UDP no bloqueante.
+
+    Todas las sondas salen de un único socket sin conectar desde un hilo con
+    asyncio, con una carga útil de su protocolo para los puertos conocidos
+    (UDP_PAYLOADS). Cada puerto se clasifica como:
+    - 'open': llega un datagrama desde ese puerto
+    - 'closed': ICMP port unreachable
+    - 'filtered': otro ICMP de destino inalcanzable (p. ej. prohibido)
+    - 'open|filtered': sin respuesta tras los reintentos
+
+    Hay un socket por familia (IPv4 e IPv6), abierto con el primer destino
+    de esa familia. Los ICMP se leen del error queue del socket
+    (IP_RECVERR / IPV6_RECVERR), que indica el destino y el puerto de la
+    sonda original; sin él (fuera de Linux) los puertos cerrados quedan
+    como 'open|filtered'.
+
+    Los hosts limitan los ICMP que generan (Linux: ráfaga de 6 y ~1/s), así
+    que cada host tiene su propio ritmo: empieza en `host_rate` sondas/seg,
+    se reduce a la mitad cuando un reintento obtiene la respuesta que el
+    primer envío no obtuvo (como mucho una vez por timeout) y crece de uno
+    en uno con cada respuesta al primer intento. Los reintentos esperan el
+    doble cada vez y se limitan a uno en hosts donde nunca han servido.
+    """
+
+    def __init__(self, timeout: float = 1.0, retries: int = 2,
+                 host_rate: float = DEFAULT_HOST_RATE, max_inflight: int = 1024,
+                 timeout_for: Optional[Callable[[str], float]] = None,
+                 on_rtt: Optional[Callable[[str, float], None]] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[ProbeMetrics] = None,
+                 payloads: Optional[Dict[int, bytes]] = None):
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.host_rate = host_rate  # 0 = sin ritmo por host
+        self.max_inflight = max(1, max_inflight)
+        # Timeout por destino y callback con el RTT (ms) de cada respuesta
+        self.timeout_for = timeout_for
+        self.on_rtt = on_rtt
+        self.limiter = limiter
+        self.metrics = metrics
+        self.payloads = UDP_PAYLOADS if payloads is None else payloads
+        self.icmp_errors = True
+        self.attempts = 0
+        self.retransmits = 0
+        self.open = 0
+        self.closed = 0
+        self.filtered = 0
+        self.open_filtered = 0
+        self.errors = 0
+        self.backoffs = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Socket y espera de escritura por familia
+        self._socks: Dict[int, socket.socket] = {}
+        self._writable: Dict[int, asyncio.Future] = {}
+        # Sonda en espera por (ip, puerto); el planificador nunca repite un par
+        self._waiting: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._hosts: Dict[str, _HostPacing] = {}
+
+    def _open(self, family: int) -> socket.socket:
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_SIZE)
+        except OSError:
+            pass
+        level, option = _RECVERR[family][:2]
+        try:
+            sock.setsockopt(level, option, 1)
+            if not hasattr(sock, 'recvmsg'):
+                self.icmp_errors = False
+        except OSError:
+            self.icmp_errors = False
+        # Asigna el puerto de origen antes de la primera respuesta
+        sock.bind(('::' if family == socket.AF_INET6 else '', 0))
+        self._socks[family] = sock
+        self._loop.add_reader(sock.fileno(), self._on_readable, sock, family)
+        return sock
+
+    def close(self):
+        """Cierra los sockets (desde el hilo del event loop)."""
+        for family, sock in self._socks.items():
+            fd = sock.fileno()
+            self._loop.remove_reader(fd)
+            waiter = self._writable.pop(family, None)
+            if waiter is not None:
+                self._loop.remove_writer(fd)
+                _set_result(waiter, None)
+            sock.close()
+        self._socks = {}
+
+    def _resolve(self, ip: str, port: int, state: str):
+        waiter = self._waiting.get((ip, port))
+        if waiter is not None:
+            _set_result(waiter, state)
+
+    def _drain_errors(self, sock: socket.socket, family: int):
+        """Lee el error queue: cada ICMP indica el destino de la sonda original."""
+        if not self.icmp_errors:
+            return
+        level, option, origin_icmp, dest_unreach, port_unreach = _RECVERR[family]
+        while True:
+            try:
+                _, ancdata, _, address = sock.recvmsg(0, 512, MSG_ERRQUEUE)
+            except OSError:  # Incluye BlockingIOError: cola vacía
+                return
+            for cmsg_level, kind, data in ancdata:
+                if cmsg_level != level or kind != option or len(data) < _EXTENDED_ERR.size:
+                    continue
+                _, origin, icmp_type, code, _, _, _ = _EXTENDED_ERR.unpack_from(data)
+                if origin != origin_icmp or icmp_type != dest_unreach:
+                    continue
+                self._resolve(address[0], address[1],
+                              CLOSED if code == port_unreach else FILTERED)
+
+    def _on_readable(self, sock: socket.socket, family: int):
+        # Primero el error queue: leerlo descarta el error pendiente del socket
+        self._drain_errors(sock, family)
+        while True:
+            try:
+                _, address = sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if e.errno in _PENDING_ERRNOS:
+                    self._drain_errors(sock, family)
+                    continue
+                return
+            self._resolve(address[0], address[1], OPEN)
+
+    def _on_writable(self, sock: socket.socket, family: int):
+        self._loop.remove_writer(sock.fileno())
+        _set_result(self._writable.pop(family), None)
+
+    async def _send(self, payload: bytes, ip: str, port: int) -> int:
+        """Envía el datagrama esperando si el búfer está lleno; retorna el errno o 0."""
+        family = ip_family(ip)
+        sock = self._socks.get(family) or self._open(family)
+        retried = False
+        while True:
+            try:
+                sock.sendto(payload, (ip, port))
+                return 0
+            except (BlockingIOError, InterruptedError):
+                waiter = self._writable.get(family)
+                if waiter is None:
+                    waiter = self._writable[family] = self._loop.create_future()
+                    self._loop.add_writer(sock.fileno(), self._on_writable, sock, family)
+                await waiter
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    await asyncio.sleep(0.001)
+                elif e.errno in _PENDING_ERRNOS and not retried:
+                    # Probablemente el ICMP de otra sonda: atenderlo y reenviar
+                    retried = True
+                    self._on_readable(sock, family)
+                else:
+                    return e.errno or errno.EIO
+
+    def _pacing(self, ip: str) -> _HostPacing:
+        pacing = self._hosts.get(ip)
+        if pacing is None:
+            pacing = self._hosts[ip] = _HostPacing(self.host_rate)
+        return pacing
+
+    async def _pace(self, pacing: _HostPacing):
+        """Reserva el siguiente hueco de envío del host y lo espera."""
+        if not self.host_rate:
+            return
+        now = self._loop.time()
+        wait = pacing.next_send - now
+        pacing.next_send = max(now, pacing.next_send) + 1 / pacing.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _retries_for(self, pacing: _HostPacing) -> int:
+        if pacing.late == 0 and pacing.silent >= SILENT_LIMIT:
+            return min(1, self.retries)
+        return self.retries
+
+    async def probe(self, ip: str, port: int) -> Optional[str]:
+        """Sondea un puerto UDP y retorna su estado (None si no pudo enviarse)."""
+        if self.limiter is None:
+            return await self._probe(ip, port)
+        await self.limiter.acquire_async(ip)
+        try:
+            return await self._probe(ip, port)
+        finally:
+            self.limiter.release(ip)
+
+    async def connect(self, ip: str, port: int) -> bool:
+        """Retorna True si el puerto UDP está abierto (interfaz de TCPConnectEngine)."""
+        return await self.probe(ip, port) == OPEN
+
+    async def _probe(self, ip: str, port: int) -> Optional[str]:
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        loop = self._loop
+        metrics = self.metrics
+        payload = self.payloads.get(port, b'')
+        pacing = self._pacing(ip)
+        timeout = self.timeout_for(ip) if self.timeout_for else self.timeout
+        state = None
+        attempt = 0
+        while True:
+            await self._pace(pacing)
+            waiter = loop.create_future()
+            self._waiting[(ip, port)] = waiter
+            started = loop.time()
+            err = await self._send(payload, ip, port)
+            if err:
+                self._waiting.pop((ip, port), None)
+                self.errors += 1
+                if metrics is not None:
+                    metrics.error(err)
+                return None
+            self.attempts += 1
+            if attempt:
+                self.retransmits += 1
+            if metrics is not None:
+                metrics.sent.inc()
+            timer = loop.call_later(timeout * (2 ** attempt), _set_result, waiter, None)
+            try:
+                state = await waiter
+            finally:
+                timer.cancel()
+                self._waiting.pop((ip, port), None)
+            if state is not None or attempt >= self._retries_for(pacing):
+                break
+            attempt += 1
+
+        if state is None:
+            pacing.silent += 1
+            self.open_filtered += 1
+            if metrics is not None:
+                metrics.timeouts.inc()
+            return OPEN_FILTERED
+
+        latency = (loop.time() - started) * 1000
+        if metrics is not None:
+            metrics.reply(latency)
+        if attempt == 0:
+            # Solo las respuestas al primer envío miden el RTT sin ambigüedad
+            if self.on_rtt:
+                self.on_rtt(ip, latency)
+            pacing.rate = min(self.host_rate, pacing.rate + 1) if self.host_rate else 0
+        else:
+            # El primer envío o su respuesta se perdió: probablemente el
+            # límite de ICMP del host
+            pacing.late += 1
+            if self.host_rate and loop.time() - pacing.last_backoff > timeout:
+                pacing.rate = max(MIN_HOST_RATE, pacing.rate / 2)
+                pacing.last_backoff = loop.time()
+                self.backoffs += 1
+        if state == OPEN:
+            self.open += 1
+        elif state == CLOSED:
+            self.closed += 1
+        else:
+            self.filtered += 1
+        return state
+
+    async def _probe_into(self, ip: str, port: int, semaphore: asyncio.Semaphore,
+                          states: Dict[Tuple[str, int], Optional[str]]):
+        try:
+            states[(ip, port)] = await self.probe(ip, port)
+        finally:
+            semaphore.release()
+
+    async def _run(self, targets: Iterable[Tuple[str, int]],
+                   states: Dict[Tuple[str, int], Optional[str]]):
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        try:
+            for ip, port in targets:
+                await semaphore.acquire()
+                task = loop.create_task(self._probe_into(ip, port, semaphore, states))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            self.close()
+
+    def scan(self, targets: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], Optional[str]]:
+        """Sondea los pares (ip, puerto) y retorna el estado de cada uno."""
+        states: Dict[Tuple[str, int], Optional[str]] = {}
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(targets, states))
+        finally:
+            loop.close()
+        return states
+
+    def stats(self) -> Dict:
+        return {
+            'probes': self.attempts,
+            'retransmits': self.retransmits,
+            'open': self.open,
+            'closed': self.closed,
+            'filtered': self.filtered,
+            'open_filtered': self.open_filtered,
+            'errors': self.errors,
+            'rate_backoffs': self.backoffs,
+            'icmp_errors': self.icmp_errors
+        }
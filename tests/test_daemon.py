@@ -0,0 +1,87 @@
+# tests/test_daemon.py
+"""API HTTP del demonio: rechazo de peticiones que pueden venir de un navegador."""
+import http.client
+import json
+import threading
+
+import pytest
+
+from network_discovery_tool.daemon import ScanDaemon, create_server
+
+DEFAULTS = {
+    'engine': 'ping', 'probes': [], 'tcp_probe_ports': [], 'udp_probe_ports': [],
+    'timeout': 0.2, 'threads': 4, 'concurrency': 4, 'port_engine': 'thread',
+    'port_timeout': 0.2, 'per_host_limit': 0, 'udp_retries': 0, 'udp_host_rate': 0,
+    'service_scan': False, 'resolve': False, 'ipv6_hints': None
+}
+
+# Campo desconocido: el trabajo se rechaza con 400 sin llegar a escanear
+INVALID_SPEC = json.dumps({'targets': '127.0.0.1', 'bogus': True})
+
+
+@pytest.fixture
+def api():
+    daemon = ScanDaemon(DEFAULTS, max_jobs=1)
+    server = create_server(daemon, '127.0.0.1:0')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+
+    def request(method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            # skip_host: la cabecera Host la fija cada prueba
+            conn.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+            headers = dict({'Host': f"127.0.0.1:{port}"}, **(headers or {}))
+            if body is not None:
+                headers['Content-Length'] = str(len(body))
+            for name, value in headers.items():
+                if value is not None:
+                    conn.putheader(name, value)
+            conn.endheaders(body.encode('utf-8') if body is not None else None)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b'null')
+        finally:
+            conn.close()
+
+    yield request
+    server.shutdown()
+    server.server_close()
+    daemon.close()
+
+
+def test_local_requests_are_served(api):
+    assert api('GET', '/health')[0] == 200
+    assert api('GET', '/health', headers={'Host': 'localhost:8765'})[0] == 200
+    assert api('GET', '/health', headers={'Host': '[::1]:8765'})[0] == 200
+    status, body = api('POST', '/scans', INVALID_SPEC, {'Content-Type': 'application/json'})
+    assert status == 400
+    assert 'error' in body
+
+
+@pytest.mark.parametrize('content_type', [None, 'text/plain', 'application/x-www-form-urlencoded'])
+def test_post_requires_json_content_type(api, content_type):
+    status, _ = api('POST', '/scans', INVALID_SPEC, {'Content-Type': content_type})
+    assert status == 415
+
+
+@pytest.mark.parametrize('method', ['GET', 'POST', 'DELETE'])
+def test_foreign_host_is_forbidden(api, method):
+    path = '/scans' if method != 'DELETE' else '/scans/1'
+    body = INVALID_SPEC if method == 'POST' else None
+    status, _ = api(method, path, body, {
+        'Host': 'attacker.example:8765', 'Content-Type': 'application/json'
+    })
+    assert status == 403
+
+
+def test_missing_host_is_forbidden(api):
+    assert api('GET', '/scans', headers={'Host': None})[0] == 403
+
+
+def test_origin_is_forbidden(api):
+    status, _ = api('POST', '/scans', INVALID_SPEC, {
+        'Origin': 'http://127.0.0.1:8765', 'Content-Type': 'application/json'
+    })
+    assert status == 403
+    assert api('GET', '/scans', headers={'Origin': 'null'})[0] == 403
@@ -0,0 +1,42 @@
+# tests/test_history.py
+"""Historial SQLite: un escaneo sin hosts también queda registrado."""
+import sys
+
+import pytest
+
+from network_discovery_tool import cli
+from network_discovery_tool.history import ScanHistory
+from network_discovery_tool.models import HostResult, PortResult
+from network_discovery_tool.scanner import NetworkScanner
+
+TARGET = '10.0.0.0/30'
+
+
+def test_empty_scan_is_recorded_and_diffed(tmp_path, monkeypatch):
+    db = str(tmp_path / 'history.db')
+    with ScanHistory(db) as history:
+        populated = history.record_scan(
+            TARGET,
+            [HostResult('10.0.0.1', 'gw.example', 1), HostResult('10.0.0.2', 'N/A', 2)],
+            {'10.0.0.1': [PortResult.shared(22, 'SSH')]},
+            ports_spec='22'
+        )
+
+    # La subred ya no contesta: el CLI sale por la rama "sin hosts"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(NetworkScanner, 'scan_target_set', lambda self, targets, on_host=None: [])
+    monkeypatch.setattr(sys, 'argv', ['ndiscover', TARGET, '-p', '22', '--history-db', db])
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    assert exit_info.value.code == 0
+
+    with ScanHistory(db) as history:
+        empty = history.latest_scan_id(TARGET)
+        assert empty != populated
+        assert history.scan_info(empty)['host_count'] == 0
+        assert history.last_full_sweep_age(TARGET) is not None
+        changes = history.diff(populated, empty)
+
+    assert [row[0] for row in changes['host_gone']] == ['10.0.0.1', '10.0.0.2']
+    assert [row[:2] for row in changes['port_gone']] == [('10.0.0.1', 22)]
+    assert changes['host_new'] == changes['port_new'] == []
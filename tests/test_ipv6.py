@@ -0,0 +1,54 @@
+# tests/test_ipv6.py
+"""Pistas IPv6: tablas de vecinos con entradas que no son MACs Ethernet."""
+import io
+import subprocess
+from ipaddress import IPv6Network
+
+from network_discovery_tool import ipv6
+from network_discovery_tool.ipv6 import (
+    IPv6Hints, eui64_interface_id, parse_arp_table, parse_mac, parse_neighbor_table
+)
+from network_discovery_tool.models import IPV6_BASE, ip_to_int
+
+NEIGHBORS = """\
+fe80::1 dev eth0 lladdr 52:54:00:12:34:56 router REACHABLE
+2001:db8::10 dev ib0 lladdr 80:00:02:08:fe:80:00:00:00:00:00:00:00:02:c9:03:00:a1:b2:c3 STALE
+2001:db8::20 dev sit1 lladdr 192.0.2.7 REACHABLE
+2001:db8::30 dev eth0 lladdr 52:54:00:ab:cd:ef DELAY
+2001:db8::40 dev eth0 FAILED
+"""
+
+ARP = """\
+10.0.0.1         0x1         0x2         52:54:00:00:00:01     *        eth0
+10.0.0.2         0x20        0x2         80:00:02:08:fe:80:00:00:00:00:00:00:00:02:c9:03:00:a1:b2:c3 * ib0
+10.0.0.3         0x1         0x0         00:00:00:00:00:00     *        eth0
+10.0.0.4         0x1         0x2         52:54:00:00:00:04     *        eth0
+"""
+
+
+def test_neighbor_table_skips_non_ethernet_lladdr():
+    addresses, macs = parse_neighbor_table(NEIGHBORS)
+    assert addresses == ['fe80::1', '2001:db8::10', '2001:db8::20', '2001:db8::30']
+    assert macs == [parse_mac('52:54:00:12:34:56'), parse_mac('52:54:00:ab:cd:ef')]
+
+
+def test_arp_table_keeps_entries_after_a_bad_one():
+    assert parse_arp_table(io.StringIO(ARP)) == [
+        parse_mac('52:54:00:00:00:01'), parse_mac('52:54:00:00:00:04')
+    ]
+
+
+def test_hints_survive_mixed_neighbor_table(monkeypatch):
+    def fake_run(command, **kwargs):
+        return subprocess.CompletedProcess(command, 0, stdout=NEIGHBORS)
+
+    monkeypatch.setattr(ipv6.subprocess, 'run', fake_run)
+    network = IPv6Network('2001:db8::/64')
+    candidates = set(IPv6Hints(low=0).intervals(network))
+
+    first = IPV6_BASE + int(network.network_address)
+    eui64 = first + eui64_interface_id(parse_mac('52:54:00:ab:cd:ef'))
+    assert (eui64, eui64) in candidates
+    for address in ('2001:db8::10', '2001:db8::20', '2001:db8::30'):
+        value = ip_to_int(address)
+        assert (value, value) in candidates
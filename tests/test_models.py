@@ -0,0 +1,26 @@
+# tests/test_models.py
+"""Modelo de resultados: PortResult compartidos sin crecer sin límite."""
+import gc
+
+from network_discovery_tool.models import HostResult, PortResult
+
+
+def test_shared_port_results_are_interned():
+    first = PortResult.shared(22, 'SSH')
+    assert PortResult.shared(22, 'SSH') is first
+    assert PortResult.shared(22, 'SSH', 'UDP') is not first
+    assert dict(first) == {'port': 22, 'service': 'SSH', 'protocol': 'TCP'}
+
+
+def test_unused_banner_services_are_released():
+    services = [f"SSH OpenSSH_9.{n}p1" for n in range(1000)]
+    host = HostResult('10.0.0.1', 'N/A', 1, [PortResult.shared(22, services[0])])
+    for service in services[1:]:
+        PortResult.shared(22, service)
+    gc.collect()
+
+    cached = {key[1] for key in PortResult._shared.keys() if key[0] == 22}
+    # Solo sobrevive el servicio que sigue referenciado por un host
+    assert services[0] in cached
+    assert not cached & set(services[1:])
+    assert host.open_ports[0] is PortResult.shared(22, services[0])
@@ -0,0 +1,165 @@
+# tests/test_resolver.py
+"""Resolución inversa contra un servidor DNS de prueba en 127.0.0.1."""
+import json
+import socket
+import struct
+import threading
+
+import pytest
+
+from network_discovery_tool import resolver as resolver_module
+from network_discovery_tool.resolver import (
+    FAILURE_TTL, NO_HOSTNAME, ReverseResolver, parse_server, reverse_name
+)
+
+# PTR conocidos por el servidor de prueba: nombre -> (hostname, ttl)
+RECORDS = {
+    reverse_name('10.0.0.1'): ('host1.example', 60),
+    reverse_name('2001:db8::1'): ('host6.example', 60),
+}
+
+# IP cuya consulta el servidor nunca contesta
+SILENT_IP = '10.0.0.99'
+
+
+def _encode_name(name: str) -> bytes:
+    return b''.join(
+        bytes([len(label)]) + label.encode('ascii') for label in name.split('.')
+    ) + b'\x00'
+
+
+def _decode_question(data: bytes):
+    """(nombre, fin de la pregunta) de la consulta recibida."""
+    labels = []
+    offset = 12
+    while data[offset]:
+        length = data[offset]
+        labels.append(data[offset + 1:offset + 1 + length].decode('ascii'))
+        offset += 1 + length
+    return '.'.join(labels), offset + 5
+
+
+class StubDNSServer:
+    """Servidor DNS UDP mínimo: responde PTR de RECORDS, NXDOMAIN o nada."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.address = self.sock.getsockname()
+        self.queries = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, client = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            name, end = _decode_question(data)
+            self.queries.append(name)
+            if name == reverse_name(SILENT_IP):
+                continue
+            query_id = struct.unpack_from('!H', data)[0]
+            question = data[12:end]
+            record = RECORDS.get(name)
+            if record is None:
+                header = struct.pack('!HHHHHH', query_id, 0x8183, 1, 0, 0, 0)
+                self.sock.sendto(header + question, client)
+                continue
+            hostname, ttl = record
+            rdata = _encode_name(hostname)
+            answer = struct.pack('!HHHIH', 0xC00C, 12, 1, ttl, len(rdata)) + rdata
+            header = struct.pack('!HHHHHH', query_id, 0x8180, 1, 1, 0, 0)
+            self.sock.sendto(header + question + answer, client)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+@pytest.fixture
+def dns_server():
+    server = StubDNSServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_resolver(dns_server):
+    resolvers = []
+
+    def make(**options):
+        host, port = dns_server.address
+        resolver = ReverseResolver(dns_server=f"{host}:{port}", timeout=0.3, **options)
+        resolvers.append(resolver)
+        return resolver
+
+    yield make
+    for resolver in resolvers:
+        resolver.close()
+
+
+def test_parse_server():
+    assert parse_server('10.0.0.53') == ('10.0.0.53', 53)
+    assert parse_server('10.0.0.53:5353') == ('10.0.0.53', 5353)
+    assert parse_server('2001:db8::53') == ('2001:db8::53', 53)
+    assert parse_server('[2001:db8::53]:5353') == ('2001:db8::53', 5353)
+
+
+def test_ptr_answer(make_resolver):
+    resolver = make_resolver()
+    assert resolver.resolve('10.0.0.1') == 'host1.example'
+    assert resolver.resolve('2001:db8::1') == 'host6.example'
+
+
+def test_nxdomain_is_cached(make_resolver, dns_server):
+    resolver = make_resolver()
+    assert resolver.resolve('10.0.0.2') == NO_HOSTNAME
+    assert resolver.resolve('10.0.0.2') == NO_HOSTNAME
+    assert resolver.lookups == 1
+    assert resolver.cache_hits == 1
+    assert dns_server.queries.count(reverse_name('10.0.0.2')) == 1
+
+
+def test_cache_expires_with_record_ttl(make_resolver, dns_server, monkeypatch):
+    resolver = make_resolver(ttl=3600)
+    assert resolver.resolve('10.0.0.1') == 'host1.example'
+    assert resolver.resolve('10.0.0.1') == 'host1.example'
+    assert resolver.lookups == 1
+
+    # El TTL del registro (60 s) manda sobre el de la caché (3600 s)
+    now = resolver_module.time.time()
+    monkeypatch.setattr(resolver_module.time, 'time', lambda: now + 61)
+    assert resolver.resolve('10.0.0.1') == 'host1.example'
+    assert resolver.lookups == 2
+    assert dns_server.queries.count(reverse_name('10.0.0.1')) == 2
+
+
+def test_concurrent_lookups_are_deduplicated(make_resolver, dns_server):
+    resolver = make_resolver()
+    results = resolver.resolve_many(['10.0.0.1'] * 20)
+    assert results == {'10.0.0.1': 'host1.example'}
+    assert dns_server.queries.count(reverse_name('10.0.0.1')) == 1
+
+
+def test_timeout_is_not_a_negative_answer(make_resolver, tmp_path, monkeypatch):
+    cache_file = tmp_path / 'dns.json'
+    resolver = make_resolver(negative_ttl=300, cache_file=str(cache_file))
+    assert resolver.resolve(SILENT_IP) == NO_HOSTNAME
+    assert resolver.resolve('10.0.0.2') == NO_HOSTNAME
+    resolver.save()
+
+    saved = json.loads(cache_file.read_text(encoding='utf-8'))
+    assert '10.0.0.2' in saved
+    assert SILENT_IP not in saved
+
+    # El fallo solo se recuerda FAILURE_TTL segundos
+    now = resolver_module.time.time()
+    monkeypatch.setattr(resolver_module.time, 'time', lambda: now + FAILURE_TTL + 1)
+    assert resolver.resolve(SILENT_IP) == NO_HOSTNAME
+    assert resolver.resolve('10.0.0.2') == NO_HOSTNAME
+    assert resolver.lookups == 3
@@ -0,0 +1,117 @@
+# tests/test_services.py
+"""Detección de servicios contra servidores de banner en 127.0.0.1."""
+import io
+import socket
+import threading
+
+import pytest
+
+from network_discovery_tool.output import open_writer
+from network_discovery_tool.scanner import PortScanner
+from network_discovery_tool.services import ServiceDetector, SignatureIndex
+
+
+class BannerServer:
+    """
+    Listener TCP de loopback que, por conexión, envía `banner` al aceptar y
+    `reply` cuando el cliente habla (p. ej. la sonda HTTP).
+    """
+
+    def __init__(self, banner: bytes = b'', reply: bytes = b''):
+        self.banner = banner
+        self.reply = reply
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            conn.settimeout(2)
+            try:
+                if self.banner:
+                    conn.sendall(self.banner)
+                if conn.recv(1024) and self.reply:
+                    conn.sendall(self.reply)
+                    conn.recv(1024)
+            except OSError:
+                pass
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+@pytest.fixture
+def servers():
+    started = {
+        'ssh': BannerServer(banner=b'SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13\r\n'),
+        'http': BannerServer(reply=b'HTTP/1.1 200 OK\r\nServer: nginx/1.24.0\r\n\r\n'),
+        'smtp': BannerServer(banner=b'220 mail.example ESMTP Postfix\r\n'),
+        'hostile': BannerServer(banner=b'SSH-2.0-<script>alert(1)</script>\r\n'),
+        'silent': BannerServer(),
+    }
+    yield started
+    for server in started.values():
+        server.close()
+
+
+@pytest.mark.parametrize('engine', ['thread', 'async'])
+def test_detects_services_on_open_ports(servers, engine):
+    detector = ServiceDetector(timeout=1.0, banner_wait=0.2)
+    scanner = PortScanner(timeout=1, engine=engine, services=detector)
+    ports = {name: server.port for name, server in servers.items()}
+    try:
+        results = scanner.scan_hosts_ports([{'ip': '127.0.0.1'}], sorted(ports.values()))
+    finally:
+        detector.close()
+
+    services = {entry.port: entry.service for entry in results['127.0.0.1']}
+    assert services[ports['ssh']] == 'SSH OpenSSH_9.6p1'
+    assert services[ports['http']] == 'HTTP nginx/1.24.0'
+    assert services[ports['smtp']] == 'SMTP Postfix'
+    assert services[ports['silent']] == 'Unknown'
+    assert detector.stats()['silent'] == 1
+
+
+def test_html_report_escapes_banners(servers):
+    detector = ServiceDetector(timeout=1.0, banner_wait=0.2)
+    scanner = PortScanner(timeout=1, engine='async', services=detector)
+    port = servers['hostile'].port
+    try:
+        results = scanner.scan_hosts_ports([{'ip': '127.0.0.1'}], [port])
+    finally:
+        detector.close()
+    assert results['127.0.0.1'][0].service.startswith('SSH <script>')
+
+    fh = io.StringIO()
+    writer = open_writer('html', fh, port_scan=True, service_scan=True)
+    writer.write_host(
+        {'ip': '127.0.0.1', 'hostname': '<b>ptr</b>', 'response_time': 1},
+        results['127.0.0.1']
+    )
+    writer.close()
+    report = fh.getvalue()
+    assert '<script>' not in report
+    assert '&lt;script&gt;' in report
+    assert '&lt;b&gt;ptr&lt;/b&gt;' in report
+
+
+def test_signature_index_prefers_first_match():
+    index = SignatureIndex()
+    assert index.match(b'220 mail.example ESMTP Postfix\r\n') == 'SMTP Postfix'
+    assert index.match(b'RFB 003.008\n') == 'VNC 003.008'
+    assert index.match(b'\x00\x01garbage') is None
@@ -0,0 +1,110 @@
+# tests/test_udp.py
+"""Motor UDP contra respondedores locales (127.0.0.1 y ::1)."""
+import socket
+import threading
+
+import pytest
+
+from network_discovery_tool.models import ip_family
+from network_discovery_tool.scanner import PortScanner
+from network_discovery_tool.udp import CLOSED, OPEN, OPEN_FILTERED, UDP_PAYLOADS, UDPScanEngine
+
+
+def _loopback_available(host: str) -> bool:
+    try:
+        with socket.socket(ip_family(host), socket.SOCK_DGRAM) as sock:
+            sock.bind((host, 0))
+        return True
+    except OSError:
+        return False
+
+
+class UDPEcho:
+    """Socket UDP que contesta a cada datagrama (o a ninguno con `silent`)."""
+
+    def __init__(self, host: str, silent: bool = False):
+        self.silent = silent
+        self.sock = socket.socket(ip_family(host), socket.SOCK_DGRAM)
+        self.sock.bind((host, 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.received = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            self.received.append(data)
+            if not self.silent:
+                self.sock.sendto(b'ok', address)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+def _unused_port(host: str) -> int:
+    """Puerto sin socket: el kernel contesta ICMP port unreachable."""
+    with socket.socket(ip_family(host), socket.SOCK_DGRAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(params=['127.0.0.1', '::1'])
+def host(request):
+    if not _loopback_available(request.param):
+        pytest.skip(f"{request.param} no disponible")
+    return request.param
+
+
+@pytest.fixture
+def responders(host):
+    echo = UDPEcho(host)
+    silent = UDPEcho(host, silent=True)
+    yield echo, silent
+    echo.close()
+    silent.close()
+
+
+def test_classifies_open_closed_and_silent(host, responders):
+    echo, silent = responders
+    closed = _unused_port(host)
+    engine = UDPScanEngine(timeout=0.2, retries=1, host_rate=0)
+    states = engine.scan([(host, echo.port), (host, closed), (host, silent.port)])
+
+    assert states[(host, echo.port)] == OPEN
+    assert states[(host, silent.port)] == OPEN_FILTERED
+    if engine.icmp_errors:
+        assert states[(host, closed)] == CLOSED
+    else:
+        assert states[(host, closed)] == OPEN_FILTERED
+    # La sonda sin respuesta se reenvía una vez
+    assert len(silent.received) == 2
+    assert engine.stats()['retransmits'] >= 1
+
+
+def test_known_ports_get_protocol_payload(host):
+    echo = UDPEcho(host)
+    try:
+        engine = UDPScanEngine(timeout=0.2, retries=0, host_rate=0,
+                               payloads={echo.port: UDP_PAYLOADS[123]})
+        states = engine.scan([(host, echo.port)])
+    finally:
+        echo.close()
+    assert states[(host, echo.port)] == OPEN
+    assert echo.received == [UDP_PAYLOADS[123]]
+
+
+def test_port_scanner_reports_udp_ports(host, responders):
+    echo, silent = responders
+    scanner = PortScanner(timeout=0.2, engine='udp', udp_retries=0, udp_host_rate=0)
+    results = scanner.scan_hosts_ports([{'ip': host}], [echo.port, silent.port])
+
+    assert [(entry.port, entry.protocol) for entry in results[host]] == [(echo.port, 'UDP')]
+    assert scanner.get_scan_stats()['udp']['open_filtered'] == 1